@@ -0,0 +1,52 @@
+import contextlib
+import io
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from compiler import compile_files, batch_failed  # noqa: E402
+from objects.CompilerArgs import CompilerArgs  # noqa: E402
+from objects.CompilerErrorLevels import CompilerErrorLevels  # noqa: E402
+
+MAIN = pathlib.Path(__file__).parent.parent.joinpath("main.py")
+
+
+def program(index: int) -> str:
+    return "\n".join(["#includemacrofile <metamacros>", "#memorylayout static auto incremental", "#endmemorylayout",
+                      f"repeat {index % 8 + 1}, \"add &r2, %__i\""] + [f"mov &r{i % 16 + 1}, {i}" for i in range(50)]
+                     + ["halt"])
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    with tempfile.TemporaryDirectory() as tmp:
+        for index in range(count):
+            with open(os.path.join(tmp, f"p{index:04}.mccpu"), "wt") as f:
+                f.write(program(index))
+        pattern = os.path.join(tmp, "*.mccpu")
+        print(f"{count} programs, {os.cpu_count()} cpus")
+
+        start = time.perf_counter()
+        for index in range(count):
+            subprocess.run([sys.executable, str(MAIN), "-nc", "-o", os.path.join(tmp, "single", f"p{index:04}"),
+                            os.path.join(tmp, f"p{index:04}.mccpu")], stdout=subprocess.DEVNULL, check=True)
+        print(f"process per file  {time.perf_counter() - start:8.2f} s")
+
+        for run_jobs in sorted({1, jobs}):
+            args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.WARNING, os.path.join(tmp, f"j{run_jobs}"))
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = compile_files([pattern], args, run_jobs)
+            elapsed = time.perf_counter() - start
+            assert len(results) == count and len(batch_failed(results, args)) == 0
+            print(f"compile_files -j {run_jobs:<3}{elapsed:8.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import sys
+import pathlib
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from compiler import load_macros, lex_line, resolve_macros, TYPE_REGEX_MATCH_REPLACERS, \
+    TYPE_SAMPLE_VALUES  # noqa: E402
+from objects.MacroRegistry import MacroRegistry  # noqa: E402
+from tests.test_data import EXAMPLE_COMP_ARGS  # noqa: E402
+
+MACRO_LINES = [
+    "#macro if(%register == %register){",
+    "cmp %1, %2",
+    "je ~ifend_%__macro_id_%__macro_no",
+    "...",
+    "ifend_%__macro_id_%__macro_no:",
+    "#endmacro }"
+]
+# unrelated simple macros, the old nesting scan looked at every macro for every body line
+FILLER_MACROS = 200
+
+
+def build_program(blocks: int, depth: int, body: int) -> list[str]:
+    lines = []
+    for _ in range(blocks):
+        for _ in range(depth):
+            lines.append("if(&r1 == &r2){")
+            lines.extend("add &r1, 1" for _ in range(body))
+        lines.extend("}" for _ in range(depth))
+    return lines
+
+
+def run(blocks: int, depth: int, body: int) -> tuple[int, float]:
+    macros = MacroRegistry(TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES)
+    filler = [line for i in range(FILLER_MACROS) for line in (f"#macro filler{i} %register", "mov %1, 0",
+                                                              "#endmacro")]
+    load_macros(macros, "bench", MACRO_LINES + filler, {}, EXAMPLE_COMP_ARGS)
+    lines = [lex_line(line, i) for i, line in enumerate(build_program(blocks, depth, body))]
+    start = time.perf_counter()
+    res = resolve_macros(lines, macros, {}, EXAMPLE_COMP_ARGS)
+    elapsed = time.perf_counter() - start
+    if res.status.name != "OK":
+        print(res)
+        exit(1)
+    return len(lines), elapsed
+
+
+def main():
+    depths = [int(arg) for arg in sys.argv[1:]] or [1, 4, 16]
+    for depth in depths:
+        line_count, elapsed = run(200, depth, 20)
+        print(f"depth {depth:>3} {line_count:>8} lines out {elapsed:>8.3f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from client import send_request  # noqa: E402
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+PROGRAM = "\n".join(["#includemacrofile <metamacros>", "#memorylayout static auto incremental", "#endmemorylayout",
+                     "repeat 4, \"add &r2, %__i\""] + [f"mov &r{i % 16 + 1}, {i}" for i in range(200)] + ["halt"])
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "prog.mccpu")
+        with open(src, "wt") as f:
+            f.write(PROGRAM)
+        socket_path = os.path.join(tmp, "server.sock")
+        server = subprocess.Popen([sys.executable, str(ROOT.joinpath("main.py")), "-nc", "--serve", socket_path],
+                                  stdout=subprocess.DEVNULL)
+        try:
+            while True:
+                try:
+                    send_request(socket_path, {"command": "ping"}, 10)
+                    break
+                except OSError:
+                    time.sleep(0.01)
+            out = os.path.join(tmp, "out")
+            runs = {
+                "main.py per call": [sys.executable, str(ROOT.joinpath("main.py")), "-nc", "-o", out, src],
+                "client.py per call": [sys.executable, str(ROOT.joinpath("client.py")), "-S", socket_path, "-o", out,
+                                       src]
+            }
+            print(f"{calls} compiles of a {len(PROGRAM.splitlines())} line program including metamacros")
+            for name, command in runs.items():
+                start = time.perf_counter()
+                for _ in range(calls):
+                    subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+                print(f"{name:<22}{(time.perf_counter() - start) / calls * 1e3:8.1f} ms/compile")
+            start = time.perf_counter()
+            for _ in range(calls):
+                response = send_request(socket_path, {"source": src, "args": {"out_file": out}})
+                assert response["status"] == "OK", response
+            print(f"{'send_request':<22}{(time.perf_counter() - start) / calls * 1e3:8.1f} ms/compile")
+        finally:
+            send_request(socket_path, {"command": "shutdown"}, 10)
+            server.wait(10)
+
+
+if __name__ == '__main__':
+    main()
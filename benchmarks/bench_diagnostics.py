@@ -0,0 +1,49 @@
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from objects.CompilerErrorLevels import CompilerErrorLevels  # noqa: E402
+from objects.CompilerResult import CompilerResult  # noqa: E402
+from objects.Diagnostics import Diagnostics  # noqa: E402
+
+
+def accumulate_results(count: int) -> int:
+    result = CompilerResult.empty()
+    for i in range(count):
+        result.accumulate(CompilerResult.info(f"[INFO] line {i} of {count} checked"))
+        result.accumulate(CompilerResult.warn(f"[WARN] #memorylayout at ln<{i}> has no layout type"))
+    return result.message_count()
+
+
+def collect_diagnostics(count: int, level: CompilerErrorLevels) -> int:
+    diagnostics = Diagnostics("prog.mccpu", level)
+    for i in range(count):
+        diagnostics.info("line-checked", "[INFO] line {} of {} checked", i, count)
+        diagnostics.warn("no-layout-type", "[WARN] #memorylayout at ln<{}> has no layout type", i, line=i)
+    return len(diagnostics.records)
+
+
+def best(run, repeats: int = 5) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"{count} info + {count} warning messages")
+    print(f"CompilerResult.accumulate        {best(lambda: accumulate_results(count)) * 1e3:>8.1f} ms "
+          f"({accumulate_results(count)} kept)")
+    for level in (CompilerErrorLevels.WARNING, CompilerErrorLevels.INFO):
+        print(f"Diagnostics, level {level.name:<8}     "
+              f"{best(lambda: collect_diagnostics(count, level)) * 1e3:>8.1f} ms "
+              f"({collect_diagnostics(count, level)} kept, none formatted)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import sys
+import pathlib
+import timeit
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from compiler import NATIVE_INSTRUCTIONS, NATIVE_DECODER  # noqa: E402
+from tests.test_data import EXAMPLE_STD_INSTRUCTIONS, match_instruction  # noqa: E402
+
+# mix in lines that are not native (macro calls, labels, comments), they are the worst case for the linear scan
+BENCH_LINES = EXAMPLE_STD_INSTRUCTIONS + ["zero &r1", "for(&r1 = 0; &r1 < 10; &r1++){", "loop:", "// comment"]
+
+
+def scan_instruction(line: str):
+    for inst, inst_id in NATIVE_INSTRUCTIONS.items():
+        if match_instruction(inst, line):
+            return inst, inst_id
+    return None
+
+
+def run_scan():
+    for line in BENCH_LINES:
+        scan_instruction(line)
+
+
+def run_decoder():
+    for line in BENCH_LINES:
+        NATIVE_DECODER.decode(line)
+
+
+def main():
+    for line in BENCH_LINES:
+        if scan_instruction(line) != NATIVE_DECODER.decode(line):
+            print(f"Mismatch for \"{line}\": {scan_instruction(line)} != {NATIVE_DECODER.decode(line)}")
+            exit(1)
+
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    scan_time = min(timeit.repeat(run_scan, number=1, repeat=repeat))
+    decoder_time = min(timeit.repeat(run_decoder, number=1, repeat=repeat))
+    print(f"lines per run: {len(BENCH_LINES)}, signatures: {len(NATIVE_INSTRUCTIONS)}")
+    print(f"match_instruction scan: {scan_time * 1000:.2f} ms ({scan_time / len(BENCH_LINES) * 1e6:.1f} us/line)")
+    print(f"InstructionDecoder:     {decoder_time * 1000:.2f} ms ({decoder_time / len(BENCH_LINES) * 1e6:.1f} us/line)")
+    print(f"speedup: {scan_time / decoder_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import contextlib
+import io
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from objects.CompilerArgs import CompilerArgs  # noqa: E402
+from objects.CompilerErrorLevels import CompilerErrorLevels  # noqa: E402
+from objects.Macro import Macro  # noqa: E402
+from objects.MacroTypes import MacroTypes  # noqa: E402
+from macro_generator_targets.Lua_Macrogeenerator import Lua  # noqa: E402
+
+
+def generator_source(index: int, helpers: int) -> list[str]:
+    lines = ["local gen, h = {}, {}"]
+    for helper in range(helpers):
+        lines += [f"function h.helper{helper}(a, b)",
+                  f"    local t = {{a, b, {helper}, \"h{index}_{helper}\"}}",
+                  "    if a > b then return t[1] * t[3] elseif a < b then return t[2] + t[3] else return #t[4] end",
+                  "end"]
+    lines += ["function gen:onAfterMacroLoad(compiler, macro) end",
+              "function gen:onMacroUse(compiler, macro, args)",
+              f"    return \"mov &r1, \" .. h.helper0(args[1], {index})",
+              "end",
+              "return gen"]
+    return lines
+
+
+def load_all(args: CompilerArgs, sources: list[list[str]]) -> float:
+    Lua.begin_compile(args)
+    start = time.perf_counter()
+    for index, source in enumerate(sources):
+        macro = Macro(f"gen{index} %number", "", [MacroTypes.NUMBER], [], [], False, True, None, "bench", 0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            res = Lua(source).load_generator(args, macro)
+        assert res is None, str(res)
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    helpers = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    sources = [generator_source(index, helpers) for index in range(count)]
+    print(f"{count} generators, {sum(len(source) for source in sources)} lines of Lua")
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.WARNING, "out")
+        cached = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.WARNING, "out", lua_cache_dir=tmp)
+        print(f"no cache     {load_all(plain, sources) * 1e3:8.2f} ms")
+        print(f"cold cache   {load_all(cached, sources) * 1e3:8.2f} ms ({Lua.bytecode_cache})")
+        print(f"warm cache   {load_all(cached, sources) * 1e3:8.2f} ms ({Lua.bytecode_cache})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import contextlib
+import io
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from compiler import compile_file  # noqa: E402
+from objects.CompilerArgs import CompilerArgs  # noqa: E402
+from objects.CompilerErrorLevels import CompilerErrorLevels  # noqa: E402
+from macro_generator_targets.Lua_Macrogeenerator import Lua  # noqa: E402
+
+
+def build_program(uses: int, pure: bool) -> list[str]:
+    return [
+        "#memorylayout static auto incremental",
+        "#endmemorylayout",
+        "#macro repeat %number, %string",
+        "    #macrogenerator lua",
+        "        local gen = {}",
+        f"        gen.pure = {'true' if pure else 'false'}",
+        "        function gen:onAfterMacroLoad(compiler, macro)",
+        "        end",
+        "        function gen:onMacroUse(compiler, macro, args)",
+        "            macro.clear_macro_top()",
+        "            for i = 1, args[1] do",
+        "                macro.add_macro_top((args[2]:gsub(\"%%__i\", i)))",
+        "            end",
+        "            return compiler.ok()",
+        "        end",
+        "        return gen",
+        "    #endmacrogenerator",
+        "#endmacro"
+    ] + [f"repeat 10, \"add &r{i % 4}, %__i\"" for i in range(uses)] + ["halt"]
+
+
+def main():
+    uses = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as tmp:
+        for pure in [False, True]:
+            src = os.path.join(tmp, "pure.mccpu")
+            with open(src, "wt") as f:
+                f.write("\n".join(build_program(uses, pure)))
+            args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.WARNING, os.path.join(tmp, "out"))
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                res = compile_file(src, args)
+            elapsed = time.perf_counter() - start
+            print(f"pure={str(pure):<5} {uses} uses: compile {elapsed:.3f} s [{res.status.name}]  {Lua.compile_stats()}")
+
+
+if __name__ == '__main__':
+    main()
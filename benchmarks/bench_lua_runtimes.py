@@ -0,0 +1,86 @@
+import contextlib
+import io
+import os
+import pathlib
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from compiler import compile_file  # noqa: E402
+from objects.CompilerArgs import CompilerArgs  # noqa: E402
+from objects.CompilerErrorLevels import CompilerErrorLevels  # noqa: E402
+from objects.Macro import Macro  # noqa: E402
+from macro_generator_targets.Lua_Macrogeenerator import Lua  # noqa: E402
+
+
+def generator_macro(i: int) -> list[str]:
+    return [
+        f"#macro gen{i} %register",
+        "    #macrogenerator lua",
+        "        local gen = {}",
+        "        function gen:onAfterMacroLoad(compiler, macro)",
+        "        end",
+        "        function gen:onMacroUse(compiler, macro, args)",
+        "            macro.clear_macro_top()",
+        f"            macro.add_macro_top(\"add \" .. args[1] .. \", {i}\")",
+        "            return compiler.ok()",
+        "        end",
+        "        return gen",
+        "    #endmacrogenerator",
+        "#endmacro"
+    ]
+
+
+def rss_kib() -> int:
+    try:
+        with open("/proc/self/statm", "rt") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def load_generators(generators: int, args: CompilerArgs) -> tuple[float, int, list[Lua]]:
+    Lua.begin_compile(args)
+    rss_before = rss_kib()
+    start = time.perf_counter()
+    loaded = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(generators):
+            lines = [line.strip() for line in generator_macro(i)[2:-2]]
+            macro = Macro(f"gen{i} %register", "", [], [], [], False, True, None, "bench", 0)
+            generator = Lua(lines)
+            generator.load_generator(args, macro)
+            loaded.append(generator)
+    return time.perf_counter() - start, rss_kib() - rss_before, loaded
+
+
+def main():
+    generators = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.WARNING, "out")
+    elapsed, rss, _ = load_generators(generators, args)
+    print(f"{generators} generators: create + load {elapsed * 1e3:.1f} ms, rss +{rss} KiB")
+    program = ["#memorylayout static auto incremental", "#endmemorylayout"]
+    for i in range(generators):
+        program.extend(generator_macro(i))
+    program.extend(f"gen{i} &r1" for i in range(generators))
+    program.append("halt")
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "generators.mccpu")
+        with open(src, "wt") as f:
+            f.write("\n".join(program))
+        args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.WARNING, os.path.join(tmp, "out"))
+        rss_before = rss_kib()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            res = compile_file(src, args)
+        elapsed = time.perf_counter() - start
+        rss_after = rss_kib()
+    print(f"{generators} generators: compile {elapsed * 1e3:.1f} ms, rss +{rss_after - rss_before} KiB "
+          f"[{res.status.name}]")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import contextlib
+import io
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from objects.CompilerArgs import CompilerArgs  # noqa: E402
+from objects.CompilerErrorLevels import CompilerErrorLevels  # noqa: E402
+from objects.Macro import Macro  # noqa: E402
+from objects.MacroTypes import MacroTypes  # noqa: E402
+from macro_generator_targets.Lua_Macrogeenerator import Lua  # noqa: E402
+
+STYLES = {
+    "add_macro_top per line": [
+        "macro.clear_macro_top()",
+        "for i = 1, args[1] do macro.add_macro_top(\"add &r1, \" .. i) end",
+        "return compiler.ok()"
+    ],
+    "return array": [
+        "local lines = {}",
+        "for i = 1, args[1] do lines[i] = \"add &r1, \" .. i end",
+        "return lines"
+    ],
+    "set_macro_top string": [
+        "local lines = {}",
+        "for i = 1, args[1] do lines[i] = \"add &r1, \" .. i end",
+        "macro.set_macro_top(table.concat(lines, \"\\n\"))",
+        "return compiler.ok()"
+    ]
+}
+
+
+def main():
+    lines = sys.argv[1] if len(sys.argv) > 1 else "10000"
+    repeats = 20
+    args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.WARNING, "out")
+    Lua.begin_compile(args)
+    for style, body in STYLES.items():
+        macro = Macro("unroll %number", "", [MacroTypes.NUMBER], [], [], False, True, None, "bench", 0)
+        generator = Lua(["local gen = {}", "function gen:onAfterMacroLoad(compiler, macro) end",
+                         "function gen:onMacroUse(compiler, macro, args)"] + body + ["end", "return gen"])
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator.load_generator(args, macro)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            res = generator.use_generator(args, macro, [lines])
+        elapsed = (time.perf_counter() - start) / repeats
+        print(f"{style:<24} {len(macro.macro_top):>6} lines {elapsed * 1e3:>8.2f} ms/use [{res.status.name}]")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import contextlib
+import io
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from compiler import compile_file  # noqa: E402
+from objects.CompilerArgs import CompilerArgs  # noqa: E402
+from objects.CompilerErrorLevels import CompilerErrorLevels  # noqa: E402
+
+PROGRAM = [
+    "#includemacrofile <metamacros>",
+    "#memorylayout static auto incremental",
+    "#endmemorylayout",
+    "mov &r1, 1",
+    "add &r1, &r2",
+    "halt"
+]
+
+
+def run(programs: int, cache_dir: str | None, tmp: str) -> float:
+    src = os.path.join(tmp, "small.mccpu")
+    with open(src, "wt") as f:
+        f.write("\n".join(PROGRAM))
+    args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.WARNING, os.path.join(tmp, "out"),
+                        cache_dir=cache_dir)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(programs):
+            if (res := compile_file(src, args)).status != CompilerErrorLevels.OK:
+                print(res, file=sys.stderr)
+                exit(1)
+    return time.perf_counter() - start
+
+
+def main():
+    programs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        uncached = run(programs, None, tmp)
+        cached = run(programs, os.path.join(tmp, "cache"), tmp)
+    print(f"{programs} programs without cache {uncached:>8.3f} s ({uncached / programs * 1e3:.2f} ms/program)")
+    print(f"{programs} programs with cache    {cached:>8.3f} s ({cached / programs * 1e3:.2f} ms/program)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+import sys
+import pathlib
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from compiler import load_macros, lex_line, resolve_macros, TYPE_REGEX_MATCH_REPLACERS, \
+    TYPE_SAMPLE_VALUES  # noqa: E402
+from objects.MacroRegistry import MacroRegistry  # noqa: E402
+from tests.test_data import EXAMPLE_COMP_ARGS  # noqa: E402
+
+MACRO_LINES = [
+    "#macro clear %register, %register",
+    "mov %1, 0",
+    "mov %2, 0",
+    "xor %1, %2",
+    "#endmacro"
+]
+
+
+def run(invocations: int) -> tuple[int, float]:
+    macros = MacroRegistry(TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES)
+    load_macros(macros, "bench", MACRO_LINES, {}, EXAMPLE_COMP_ARGS)
+    lines = []
+    for i in range(invocations):
+        lines.append(lex_line("clear &r1, &r2", i))
+        lines.append(lex_line("add &r1, 1", i))
+    start = time.perf_counter()
+    res = resolve_macros(lines, macros, {}, EXAMPLE_COMP_ARGS)
+    elapsed = time.perf_counter() - start
+    if res.status.name != "OK":
+        print(res)
+        exit(1)
+    return len(lines), elapsed
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    for size in sizes:
+        line_count, elapsed = run(size)
+        print(f"{size:>8} invocations {line_count:>8} lines out {elapsed:>8.3f} s "
+              f"({elapsed / size * 1e6:.1f} us/invocation)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import contextlib
+import io
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from compiler import compile_file  # noqa: E402
+from objects.CompilerArgs import CompilerArgs  # noqa: E402
+from objects.CompilerErrorLevels import CompilerErrorLevels  # noqa: E402
+
+HEADER = [
+    "#memorylayout static auto incremental",
+    "#endmemorylayout",
+    "#macro bump %register, %number",
+    "add %1, %2",
+    "add %1, %2",
+    "#endmacro",
+    "#macro swap %register, %register",
+    "xor %1, %2",
+    "xor %2, %1",
+    "xor %1, %2",
+    "#endmacro"
+]
+
+
+def build_program(lines: int) -> str:
+    body = []
+    for i in range(lines):
+        match i % 4:
+            case 0:
+                body.append(f"l{i}:")
+            case 1:
+                body.append(f"bump &r{i % 16}, {i % 200}")
+            case 2:
+                body.append(f"swap &r{i % 16}, &r{(i + 1) % 16}")
+            case 3:
+                body.append(f"jle ~l{i - 3}")
+    return "\n".join(HEADER + body + ["halt"])
+
+
+def run(src: str, args: CompilerArgs, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            res = compile_file(src, args)
+        best = min(best, time.perf_counter() - start)
+        assert res.status == CompilerErrorLevels.OK, res
+    return best
+
+
+def main():
+    # run it from two trees to compare the cost of the profiling hooks while --profile is off
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000]
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            src = os.path.join(tmp, "prog.mccpu")
+            with open(src, "wt") as f:
+                f.write(build_program(size))
+            args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.WARNING, os.path.join(tmp, "out"))
+            off = run(src, args, 7)
+            print(f"{size:>8} lines  --profile off {off * 1e3:>8.1f} ms")
+            if hasattr(args, "profile"):
+                args.profile = True
+                args.profile_memory = False
+                print(f"{size:>8} lines  --profile --profileNoMemory {run(src, args, 3) * 1e3:>8.1f} ms")
+                args.profile_memory = True
+                print(f"{size:>8} lines  --profile on  {run(src, args, 3) * 1e3:>8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
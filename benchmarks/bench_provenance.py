@@ -0,0 +1,65 @@
+import gc
+import pathlib
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from compiler import TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES, lex_line, load_macros, resolve_macros  # noqa: E402
+from objects.CompilerArgs import CompilerArgs  # noqa: E402
+from objects.CompilerErrorLevels import CompilerErrorLevels  # noqa: E402
+from objects.MacroRegistry import MacroRegistry  # noqa: E402
+
+ARGS = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.WARNING, "out")
+MACROS = [
+    "#macro body %register, %number",
+    "add %1, %2",
+    "xor %1, &r2",
+    "#endmacro",
+    "#macro five %register, %number",
+    "body %1, %2",
+    "mov &r3, %1",
+    "body %1, 1",
+    "#endmacro"
+]
+
+
+def expand(lines: int, width: int) -> tuple[list, MacroRegistry, float]:
+    # width lines per use of five, the uses get different numbers so the expansion cache does not share lines
+    macros = MacroRegistry(TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES)
+    load_macros(macros, "bench", MACROS, {}, ARGS)
+    use = "five" if width == 5 else "body"
+    source = [lex_line(f"{use} &r{i % 16}, {i % 251}", i) for i in range(lines // width)]
+    start = time.perf_counter()
+    res = resolve_macros(source, macros, {}, ARGS)
+    elapsed = time.perf_counter() - start
+    assert res.status == CompilerErrorLevels.OK and len(source) == lines, (res, len(source))
+    return source, macros, elapsed
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    for width in (5, 2):
+        best = min(expand(lines, width)[2] for _ in range(3))
+        gc.collect()
+        tracemalloc.start()
+        expanded, macros, _ = expand(lines, width)
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{lines} lines from {lines // width} uses ({width} lines each): expansion {best * 1e3:.1f} ms, "
+              f"expanded lines and macros hold {retained / 2 ** 20:.2f} MiB")
+        if (table := getattr(macros, "provenance", None)) is not None:
+            rows = {line.provenance for line in expanded}
+            # row numbers past the small int cache are one int object per row, shared by the lines of the row
+            row_ints = sum(sys.getsizeof(row) for row in rows if row > 256)
+            per_line = sum(sys.getsizeof(f"{table.entry(line.provenance)[0]}:{table.entry(line.provenance)[1]}")
+                           for line in expanded[:1000]) / 1000
+            print(f"  provenance table {len(table)} rows, {table.nbytes() / 2 ** 10:.1f} KiB of columns + "
+                  f"{row_ints / 2 ** 10:.1f} KiB of row numbers + 8 B slot per line "
+                  f"({(table.nbytes() + row_ints + 8 * len(expanded)) / len(expanded):.1f} B per line), "
+                  f"a \"file:line\" string per line would be {per_line:.1f} B per line before any chain")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import pathlib
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+import compiler  # noqa: E402
+from objects.ProvenanceTable import ProvenanceTable  # noqa: E402
+
+
+def build_program(lines: int) -> list[str]:
+    program = []
+    for i in range(lines // 8):
+        program.extend([f"l{i}:", f"// block {i}", f"add &r{i % 16}, {i % 200}", f"mov &r1, [&r{i % 16}]",
+                        f"sub *0x{i % 256:x}, 3", f"jle ~l{i}", "", "halt"])
+    return program
+
+
+def backend(lines) -> tuple[int, int]:
+    # what compile_file does after the variables are resolved, every field of every line is consumed
+    labels = compiler.collect_labels(lines)
+    assert compiler.check_encodable(lines, labels, ProvenanceTable()).status.name == "OK"
+    roms = labelled = 0
+    for _, text, rom, rom_with_labels in compiler.encode_lines(lines, labels):
+        roms += rom is not None
+        labelled += rom_with_labels is not None
+    return roms, labelled
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    for size in sizes:
+        lines = [compiler.lex_line(line, i) for i, line in enumerate(build_program(size))]
+        best = float("inf")
+        for _ in range(5):
+            start = time.perf_counter()
+            backend(lines)
+            best = min(best, time.perf_counter() - start)
+        tracemalloc.start()
+        backend(lines)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{size:>8} lines {best * 1e3:>8.1f} ms  peak {peak / 2 ** 10:>8.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import os
+import pathlib
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from objects.CompilerArgs import CompilerArgs  # noqa: E402
+from objects.CompilerErrorLevels import CompilerErrorLevels  # noqa: E402
+from objects.Instruction import Instruction  # noqa: E402
+from out_targets.LOGISIM import LOGISIM  # noqa: E402
+from out_targets.MCCPUBIN import MCCPUBIN  # noqa: E402
+from out_targets.MCCPUHEX import MCCPUHEX  # noqa: E402
+
+
+class PerWordBIN(MCCPUBIN):
+    # one struct.pack and one write per word, what a straightforward target would do
+
+    def transpile_stream(self, lines, args, compiler_working_dir):
+        with open(compiler_working_dir.joinpath(f"{args.out_file}.{self.extension}"), "wb") as f:
+            f.write(MCCPUBIN.header([], args))
+            for _, _, rom, _ in lines:
+                if rom is not None:
+                    f.write(struct.pack("<BBB", *rom))
+
+
+def stream(count: int) -> list:
+    inst = Instruction("add &r1, 1", "add", (), "", 3, 0)
+    return [(inst, inst.text, (i % 147, i % 32, i % 256), None) for i in range(count)]
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            # built up front, only the work of the targets is timed
+            lines = stream(size)
+            args = CompilerArgs("", 256, 8, 64, 16, CompilerErrorLevels.WARNING, "rom")
+            for target in [PerWordBIN(), MCCPUBIN(), MCCPUHEX(), LOGISIM()]:
+                best = float("inf")
+                for _ in range(5):
+                    start = time.perf_counter()
+                    target.transpile_stream(iter(lines), args, pathlib.Path(tmp))
+                    best = min(best, time.perf_counter() - start)
+                out = os.path.join(tmp, f"rom.{target.extension}")
+                print(f"{size:>8} words {type(target).__name__:>10} {best * 1e3:>8.1f} ms "
+                      f"{os.path.getsize(out):>9} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import contextlib
+import glob
+import io
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+import regex  # noqa: E402
+
+from compiler import compile_file  # noqa: E402
+from objects.CompilerArgs import CompilerArgs  # noqa: E402
+from objects.CompilerErrorLevels import CompilerErrorLevels  # noqa: E402
+
+CORPUS_DIR = pathlib.Path(__file__).parent.parent.joinpath("tests", "test_programms")
+LABEL_DECL_REG = regex.compile(r"^(\s*)([a-zA-Z][a-zA-Z0-9_-]*):")
+
+
+def split_program(lines: list[str]) -> tuple[list[str], list[str]]:
+    definitions: list[str] = []
+    code: list[str] = []
+    block_end = None
+    for line in lines:
+        stripped = line.strip().lower()
+        if block_end is not None:
+            definitions.append(line)
+            if stripped.startswith(block_end):
+                block_end = None
+        elif stripped.startswith("#memorylayout"):
+            definitions.append(line)
+            block_end = "#endmemorylayout"
+        elif stripped.startswith("#macro"):
+            definitions.append(line)
+            block_end = "#endmacro"
+        elif stripped.startswith("#"):
+            definitions.append(line)
+        else:
+            code.append(line)
+    return definitions, code
+
+
+def scale_program(lines: list[str], scale: int) -> list[str]:
+    definitions, code = split_program(lines)
+    labels = [m.group(2) for line in code if (m := LABEL_DECL_REG.match(line)) is not None]
+    scaled = list(definitions)
+    for i in range(scale):
+        for line in code:
+            for label in labels:
+                line = LABEL_DECL_REG.sub(lambda m: f"{m.group(1)}{label}_c{i}:" if m.group(2) == label
+                                          else m.group(0), line)
+                line = regex.sub(rf"~{label}\b", f"~{label}_c{i}", line)
+            scaled.append(line)
+    return scaled
+
+
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    total = 0.0
+    with tempfile.TemporaryDirectory() as tmp:
+        for file in sorted(glob.glob(str(CORPUS_DIR.joinpath("*")))):
+            name = os.path.splitext(os.path.basename(file))[0]
+            with open(file, "rt") as f:
+                scaled = scale_program(f.read().splitlines(), scale)
+            src = os.path.join(tmp, f"{name}.mccpu")
+            with open(src, "wt") as f:
+                f.write("\n".join(scaled))
+            args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.WARNING, os.path.join(tmp, f"{name}_out"))
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                res = compile_file(src, args)
+            elapsed = time.perf_counter() - start
+            total += elapsed
+            print(f"{name:<30} {len(scaled):>8} lines {elapsed:>9.3f} s  [{res.status.name}]")
+    print(f"{'total':<30} {'':>14} {total:>9.3f} s")
+
+
+if __name__ == '__main__':
+    main()
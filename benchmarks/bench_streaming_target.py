@@ -0,0 +1,70 @@
+import contextlib
+import io
+import os
+import pathlib
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+import compiler  # noqa: E402
+from objects.CompilerArgs import CompilerArgs  # noqa: E402
+from objects.CompilerErrorLevels import CompilerErrorLevels  # noqa: E402
+from objects.CompilerResult import CompilerResult  # noqa: E402
+from objects.LanguageTarget import LanguageTarget  # noqa: E402
+
+
+class ListMCCPU(LanguageTarget):
+    # the MCCPU target as it was before streaming, fed through the list adapter
+
+    def transpile(self, compile_lines, compile_lines_with_labels_comments, rom_instructions,
+                  rom_instructions_with_labels_comments, args, compiler_working_dir):
+        with open(compiler_working_dir.joinpath(f"{args.out_file}.mccpu"), "w") as f:
+            for cl in compile_lines_with_labels_comments:
+                f.write(f"{cl}\n")
+        return CompilerResult.ok()
+
+
+def build_program(lines: int) -> str:
+    program = ["#memorylayout static auto incremental", "#endmemorylayout"]
+    for i in range(lines // 4):
+        program.extend([f"l{i}:", f"// block {i}", f"add &r{i % 16}, {i % 200}", f"jle ~l{i}, 1"])
+    program.append("halt")
+    return "\n".join(program)
+
+
+def measure(lines, target: str, out: str, trace: bool) -> float:
+    args = CompilerArgs(target, 256, 8, 64, 16, CompilerErrorLevels.WARNING, out)
+    labels = compiler.collect_labels(lines)
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        res = compiler.call_language_handler(compiler.encode_lines(lines, labels), args)
+    elapsed = time.perf_counter() - start
+    assert res.status == CompilerErrorLevels.OK, res
+    if not trace:
+        return elapsed
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    compiler.OUT_TARGETS.plugins["listmccpu"] = ListMCCPU
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            # the output stage on its own, the program is lexed once up front
+            lines = [compiler.lex_line(line, i) for i, line in enumerate(build_program(size).splitlines()[2:])]
+            for target in ["listmccpu", "MCCPU"]:
+                out = os.path.join(tmp, target)
+                elapsed = min(measure(lines, target, out, False) for _ in range(3))
+                peak = measure(lines, target, out, True)
+                print(f"{size:>8} lines {target:>10} {elapsed * 1e3:>8.1f} ms  peak {peak / 2 ** 20:>7.2f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import contextlib
+import io
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from compiler import compile_file  # noqa: E402
+from objects.CompilerArgs import CompilerArgs  # noqa: E402
+from objects.CompilerErrorLevels import CompilerErrorLevels  # noqa: E402
+
+HEADER = [
+    "#memorylayout static auto balanced",
+    "#endmemorylayout",
+    "#macro load %register, %variable",
+    "mov %1, [%2]",
+    "#endmacro"
+]
+
+
+def build_program(variables: int, lines: int) -> list[str]:
+    program = list(HEADER)
+    for i in range(lines):
+        # v1, v10 and v100 share prefixes on purpose
+        var = f"v{i % variables}"
+        program.extend([f"mov &r1, *{var}", f"mov &r2, [*{var}]", f"load &r3, *{var}"])
+    program.append("halt")
+    return program
+
+
+def main():
+    variables = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    sizes = [int(arg) for arg in sys.argv[2:]] or [1_000, 10_000]
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            src = os.path.join(tmp, "variables.mccpu")
+            with open(src, "wt") as f:
+                f.write("\n".join(build_program(variables, size)))
+            args = CompilerArgs("MCCPU", 1024, 8, 64, 16, CompilerErrorLevels.WARNING, os.path.join(tmp, "out"))
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                res = compile_file(src, args)
+            elapsed = time.perf_counter() - start
+            print(f"{variables:>5} variables {size * 3:>8} lines {elapsed:>8.3f} s  [{res.status.name}]")
+
+
+if __name__ == '__main__':
+    main()
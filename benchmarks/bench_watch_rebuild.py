@@ -0,0 +1,91 @@
+import contextlib
+import io
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from compiler import compile_file  # noqa: E402
+from objects.CompilerArgs import CompilerArgs  # noqa: E402
+from objects.CompilerErrorLevels import CompilerErrorLevels  # noqa: E402
+from watch import Watcher  # noqa: E402
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+HEADER = [
+    "#includemacrofile <metamacros>",
+    "#memorylayout static auto incremental",
+    "#endmemorylayout",
+    "#macro clear %register, %register",
+    "mov %1, 0",
+    "mov %2, 0",
+    "xor %1, %2",
+    "#endmacro",
+    "#macro bump %register, %number",
+    "add %1, %2",
+    "add %1, %2",
+    "#endmacro"
+]
+
+
+def program(lines: int, edit: int = 0) -> str:
+    body = []
+    for i in range(lines - len(HEADER) - 1):
+        match i % 4:
+            case 0:
+                body.append(f"clear &r{i % 8 + 1}, &r{i % 8 + 2}")
+            case 1:
+                body.append(f"bump &r{i % 8 + 1}, {i % 16}")
+            case 2:
+                body.append(f"mov &r{i % 16 + 1}, {i % 200}")
+            case _:
+                body.append(f"add &r{i % 16 + 1}, &r{i % 15 + 2}")
+    # the edited line changes a constant in the middle of the program
+    body[len(body) // 2] = f"mov &r1, {edit % 200}"
+    return "\n".join(HEADER + body + ["halt"])
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "prog.mccpu")
+        with open(src, "wt") as f:
+            f.write(program(lines))
+        args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.WARNING, os.path.join(tmp, "out"))
+        print(f"{lines} line program")
+
+        start = time.perf_counter()
+        subprocess.run([sys.executable, str(ROOT.joinpath("main.py")), "-nc", "-o", os.path.join(tmp, "out"), src],
+                       stdout=subprocess.DEVNULL, check=True)
+        print(f"cold main.py             {(time.perf_counter() - start) * 1e3:8.1f} ms")
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            compile_file(src, args)
+        print(f"compile_file, no reuse   {(time.perf_counter() - start) * 1e3:8.1f} ms")
+
+        watcher = Watcher([src], args)
+        with contextlib.redirect_stdout(io.StringIO()):
+            first = watcher.build(src)
+        print(f"watch, first build       {first * 1e3:8.1f} ms")
+        rebuilds = []
+        for edit in range(1, edits + 1):
+            with open(src, "wt") as f:
+                f.write(program(lines, edit))
+            # a second write in the same timestamp tick would otherwise go unnoticed
+            os.utime(src, ns=(time.time_ns(), time.time_ns() + edit))
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                assert watcher.poll() == [src]
+                rebuilds.append(time.perf_counter() - start)
+            assert watcher.results[src] == CompilerErrorLevels.OK
+        rebuilds.sort()
+        print(f"watch, one-line rebuild  {rebuilds[len(rebuilds) // 2] * 1e3:8.1f} ms median of {edits}")
+
+
+if __name__ == '__main__':
+    main()
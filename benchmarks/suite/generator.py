@@ -0,0 +1,108 @@
+import random
+
+HEADER = [
+    "#includemacrofile <metamacros>",
+    "#memorylayout static auto incremental",
+    "#endmemorylayout",
+    # a block macro like the for of clikemacros, nested uses pair their blocks through the body
+    "#macro for(%register = %number; %register < %number){",
+    "#comment for %__macro_no",
+    "mov %1, %2",
+    "for_%__macro_id_%__macro_no:",
+    "...",
+    "add %3, 1",
+    "cmp %3, %4",
+    "jle ~for_%__macro_id_%__macro_no",
+    "#endmacro }"
+]
+
+
+class ProgramShape:
+    # counts of things per 1000 lines scale with the program, variables and macro definitions are fixed
+
+    def __init__(self, lines: int = 1000, variables: int = 64, labels: int = 40, simple_macros: int = 16,
+                 simple_uses: int = 200, complex_uses: int = 10, complex_depth: int = 2, lua_uses: int = 5,
+                 seed: int = 1) -> None:
+        self.lines = lines
+        self.variables = variables
+        self.labels = labels
+        self.simple_macros = simple_macros
+        self.simple_uses = simple_uses
+        self.complex_uses = complex_uses
+        self.complex_depth = complex_depth
+        self.lua_uses = lua_uses
+        self.seed = seed
+
+    def with_lines(self, lines: int) -> "ProgramShape":
+        shape = ProgramShape(**vars(self))
+        shape.lines = lines
+        return shape
+
+    def count(self, per_kilo: int) -> int:
+        return per_kilo * self.lines // 1000
+
+    def to_json(self) -> dict:
+        return dict(vars(self))
+
+
+def simple_macro(index: int) -> list[str]:
+    return [f"#macro op{index} %register, %number", "add %1, %2", f"xor %1, &r{index % 16}", "#endmacro"]
+
+
+def statement(shape: ProgramShape, rng: random.Random) -> str:
+    register = f"&r{rng.randrange(16)}"
+    match rng.randrange(3 if shape.variables > 0 else 2):
+        case 0:
+            return f"add {register}, {rng.randrange(256)}"
+        case 1:
+            return f"mov {register}, &r{rng.randrange(16)}"
+        case _:
+            return f"mov {register}, *v{rng.randrange(shape.variables)}"
+
+
+def generate_program(shape: ProgramShape) -> str:
+    rng = random.Random(shape.seed)
+    lines = list(HEADER)
+    for i in range(shape.simple_macros):
+        lines.extend(simple_macro(i))
+    # every kind of line is spread over the program, the rest is filled with native instructions
+    body_lines = max(shape.lines - len(lines) - 1, 0)
+    # a block macro takes a line per opening and closing brace plus the one in its body
+    block_lines = 2 * max(shape.complex_depth, 1) + 1
+    complex_uses = min(shape.count(shape.complex_uses), body_lines // block_lines)
+    body_lines = body_lines - complex_uses * block_lines
+    kinds = ["label"] * shape.count(shape.labels) + ["lua"] * shape.count(shape.lua_uses) + \
+        ["simple"] * shape.count(shape.simple_uses) * (shape.simple_macros > 0)
+    kinds = ["complex"] * complex_uses + kinds[:body_lines]
+    kinds.extend(["native"] * (body_lines + complex_uses - len(kinds)))
+    rng.shuffle(kinds)
+    labels = 0
+    depth = 0
+    for kind in kinds:
+        match kind:
+            case "label":
+                lines.append(f"l{labels}:")
+                labels = labels + 1
+            case "simple":
+                lines.append(f"op{rng.randrange(shape.simple_macros)} &r{rng.randrange(16)}, {rng.randrange(256)}")
+            case "complex":
+                counter = f"&r{depth + 1}"
+                lines.append(f"for({counter} = 0; {counter} < {rng.randrange(2, 10)}){{")
+                depth = depth + 1
+                # inner loops open right away up to the nesting depth, the outer one closes after its body
+                while depth < shape.complex_depth:
+                    counter = f"&r{depth + 1}"
+                    lines.append(f"for({counter} = 0; {counter} < {rng.randrange(2, 10)}){{")
+                    depth = depth + 1
+                lines.append(statement(shape, rng))
+                lines.extend(["}"] * depth)
+                depth = 0
+            case "lua":
+                lines.append(f"repeat {rng.randrange(2, 8)}, \"add &r{rng.randrange(16)}, %__i\"")
+            case _:
+                if labels > 0 and rng.randrange(8) == 0:
+                    lines.append(f"jle ~l{rng.randrange(labels)}")
+                else:
+                    lines.append(statement(shape, rng))
+    lines.append("halt")
+    return "\n".join(lines)
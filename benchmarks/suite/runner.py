@@ -0,0 +1,179 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import pathlib
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent))
+
+import compiler  # noqa: E402
+from benchmarks.suite.generator import ProgramShape, generate_program  # noqa: E402
+from objects.CompileProfile import CompileProfile  # noqa: E402
+from objects.CompilerArgs import CompilerArgs  # noqa: E402
+from objects.CompilerErrorLevels import CompilerErrorLevels  # noqa: E402
+
+# bump when the layout of the JSON results changes
+SUITE_FORMAT_VERSION = 1
+DEFAULT_SIZES = [1000, 2000, 4000, 8000]
+# differences below this are noise on a shared machine, whatever the ratio
+DEFAULT_FLOOR_MS = 5.0
+
+
+def compile_once(src: str, args: CompilerArgs) -> tuple[float, dict[str, float]]:
+    # the profile runs without tracemalloc so its phases add up to about what an unprofiled compile costs
+    profile = CompileProfile(src, False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        res = compiler.compile_file(src, args)
+        elapsed = time.perf_counter() - start
+        profiled = compiler.compile_file(src, args, profile)
+    if res.status != CompilerErrorLevels.OK or profiled.status != CompilerErrorLevels.OK:
+        raise RuntimeError(f"synthetic program {src} did not compile: {res.status.name} {res.message}")
+    return elapsed * 1e3, {name: ns / 1e6 for name, ns, _, _ in profile.phases}
+
+
+def measure(shape: ProgramShape, repeats: int, tmp: str) -> dict:
+    src = os.path.join(tmp, f"synthetic_{shape.lines}.mccpu")
+    with open(src, "wt") as file:
+        file.write(generate_program(shape))
+    args = CompilerArgs("MCCPU", 2 ** 16, 8, 64, 16, CompilerErrorLevels.WARNING, os.path.join(tmp, "out"))
+    # the first compile of a process imports the targets and fills the regex caches, untimed it does not make the
+    # smallest size look slow and flatten the fitted exponents
+    compile_once(src, args)
+    # every number is the best of the repeats, the others are the machine doing something else
+    total = math.inf
+    phases: dict[str, float] = {}
+    for _ in range(repeats):
+        elapsed, laps = compile_once(src, args)
+        total = min(total, elapsed)
+        for name, ms in laps.items():
+            phases[name] = min(phases.get(name, math.inf), ms)
+    return {"lines": shape.lines, "total_ms": total, "phases": phases}
+
+
+def fit_power_law(points: list[tuple[float, float]]) -> dict | None:
+    # least squares on log y = log c + k log x, time ~ c * lines ^ k
+    points = [(x, y) for x, y in points if x > 0 and y > 0]
+    if len(points) < 2:
+        return None
+    xs = [math.log(x) for x, _ in points]
+    ys = [math.log(y) for _, y in points]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    if sxx == 0:
+        return None
+    exponent = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sxx
+    intercept = mean_y - exponent * mean_x
+    syy = sum((y - mean_y) ** 2 for y in ys)
+    residual = sum((y - intercept - exponent * x) ** 2 for x, y in zip(xs, ys))
+    return {"exponent": exponent, "coefficient": math.exp(intercept),
+            "r2": 1.0 - residual / syy if syy > 0 else 1.0}
+
+
+def fit_runs(runs: list[dict]) -> dict:
+    fits = {"total": fit_power_law([(run["lines"], run["total_ms"]) for run in runs])}
+    for name in dict.fromkeys(name for run in runs for name in run["phases"]):
+        fits[name] = fit_power_law([(run["lines"], run["phases"][name]) for run in runs if name in run["phases"]])
+    return fits
+
+
+def run_suite(shape: ProgramShape, sizes: list[int], repeats: int) -> dict:
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            runs.append(measure(shape.with_lines(size), repeats, tmp))
+            print(f"{size:>8} lines {runs[-1]['total_ms']:>10.1f} ms")
+    return {"version": SUITE_FORMAT_VERSION, "compiler": compiler.COMPILER_VERSION,
+            "python": platform.python_version(), "machine": platform.machine(), "shape": shape.to_json(),
+            "repeats": repeats, "runs": runs, "fits": fit_runs(runs)}
+
+
+def compare(results: dict, baseline: dict, tolerance: float, floor_ms: float, exponent_tolerance: float) -> list[str]:
+    regressions = []
+    old_runs = {run["lines"]: run for run in baseline["runs"]}
+    for run in results["runs"]:
+        if (old := old_runs.get(run["lines"])) is None:
+            continue
+        timings = [("total", run["total_ms"], old["total_ms"])] + \
+            [(name, ms, old["phases"][name]) for name, ms in run["phases"].items() if name in old["phases"]]
+        for name, new_ms, old_ms in timings:
+            if new_ms > old_ms * (1 + tolerance) and new_ms - old_ms > floor_ms:
+                regressions.append(f"{run['lines']} lines {name}: {old_ms:.1f} ms -> {new_ms:.1f} ms "
+                                   f"({new_ms / old_ms - 1:+.0%})")
+    # a steeper curve shows up before the absolute times of the measured sizes get bad
+    for name, fit in results["fits"].items():
+        old_fit = baseline["fits"].get(name)
+        if fit is not None and old_fit is not None and fit["exponent"] > old_fit["exponent"] + exponent_tolerance:
+            regressions.append(f"{name} scaling: lines ^ {old_fit['exponent']:.2f} -> lines ^ {fit['exponent']:.2f}")
+    return regressions
+
+
+def report(results: dict) -> None:
+    for name, fit in results["fits"].items():
+        if fit is not None:
+            print(f"{name:<22} {fit['coefficient']:.3g} ms * lines ^ {fit['exponent']:.2f}  (R2 {fit['r2']:.3f})")
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="MCCPU-Benchmark-Suite", description="Compile synthetic MCCPU programs "
+                                                                               "of growing size and fit how each "
+                                                                               "phase scales")
+    parser.add_argument("-n", "--sizes", type=int, nargs="+", help="program sizes in lines", default=DEFAULT_SIZES,
+                        dest="sizes")
+    parser.add_argument("-r", "--repeats", type=int, help="compiles per size, the best one counts", default=5,
+                        dest="repeats")
+    parser.add_argument("--variables", type=int, help="memory layout variables", default=64, dest="variables")
+    parser.add_argument("--labels", type=int, help="labels per 1000 lines", default=40, dest="labels")
+    parser.add_argument("--simpleMacros", type=int, help="simple macros defined", default=16, dest="simple_macros")
+    parser.add_argument("--simpleUses", type=int, help="simple macro uses per 1000 lines", default=200,
+                        dest="simple_uses")
+    parser.add_argument("--complexUses", type=int, help="nested block macros per 1000 lines", default=10,
+                        dest="complex_uses")
+    parser.add_argument("--complexDepth", type=int, help="nesting depth of the block macros", default=2,
+                        dest="complex_depth")
+    parser.add_argument("--luaUses", type=int, help="Lua generated macros per 1000 lines", default=5,
+                        dest="lua_uses")
+    parser.add_argument("--seed", type=int, help="seed of the program generator", default=1, dest="seed")
+    parser.add_argument("-o", "--output", type=str, help="write the results as JSON", default=None, dest="out")
+    parser.add_argument("-b", "--baseline", type=str, help="JSON results of an earlier run to compare against",
+                        default=None, dest="baseline")
+    parser.add_argument("-t", "--tolerance", type=float, help="allowed slowdown against the baseline, 0.25 is 25%%",
+                        default=0.25, dest="tolerance")
+    parser.add_argument("--floorMs", type=float, help="slowdowns below this many ms are never flagged",
+                        default=DEFAULT_FLOOR_MS, dest="floor_ms")
+    parser.add_argument("--exponentTolerance", type=float, help="allowed growth of the fitted scaling exponents",
+                        default=0.15, dest="exponent_tolerance")
+    parsed = parser.parse_args(argv)
+
+    shape = ProgramShape(variables=parsed.variables, labels=parsed.labels, simple_macros=parsed.simple_macros,
+                         simple_uses=parsed.simple_uses, complex_uses=parsed.complex_uses,
+                         complex_depth=parsed.complex_depth, lua_uses=parsed.lua_uses, seed=parsed.seed)
+    results = run_suite(shape, sorted(parsed.sizes), parsed.repeats)
+    report(results)
+    if parsed.out is not None:
+        with open(parsed.out, "wt") as file:
+            json.dump(results, file, indent=2)
+    if parsed.baseline is None:
+        return 0
+    with open(parsed.baseline, "rt") as file:
+        baseline = json.load(file)
+    if baseline.get("version") != SUITE_FORMAT_VERSION or baseline.get("shape") != results["shape"]:
+        print(f"Baseline \"{parsed.baseline}\" was measured with another suite version or program shape")
+        return 2
+    regressions = compare(results, baseline, parsed.tolerance, parsed.floor_ms, parsed.exponent_tolerance)
+    for regression in regressions:
+        print(f"[REGRESSION] {regression}")
+    if len(regressions) == 0:
+        print(f"No regressions against \"{parsed.baseline}\"")
+    return 1 if len(regressions) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import pathlib
+import socket
+import sys
+
+DEFAULT_SOCKET_PATH = pathlib.Path.home().joinpath(".cache", "mccpu-compiler", "server.sock")
+# CompilerErrorLevels by severity, the client does not import the compiler to stay cheap to start
+ERROR_LEVELS = ["INFO", "OK", "WARNING", "ERROR", "NONE"]
+
+
+def send_request(socket_path: str | os.PathLike, payload: dict, timeout: float | None = None) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(socket_path))
+        sock.sendall(json.dumps(payload).encode() + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile("rb") as response:
+            line = response.readline()
+    if len(line) == 0:
+        # the server failed on the request without answering, it is reported like a failed compile
+        message = "[ERROR] The compile server closed the connection without a response"
+        return {"file": payload.get("source", payload.get("name")), "status": "ERROR", "messages": [["ERROR", message]],
+                "output": f"CompilerErrorLevels.ERROR {message}\n"}
+    return json.loads(line)
+
+
+def request_args(parsed: argparse.Namespace, out_file: str) -> dict:
+    return {"target_lang": parsed.language, "mem_size": parsed.memory, "memory_blocks": parsed.blocks,
+            "stack_size": parsed.stack, "register_count": parsed.registers, "exit_level": parsed.exitLevel,
+            "out_file": os.path.abspath(out_file), "verbose": parsed.verbose}
+
+
+def failed(response: dict, exit_level: str) -> bool:
+    return ERROR_LEVELS.index(response["status"]) >= ERROR_LEVELS.index(exit_level)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="MCCPU-Client", description="Compile MCCPU source files on a running "
+                                                                      "compile server (main.py --serve)")
+    parser.add_argument("-S", "--socket", type=str, help="socket the compile server listens on",
+                        default=str(DEFAULT_SOCKET_PATH), dest="socket")
+    parser.add_argument("-t", "--target", type=str, help="the target Language", default="mccpu", dest="language")
+    parser.add_argument("-m", "--memory", type=int, help="the memory size in bytes", default=2 ** 8, dest="memory")
+    parser.add_argument("-mb", "--memoryBlocks", type=int, help="the count of blocks the memory is divided in",
+                        default=8, dest="blocks")
+    parser.add_argument("-s", "--stack", type=int, help="the size of the stack in bytes", default=2 ** 6,
+                        dest="stack")
+    parser.add_argument("-r", "--registers", type=int, help="define how many registers are available", default=32,
+                        dest="registers")
+    parser.add_argument("-el", "--exitLevel", type=str, help="define at what error level the compiler should exit",
+                        choices=["WARNING", "ERROR", "NONE"], default="ERROR", dest="exitLevel")
+    parser.add_argument("-o", "--output", type=str, help="define the name of the output file, with more than one "
+                                                         "file the name of the output directory",
+                        default="out", dest="out")
+    parser.add_argument("-v", "--verbose", help="print informational compiler messages", action="store_true",
+                        dest="verbose")
+    parser.add_argument("--stdin", type=str, help="compile source text read from stdin under this file name",
+                        default=None, dest="stdin")
+    parser.add_argument("--ping", help="check that the server is up", action="store_true", dest="ping")
+    parser.add_argument("--shutdown", help="stop the server", action="store_true", dest="shutdown")
+    parser.add_argument("files", nargs="*", help="source files")
+    return parser
+
+
+def build_requests(parsed: argparse.Namespace) -> list[dict]:
+    requests: list[dict] = []
+    if parsed.ping or parsed.shutdown:
+        requests.append({"command": "ping" if parsed.ping else "shutdown"})
+    if parsed.stdin is not None:
+        requests.append({"text": sys.stdin.read(), "name": parsed.stdin, "args": request_args(parsed, parsed.out)})
+    # like main.py, -o becomes a directory once there is more than one file
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(file)) for file in parsed.files]) \
+        if len(parsed.files) > 1 else None
+    for file in parsed.files:
+        out_file = parsed.out if root is None else \
+            os.path.join(parsed.out, os.path.splitext(os.path.relpath(os.path.abspath(file), root))[0])
+        requests.append({"source": os.path.abspath(file), "args": request_args(parsed, out_file)})
+    return requests
+
+
+def print_response(request: dict, response: dict, labelled: bool) -> None:
+    if "command" in request:
+        print(json.dumps(response))
+        return
+    if labelled:
+        print(f"[{response.get('file')}]")
+    print(response.get("output", ""), end="")
+
+
+def print_summary(compiled: int, failures: list[str]) -> None:
+    if compiled == 1 and len(failures) == 0:
+        print("Compiled Successfully")
+    elif compiled > 1:
+        print(f"Compiled {compiled - len(failures)} of {compiled} files successfully"
+              + (f", failed: {', '.join(failures)}" if len(failures) > 0 else ""))
+
+
+def main(argv: list[str]) -> int:
+    parser = build_parser()
+    parsed = parser.parse_args(argv)
+    if len(requests := build_requests(parsed)) == 0:
+        parser.print_usage()
+        return 2
+
+    failures: list[str] = []
+    for request in requests:
+        try:
+            response = send_request(parsed.socket, request)
+        except OSError as e:
+            print(f"No compile server on \"{parsed.socket}\" ({e}), start one with main.py --serve", file=sys.stderr)
+            return 2
+        print_response(request, response, len(requests) > 1)
+        if "command" not in request and failed(response, parsed.exitLevel):
+            failures.append(response.get("file", "?"))
+    print_summary(len([request for request in requests if "command" not in request]), failures)
+    return 1 if len(failures) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
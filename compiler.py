@@ -1,24 +1,40 @@
+import contextlib
+import copy
 import glob
 import importlib
-import inspect
+import io
 import os
 import pathlib
+import functools
 import hashlib
+import time
 
+from collections import OrderedDict
 from types import ModuleType
-from typing import Type, Match
+from typing import Type, Match, Iterator, Iterable, TypeVar, Mapping
 
-import regex
 
 from objects.CompilerErrorLevels import CompilerErrorLevels
 from objects.MacroTypes import MacroTypes
 from objects.MacroGenerator import MacroGenerator
 from objects.RegexCache import RegexCache
+from objects.InstructionDecoder import InstructionDecoder
 from objects.MacroLoadingState import MacroLoadingState
-from objects.LanguageTarget import LanguageTarget
+from objects.LanguageTarget import LanguageTarget, EncodedLine
 from objects.CompilerResult import CompilerResult
 from objects.CompilerArgs import CompilerArgs
 from objects.Macro import Macro
+from objects.MacroRegistry import MacroRegistry
+from objects.Instruction import Instruction
+from objects.LineBuffer import LineBuffer, LineNode
+from objects.MacroCache import MacroCache
+from objects.ExpansionCache import ExpansionCache
+from objects.PluginRegistry import PluginRegistry
+from objects.CompileProfile import CompileProfile
+from objects.NullProfile import NullProfile
+from objects.Diagnostic import Diagnostic
+from objects.Diagnostics import Diagnostics
+from objects.ProvenanceTable import ProvenanceTable, NO_PROVENANCE
 
 # %number can be equal to %label, only the compiler deals with %label & %variable and is resolved to %number at
 # compile time
@@ -250,12 +266,63 @@ TYPE_REGEX_MATCH_REPLACERS = {
     "%label": r"(~[a-zA-Z][a-zA-Z0-9_-]*)",
     "%string": r"\"(.*)\""
 }
+# canonical value per type, used to probe macro openers for ambiguous overloads
+TYPE_SAMPLE_VALUES = {
+    "%registerpointer": "[&r0]",
+    "%register": "&r0",
+    "%number": "0",
+    "%address": "*0",
+    "%variable": "*a",
+    "%label": "~a",
+    "%string": "\"s\""
+}
+MACRO_TYPE_NAMES: dict[str, MacroTypes] = {
+    "%label": MacroTypes.LABEL,
+    "%variable": MacroTypes.VARIABLE,
+    "%address": MacroTypes.MEMORY_ADDRESS,
+    "%number": MacroTypes.NUMBER,
+    "%register": MacroTypes.REGISTER,
+    "%registerpointer": MacroTypes.REGISTER_POINTER,
+    "%string": MacroTypes.STRING
+}
 
 REGEX_CACHE: RegexCache = RegexCache(**TYPE_REGEX_MATCH_REPLACERS, type_reg=r"%[a-zA-Z]*",
                                      re_var=r"\*([a-zA-Z][a-zA-Z0-9]*)", lbl_reg=r"([a-zA-Z][a-zA-Z0-9_-]+):",
-                                     register_num_reg=r"&r([0-9]{1,3})|$")
+                                     macro_arg_reg=r"%__macro_id|%__macro_no|%__macro_head|%(\d+)",
+                                     var_lookup_reg=r"\[\*([^\]]*)\]")
+NATIVE_DECODER: InstructionDecoder = InstructionDecoder(NATIVE_INSTRUCTIONS, TYPE_REGEX_MATCH_REPLACERS,
+                                                        MACRO_TYPE_NAMES)
+MACRO_DEPTH_LIMIT = 1_000
+T = TypeVar("T")
 WORKING_DIR = pathlib.Path(os.getcwd())
 COMPILER_FOLDER = pathlib.Path(__file__).parent
+COMPILER_VERSION = "1.0-wip"
+DEFAULT_CACHE_DIR = pathlib.Path.home().joinpath(".cache", "mccpu-compiler")
+# backends are only imported once a source file asks for them, modules in the plugin folders that are not listed
+# here are still found, but only after a name missed the manifest
+MACRO_GENERATOR_PLUGINS = {
+    "lua": "macro_generator_targets.Lua_Macrogeenerator:Lua"
+}
+OUT_TARGET_PLUGINS = {
+    "mccpu": "out_targets.MCCPU:MCCPU",
+    "mccpuall": "out_targets.MCCPUALL:MCCPUALL",
+    "mccpubin": "out_targets.MCCPUBIN:MCCPUBIN",
+    "mccpuhex": "out_targets.MCCPUHEX:MCCPUHEX",
+    "logisim": "out_targets.LOGISIM:LOGISIM"
+}
+# macro libraries compile_files parsed up front, keyed like the macro cache, every compile of the batch reads them
+SHARED_LIBRARIES: dict[str, dict] = {}
+# long-lived compilers keep this many parsed include sets, the least recently used are dropped first
+MAX_WARM_LIBRARIES = 32
+# expansion caches of warm compiles, keyed by a digest of the macro definitions and variable layout they were
+# rendered with
+WARM_EXPANSIONS: OrderedDict[str, ExpansionCache] = OrderedDict()
+MAX_WARM_EXPANSIONS = 8
+# operand types operand_to_rom can encode, a tuple compares by identity while enum hashing runs python code
+ROM_OPERAND_TYPES = (MacroTypes.REGISTER, MacroTypes.REGISTER_POINTER, MacroTypes.NUMBER, MacroTypes.MEMORY_ADDRESS,
+                     MacroTypes.LABEL)
+# bump when the layout of the .map files changes
+SOURCE_MAP_FORMAT_VERSION = 1
 
 
 def read_lines(file):
@@ -272,87 +339,88 @@ def next_memory_address(var_count: int, blocks: int, balance: bool, mem_size: in
         return int(address)
 
 
-def get_var_memory_address_auto(line: str, variables: dict[str, int], args: CompilerArgs,
-                                line_enumerate: enumerate[str], shrt_res: CompilerResult) -> CompilerResult | None:
+def get_var_memory_address_auto(line: str, line_no: int, variables: dict[str, int], args: CompilerArgs,
+                                line_enumerate: enumerate[str], diagnostics: Diagnostics) -> Diagnostics | None:
     if line.find("auto") != -1 and line.find("static") != -1:
         if line.find("incremental") != -1:
-            shrt_res.accumulate(find_var_static_auto_all(line_enumerate, variables, False, args))
-            return shrt_res.not_empty_or_ok()
+            find_var_static_auto_all(line_enumerate, variables, False, args)
         elif line.find("balanced") != -1:
-            shrt_res.accumulate(find_var_static_auto_all(line_enumerate, variables, True, args))
-            return shrt_res.not_empty_or_ok()
+            find_var_static_auto_all(line_enumerate, variables, True, args)
         else:
             find_var_static_auto_all(line_enumerate, variables, False, args)
-            return shrt_res.accumulate(
-                CompilerResult.warn(f"[WARN] No memory balancing type found at #memorylayout ln <{line}>"
-                                    f" defaulting to [Incremental]"))
+            diagnostics.warn("memorylayout-balancing", "[WARN] No memory balancing type found at #memorylayout ln <{}>"
+                             " defaulting to [Incremental]", line, line=line_no)
+        return diagnostics
     else:
         return None
 
 
 def get_var_memory_address_static(line: str, variables: dict[str, int], args: CompilerArgs, line_no: int,
-                                  shrt_res: CompilerResult, line_enumerate: enumerate[str]) -> CompilerResult | None:
+                                  diagnostics: Diagnostics, line_enumerate: enumerate[str]) -> Diagnostics | None:
     if line.find("static") != -1:
         start_ln = line_no
         if line.find("incremental") != -1:
-            return shrt_res.accumulate(
-                find_var_static_all(line_enumerate, variables, False, args))
+            return find_var_static_all(line_enumerate, variables, False, args, start_ln, diagnostics)
         elif line.find("balanced") != -1:
-            return shrt_res.accumulate(find_var_static_all(line_enumerate, variables, True, args))
+            return find_var_static_all(line_enumerate, variables, True, args, start_ln, diagnostics)
         else:
-            shrt_res.accumulate(CompilerResult.warn(f"[WARN] No memory balancing type found at "
-                                                    f"#memorylayout ln <{start_ln}> defaulting to ["
-                                                    f"Incremental]"))
-            return shrt_res.accumulate(
-                find_var_static_all(line_enumerate, variables, False, args))
+            diagnostics.warn("memorylayout-balancing", "[WARN] No memory balancing type found at #memorylayout ln <{}>"
+                             " defaulting to [Incremental]", start_ln, line=start_ln)
+            return find_var_static_all(line_enumerate, variables, False, args, start_ln, diagnostics)
     else:
         return None
 
 
-def get_var_memory_address(lines: list[str], variables: dict[str, int], args: CompilerArgs) -> CompilerResult:
-    shrt_res: CompilerResult = CompilerResult.empty()
+def get_var_memory_address(lines: list[str], variables: dict[str, int], args: CompilerArgs,
+                           file: str | None = None) -> Diagnostics:
+    diagnostics = Diagnostics(file)
     line_enumerate = enumerate(lines)
     for line_no, line in line_enumerate:
         if line.startswith("#"):
             if line.find("memorylayout") != -1:
                 if line.find("explicit") != -1:
-                    return shrt_res.not_empty_or_ok()
-                elif (res := get_var_memory_address_auto(line, variables, args, line_enumerate, shrt_res)) \
-                        is not None:
+                    return diagnostics
+                elif (res := get_var_memory_address_auto(line, line_no, variables, args, line_enumerate,
+                                                         diagnostics)) is not None:
                     return res
-                elif (res := get_var_memory_address_static(line, variables, args, line_no, shrt_res,
+                elif (res := get_var_memory_address_static(line, variables, args, line_no, diagnostics,
                                                            line_enumerate)) is not None:
                     return res
                 else:
-                    shrt_res.accumulate(CompilerResult.warn(
-                        f"[WARN] #memorylayout at ln<{line_no}> does not contain a valid variable layout type token ["
-                        f"static / static auto / explicit] + address balancing type [incremental / balanced] "
-                        f"continuing search for other #memorylayout sections"))
-    return shrt_res.accumulate(CompilerResult.warn(
-        "[WARN] No #memorylayout section found or no valid variable layout type token found [static / static auto / "
-        "explicit] + address balancing type [incremental / balanced] defaulting to [static auto incremental]"))
+                    diagnostics.warn("memorylayout-invalid",
+                                     "[WARN] #memorylayout at ln<{}> does not contain a valid variable layout type "
+                                     "token [static / static auto / explicit] + address balancing type [incremental "
+                                     "/ balanced] continuing search for other #memorylayout sections", line_no,
+                                     line=line_no)
+    diagnostics.warn("memorylayout-missing",
+                     "[WARN] No #memorylayout section found or no valid variable layout type token found [static / "
+                     "static auto / explicit] + address balancing type [incremental / balanced] defaulting to [static "
+                     "auto incremental]")
+    return diagnostics
 
 
 def find_var_static_all(line_enumerate: enumerate[str], variables: dict[str, int], balanced: bool,
-                        args: CompilerArgs) -> CompilerResult:
+                        args: CompilerArgs, start_ln: int, diagnostics: Diagnostics) -> Diagnostics:
     var_count = 0
     while True:
         line_no, line = next(line_enumerate, (None, None))
         if line is None:
-            return CompilerResult.error("[ERROR] Expected #endmemorylayout after #ememorylayout at ln <{start_ln}>")
+            diagnostics.error("unclosed-memorylayout", "[ERROR] Expected #endmemorylayout after #ememorylayout at ln "
+                              "<{}>", start_ln, line=start_ln)
+            return diagnostics
         if line.find("#endmemorylayout") != -1:
-            return CompilerResult.ok()
+            return diagnostics
         variables[line] = next_memory_address(var_count, args.memory_blocks, balanced, args.mem_size)
         var_count = var_count + 1
 
 
 def find_var_static_auto_all(line_enumerate: enumerate[str], variables: dict[str, int], balanced: bool,
-                             args: CompilerArgs) -> CompilerResult:
+                             args: CompilerArgs) -> None:
     var_count = 0
     while True:
         line_no, line = next(line_enumerate, (None, None))
         if line is None:
-            return CompilerResult.ok()
+            return
         matches = REGEX_CACHE.get_by_name("re_var").findall(line)
         for match in matches:
             if variables.get(match) is None:
@@ -360,78 +428,73 @@ def find_var_static_auto_all(line_enumerate: enumerate[str], variables: dict[str
                 var_count = var_count + 1
 
 
-def handle_std_macro_files(match: str, line_no: int, line: str,
-                           imported_files: dict[str, list[str]]) -> CompilerResult | None:
+def handle_std_macro_files(match: str, line_no: int, line: str, imported_files: dict[str, list[str]], file: str,
+                           diagnostics: Diagnostics) -> Diagnostics | None:
     if COMPILER_FOLDER.joinpath(f"macrodefs/{match}.mccpu").is_file():
-        file = open(COMPILER_FOLDER.joinpath(f"macrodefs/{match}.mccpu"), "rt")
-        if not file.readable():
-            return CompilerResult.error(
-                f"[ERROR] #Includemacrofile on line <{line_no}> in file \"{file.name}\" with value "
-                f"\"{line}\" was not found, exiting!")
+        included = open(COMPILER_FOLDER.joinpath(f"macrodefs/{match}.mccpu"), "rt")
+        if not included.readable():
+            diagnostics.error("include-not-readable", "[ERROR] #Includemacrofile on line <{}> in file \"{}\" with value "
+                              "\"{}\" was not found, exiting!", line_no, included.name, line, file=file, line=line_no)
+            return diagnostics
         if imported_files.get(match) is not None:
             return None
-        imported_files[match] = read_lines(file)
-        file.close()
+        imported_files[match] = read_lines(included)
+        included.close()
         return get_imported_files(imported_files, imported_files.get(match),
-                                  COMPILER_FOLDER.joinpath(f"macrodefs/{match}.mccpu").name)
+                                  COMPILER_FOLDER.joinpath(f"macrodefs/{match}.mccpu").name, diagnostics)
     return None
 
 
-def handle_custom_macro_files(match: str, line_no: int, line: str, imported_files: dict[str, list[str]]):
+def handle_custom_macro_files(match: str, line_no: int, line: str, imported_files: dict[str, list[str]], file: str,
+                              diagnostics: Diagnostics) -> Diagnostics | None:
     if WORKING_DIR.joinpath(f"/{match}").is_file():
-        file = open(WORKING_DIR.joinpath(f"/{match}").name, "rt")
-        if not file.readable():
-            return CompilerResult.error(
-                f"[ERROR] #Includemacrofile on line <{line_no}> in file \"{file.name}\" with value "
-                f"\"{line}\" was not found exiting!")
+        included = open(WORKING_DIR.joinpath(f"/{match}").name, "rt")
+        if not included.readable():
+            diagnostics.error("include-not-readable", "[ERROR] #Includemacrofile on line <{}> in file \"{}\" with value "
+                              "\"{}\" was not found exiting!", line_no, included.name, line, file=file, line=line_no)
+            return diagnostics
         if imported_files.get(match) is not None:
             return None
-        imported_files[match] = read_lines(file)
-        return get_imported_files(imported_files, imported_files.get(match), WORKING_DIR.joinpath(f"/{match}").name)
+        imported_files[match] = read_lines(included)
+        return get_imported_files(imported_files, imported_files.get(match), WORKING_DIR.joinpath(f"/{match}").name,
+                                  diagnostics)
     return None
 
 
-def get_imported_files(imported_files, lines, file) -> CompilerResult:
+def get_imported_files(imported_files, lines, file, diagnostics: Diagnostics | None = None) -> Diagnostics:
+    # included files report into the diagnostics of the file that included them
+    diagnostics = Diagnostics(file) if diagnostics is None else diagnostics
     REGEX_CACHE.add_pattern_if_not_added(include_match=r"<([a-z|0-9|A-Z|.|_|-]+)>")
     for line_no, line in enumerate(lines):
         if line.startswith('#'):
             if line.find("includemacrofile") != -1:
                 matches: list[str] = REGEX_CACHE.get_by_name("include_match").findall(line)
                 for match in matches:
-                    if (res := handle_std_macro_files(match, line_no, line, imported_files)) is not None:
+                    if (res := handle_std_macro_files(match, line_no, line, imported_files, file,
+                                                      diagnostics)) is not None:
                         return res
-                    elif (res := handle_custom_macro_files(match, line_no, line, imported_files)) is not None:
+                    elif (res := handle_custom_macro_files(match, line_no, line, imported_files, file,
+                                                           diagnostics)) is not None:
                         return res
                     else:
-                        return CompilerResult.error(
-                            f"[ERROR] #Includemacrofile on line <{line_no}> in file \"{file}\" with value "
-                            f"\"{line}\" was not found exiting!")
-    return CompilerResult.ok()
+                        diagnostics.error("include-not-found", "[ERROR] #Includemacrofile on line <{}> in file \"{}\" "
+                                          "with value \"{}\" was not found exiting!", line_no, file, line, file=file,
+                                          line=line_no)
+                        return diagnostics
+    return diagnostics
 
 
-def get_macro_arg_types(macro_state: MacroLoadingState) -> list[MacroTypes] | CompilerResult:
+def get_macro_arg_types(macro_state: MacroLoadingState, diagnostics: Diagnostics) -> list[MacroTypes] | None:
     matches: list[str] = REGEX_CACHE.get_by_name("type_reg").findall(macro_state.macro_opener)
     macro_types: list[MacroTypes] = []
     for match in matches:
-        if match == "%label":
-            macro_types.append(MacroTypes.LABEL)
-        elif match == "%variable":
-            macro_types.append(MacroTypes.VARIABLE)
-        elif match == "%address":
-            macro_types.append(MacroTypes.MEMORY_ADDRESS)
-        elif match == "%number":
-            macro_types.append(MacroTypes.NUMBER)
-        elif match == "%register":
-            macro_types.append(MacroTypes.REGISTER)
-        elif match == "%registerpointer":
-            macro_types.append(MacroTypes.REGISTER_POINTER)
-        elif match == "%string":
-            macro_types.append(MacroTypes.STRING)
-        else:
-            return CompilerResult.error(
-                f"[ERROR] macro \"{macro_state.macro_opener}\" in file \"{macro_state.file}\" at line "
-                f"<{macro_state.macro_start_line_no}> used not valid type "
-                f"\"{match}\" valid are [%label, %variable, %address, %number, %register, %registerpointer]")
+        if (macro_type := MACRO_TYPE_NAMES.get(match)) is None:
+            diagnostics.error("invalid-macro-type", "[ERROR] macro \"{}\" in file \"{}\" at line <{}> used not valid type "
+                              "\"{}\" valid are [%label, %variable, %address, %number, %register, %registerpointer]",
+                              macro_state.macro_opener, macro_state.file, macro_state.macro_start_line_no, match,
+                              file=macro_state.file, line=macro_state.macro_start_line_no)
+            return None
+        macro_types.append(macro_type)
     return macro_types
 
 
@@ -441,114 +504,118 @@ def num_hash(s: str) -> int:
     return int.from_bytes(algorithm.digest(), "big")
 
 
-def create_macro_instance(state: MacroLoadingState, macros: dict[int, Macro],
-                          line_no: int) -> CompilerResult | None:
+def create_macro_instance(state: MacroLoadingState, macros: MacroRegistry, line_no: int,
+                          diagnostics: Diagnostics) -> Diagnostics | None:
     macro_id = num_hash(state.macro_opener)
-    if state.complex_macro:
-        if state.macro_end is None:
-            return CompilerResult.error(f"[ERROR] Complex macros (macros using \"...\") need to have "
-                                        f"a closing expression error at #endmacro in file \"{state.file}\" "
-                                        f"at line <{line_no}>")
-        macros[macro_id] = Macro(state.macro_opener, state.macro_end, state.macro_args,
-                                 state.macro_top, state.macro_bottom, state.complex_macro,
-                                 state.generated_macro, state.macro_generator, state.file,
-                                 state.macro_start_line_no)
-    else:
-        if state.macro_end is None:
-            macros[macro_id] = Macro(state.macro_opener, "", state.macro_args, state.macro_top,
-                                     state.macro_bottom, state.complex_macro,
-                                     state.generated_macro,
-                                     state.macro_generator, state.file,
-                                     state.macro_start_line_no)
-        else:
-            macros[macro_id] = Macro(state.macro_opener, state.macro_end, state.macro_args,
-                                     state.macro_top, state.macro_bottom, state.complex_macro,
-                                     state.generated_macro, state.macro_generator, state.file,
-                                     state.macro_start_line_no)
+    if state.complex_macro and state.macro_end is None:
+        diagnostics.error("missing-block-closer", "[ERROR] Complex macros (macros using \"...\") need to have a closing "
+                          "expression error at #endmacro in file \"{}\" at line <{}>", state.file, line_no,
+                          file=state.file, line=line_no)
+        return diagnostics
+    macros.add(macro_id, Macro(state.macro_opener, state.macro_end if state.macro_end is not None else "",
+                               state.macro_args, state.macro_top, state.macro_bottom, state.complex_macro,
+                               state.generated_macro, state.macro_generator, state.file,
+                               state.macro_start_line_no))
     state.macro_id = macro_id
     return None
 
 
 def load_macro_generator(macro_state: MacroLoadingState, lines_iter: enumerate[str],
-                         macro_generators: dict[str, Type[MacroGenerator]]) -> CompilerResult | None:
+                         macro_generators: Mapping[str, Type[MacroGenerator]],
+                         diagnostics: Diagnostics) -> Diagnostics | None:
     macro_generator_lines = []
     while True:
         line_no, line = next(lines_iter, (None, None))
         if line is None:
-            return CompilerResult.error(f"[ERROR] Expected #endmacrogenerator after #macrogenerator "
-                                        f"at line <{line_no}> in file \"{macro_state.file}\"")
+            diagnostics.error("unclosed-macrogenerator", "[ERROR] Expected #endmacrogenerator after #macrogenerator "
+                              "at line <{}> in file \"{}\"", line_no, macro_state.file, file=macro_state.file,
+                              line=macro_state.macro_generator_start)
+            return diagnostics
         if line.startswith("#endmacrogenerator"):
             break
         macro_generator_lines.append(line)
     macro_state.generated_macro = True
     try:
         macro_state.macro_generator = macro_generators[macro_state.macro_generator_lang](macro_generator_lines)
+    except ImportError as e:
+        diagnostics.error("generator-import-failed", "[ERROR] Failed to import macro generator for language \"{}\" "
+                          "with error \"{}\", used at line <{}> in file \"{}\"", macro_state.macro_generator_lang, e,
+                          macro_state.macro_generator_start, macro_state.file, file=macro_state.file,
+                          line=macro_state.macro_generator_start)
+        return diagnostics
     except KeyError:
-        return CompilerResult.error(f"[ERROR] Macro generator for language "
-                                    f"\"{macro_state.macro_generator_lang}\" not found, used at line"
-                                    f" <{macro_state.macro_generator_start}> in file \"{macro_state.file}\""
-                                    f" in macro \"{macro_state.macro_opener}\""
-                                    f" beginning at line <{macro_state.macro_start_line_no}>")
+        diagnostics.error("generator-not-found", "[ERROR] Macro generator for language \"{}\" not found, used at line "
+                          "<{}> in file \"{}\" in macro \"{}\" beginning at line <{}>",
+                          macro_state.macro_generator_lang, macro_state.macro_generator_start, macro_state.file,
+                          macro_state.macro_opener, macro_state.macro_start_line_no, file=macro_state.file,
+                          line=macro_state.macro_generator_start)
+        return diagnostics
     return None
 
 
 def handle_macro_generator(line: str, line_no: int, macro_state: MacroLoadingState, lines_iter,
-                           macro_generators: dict[str, Type[MacroGenerator]]) -> CompilerResult | None:
+                           macro_generators: Mapping[str, Type[MacroGenerator]],
+                           diagnostics: Diagnostics) -> bool | None:
+    # None for lines that do not start a generator, otherwise whether loading the macros stops
     macro_generator_matches = REGEX_CACHE.get_by_name("macro_generator_reg").match(line)
     if macro_generator_matches is not None:
         macro_state.macro_generator_start = line_no
         macro_state.macro_generator_lang = macro_generator_matches.group(1)
-        if (res := load_macro_generator(macro_state, lines_iter, macro_generators)) is not None:
-            return res
-        else:
-            return CompilerResult.ok()
+        return load_macro_generator(macro_state, lines_iter, macro_generators, diagnostics) is not None
     return None
 
 
-def handle_macro_end(line: str, macro_state: MacroLoadingState, macros: dict[int, Macro],
-                     line_no: int, comp_args: CompilerArgs) -> CompilerResult | None:
+def handle_macro_end(line: str, macro_state: MacroLoadingState, macros: MacroRegistry,
+                     line_no: int, comp_args: CompilerArgs, diagnostics: Diagnostics) -> bool | None:
+    # None for lines that do not end the macro, otherwise whether loading the macros stops
     macro_end_matches = REGEX_CACHE.get_by_name("macro_end_reg").match(line)
-    if macro_end_matches is not None:
-        macro_state.macro_end = macro_end_matches.group(1)
-        if (res := create_macro_instance(macro_state, macros, line_no)) is not None:
-            return res
-        else:
-            if macros[macro_state.macro_id].generated_macro:
-                return ((mac.macro_generator.load_generator(comp_args, mac) if
-                        (mac := macros[macro_state.macro_id]).macro_generator is not None
-                        else CompilerResult.error(
-                    f"[ERROR] Macro \"{mac.macro_opener}\" in file \"{mac.file}\" at line <{mac.macro_start_line_no}>"
-                    f" was determined to be a generated macro but no generator instance present")
-                        ) or CompilerResult.ok()).not_empty_or_ok()
-            return CompilerResult.ok()
+    if macro_end_matches is None:
+        return None
+    macro_state.macro_end = macro_end_matches.group(1)
+    if create_macro_instance(macro_state, macros, line_no, diagnostics) is not None:
+        return True
+    if not (mac := macros[macro_state.macro_id]).generated_macro:
+        return False
+    if mac.macro_generator is None:
+        diagnostics.error("missing-generator", "[ERROR] Macro \"{}\" in file \"{}\" at line <{}> was determined to be a "
+                          "generated macro but no generator instance present", mac.macro_opener, mac.file,
+                          mac.macro_start_line_no, file=mac.file, line=mac.macro_start_line_no)
+        return True
+    # generators still answer with a CompilerResult
+    if (res := mac.macro_generator.load_generator(comp_args, mac)) is None:
+        return False
+    diagnostics.accumulate(res)
+    return res.status is not None and res.status != CompilerErrorLevels.OK
 
 
 def load_macro_body(lines_iter: enumerate[str],
-                    macro_generators: dict[str, Type[MacroGenerator]],
-                    macros: dict[int, Macro], macro_state: MacroLoadingState,
-                    comp_args: CompilerArgs) -> CompilerResult | None:
-    macro_args = get_macro_arg_types(macro_state)
-    if isinstance(macro_args, CompilerResult):
-        return macro_args
+                    macro_generators: Mapping[str, Type[MacroGenerator]],
+                    macros: MacroRegistry, macro_state: MacroLoadingState,
+                    comp_args: CompilerArgs, diagnostics: Diagnostics) -> Diagnostics | None:
+    macro_args = get_macro_arg_types(macro_state, diagnostics)
+    if macro_args is None:
+        return diagnostics
     macro_state.macro_args = macro_args
     while True:
         line_no, line = next(lines_iter, (None, None))
         if line is None:
-            return CompilerResult.error(
-                f"[ERROR] Expected #endmacro after #macro in file \"{macro_state.file}\" at line"
-                f" <{macro_state.macro_start_line_no}>")
+            diagnostics.error("unclosed-macro", "[ERROR] Expected #endmacro after #macro in file \"{}\" at line <{}>",
+                              macro_state.file, macro_state.macro_start_line_no, file=macro_state.file,
+                              line=macro_state.macro_start_line_no)
+            return diagnostics
         elif line.startswith("//"):
             continue
-        elif (res := handle_macro_generator(line, line_no, macro_state, lines_iter, macro_generators)) is not None:
-            if res.status != CompilerErrorLevels.OK:
-                return res
+        elif (stops := handle_macro_generator(line, line_no, macro_state, lines_iter, macro_generators,
+                                              diagnostics)) is not None:
+            if stops:
+                return diagnostics
             continue
         elif line == "...":
             macro_state.complex_macro = True
             macro_state.currently_macro_top = False
-        elif (res := handle_macro_end(line, macro_state, macros, line_no, comp_args)) is not None:
-            if res.status != CompilerErrorLevels.OK:
-                return res
+        elif (stops := handle_macro_end(line, macro_state, macros, line_no, comp_args, diagnostics)) is not None:
+            if stops:
+                return diagnostics
             break
         else:
             macro_append_line(line, macro_state)
@@ -563,11 +630,12 @@ def macro_append_line(line: str, macro_state: MacroLoadingState):
         macro_state.macro_bottom.append(line)
 
 
-def load_macros(macros: dict[int, Macro], file, lines: list[str],
-                macro_generators: dict[str, Type[MacroGenerator]], comp_args: CompilerArgs) -> CompilerResult:
+def load_macros(macros: MacroRegistry, file, lines: list[str],
+                macro_generators: Mapping[str, Type[MacroGenerator]], comp_args: CompilerArgs) -> Diagnostics:
     REGEX_CACHE.add_pattern_if_not_added(macro_reg=r"#\s*macro\s*(.+)")
     REGEX_CACHE.add_pattern_if_not_added(macro_end_reg=r"#\s*endmacro\s*(.+)?")
     REGEX_CACHE.add_pattern_if_not_added(macro_generator_reg=r"#\s*macrogenerator\s*(.+)")
+    diagnostics = Diagnostics(file)
     lines_iter = enumerate(lines)
     for line_no, line in lines_iter:
         matches = REGEX_CACHE.get_by_name("macro_reg").match(line)
@@ -575,61 +643,48 @@ def load_macros(macros: dict[int, Macro], file, lines: list[str],
             continue
         if len(matches.groups()) >= 1:
             macro_state = MacroLoadingState(matches.group(1), file, line_no)
-            if (res := load_macro_body(lines_iter, macro_generators,
-                                       macros, macro_state, comp_args)) is not None:
+            if (res := load_macro_body(lines_iter, macro_generators, macros, macro_state, comp_args,
+                                       diagnostics)) is not None:
                 return res
-    return CompilerResult.ok()
-
-
-def match_instruction(inst: str, line: str) -> bool:
-    inst = escape_instruction(inst)
-    for t, repl in TYPE_REGEX_MATCH_REPLACERS.items():
-        inst = inst.replace(t, repl)
+    return diagnostics.extend(macros.take_ambiguities())
 
-    res = regex.match(inst, line)
-    return bool(res)
 
-
-def is_only_native_instructions(curr_compile_lines: list[str]):
-    for line in curr_compile_lines:
-        if line == '':
-            continue
-        if line.startswith('#'):
-            continue
-        if line.startswith("//"):
-            continue
-        if REGEX_CACHE.get_by_name("lbl_reg").match(line) is not None:
-            continue
-        found = False
-        for inst in NATIVE_INSTRUCTIONS.keys():
-            if match_instruction(inst.lower(), line):
-                found = True
-                break
-        if not found:
-            return False
-    return True
+def macro_arg_value(match: Match[str], groups: tuple[str, ...], macro: Macro, macro_id: int) -> str:
+    match match.group(0):
+        case "%__macro_id":
+            return str(macro_id)
+        case "%__macro_no":
+            return str(macro.macro_no)
+        case "%__macro_head":
+            return macro.macro_opener
+    arg_no = int(match.group(1))
+    if 0 < arg_no <= len(groups) and groups[arg_no - 1] is not None:
+        return groups[arg_no - 1]
+    return match.group(0)
 
 
 def resolve_args(macro_line, args, macro: Macro, macro_id: int, variable_memory_pos: dict[str, int]):
-    for i in range(0, len(args.groups())):
-        macro_line = macro_line.replace(f"%{i + 1}", args.group(i + 1)).replace("%__macro_id", str(macro_id)). \
-            replace("%__macro_no", str(macro.macro_no)).replace("%__macro_head", macro.macro_opener)
-        for var_name, var_pos in variable_memory_pos.items():
-            macro_line = macro_line.replace(f"[*{var_name}]", str(var_pos))
-    return macro_line
-
-
-def escape_instruction(inst: str) -> str:
-    return inst.replace("(", r"\(").replace("{", r"\{").replace(")", r"\)").replace("}", r"\}")
-
-
-def resolve_macro(curr_compile_lines: list[str], line_no: int, macro: Macro, macro_id: int, macros: list[Macro],
-                  variable_memory_pos: dict[str, int], cmp_args: CompilerArgs) -> CompilerResult:
+    if macro_line.find("%") != -1:
+        groups = args.groups()
+        macro_line = REGEX_CACHE.get_by_name("macro_arg_reg").sub(
+            lambda match: macro_arg_value(match, groups, macro, macro_id), macro_line)
+    # runs after the arguments are in, "[%1]" with a variable argument becomes a lookup
+    return resolve_variable_lookups(macro_line, variable_memory_pos)
+
+
+def resolve_variable_lookups(line: str, variable_memory_pos: dict[str, int]) -> str:
+    if line.find("[*") == -1:
+        return line
+    return REGEX_CACHE.get_by_name("var_lookup_reg").sub(
+        lambda match: f"{address:.0f}" if (address := variable_memory_pos.get(match.group(1))) is not None
+        else match.group(0), line)
+
+
+def expand_macro(inst: Instruction, body: list[Instruction], args: Match[str], macro: Macro, macro_id: int,
+                 macros: MacroRegistry, variable_memory_pos: dict[str, int],
+                 cmp_args: CompilerArgs) -> tuple[list[Instruction], list[Instruction], list[Instruction]] | \
+        CompilerResult:
     macro.macro_no = macro.macro_no + 1
-    macro_pattern = escape_instruction(macro.macro_opener)
-    for t, repl in TYPE_REGEX_MATCH_REPLACERS.items():
-        macro_pattern = macro_pattern.replace(t, repl)
-    args = regex.match(macro_pattern, curr_compile_lines[line_no])
 
     if macro.generated_macro:
         try:
@@ -637,82 +692,213 @@ def resolve_macro(curr_compile_lines: list[str], line_no: int, macro: Macro, mac
                                                            list(args.groups()))).status != CompilerErrorLevels.OK:
                 return res
         except Exception as e:
-            return CompilerResult.error(f"[ERROR] Error in macro generator for macro \"{macro.macro_opener}\" "
-                                        f"in file \"{macro.file}\" at line <{macro.macro_start_line_no}> "
-                                        f"with message \"{e}\"")
+            return instruction_error(inst, macros.provenance, "generator-failed",
+                                     "[ERROR] Error in macro generator for macro \"{}\" in file \"{}\" at line <{}> "
+                                     "with message \"{}\"", macro.macro_opener, macro.file, macro.macro_start_line_no, e)
     if macro.complex_macro:
-        resolve_complex_macro(args, curr_compile_lines, line_no, macro, macro_id, macros, variable_memory_pos)
-    else:
-        del curr_compile_lines[line_no]
-        for i in reversed(range(0, len(macro.macro_top))):
-            curr_compile_lines.insert(line_no, resolve_args(macro.macro_top[i], args, macro, macro_id,
-                                                            variable_memory_pos))
-    return CompilerResult.ok()
+        return expand_complex_macro(args, inst, body, macro, macro_id, macros, variable_memory_pos)
+    return render_macro(args, inst, macro, macro_id, macros, variable_memory_pos)[0], [], []
+
+
+def render_macro_lines(lines: list[str], args: Match[str], inst: Instruction, macro: Macro, macro_id: int,
+                       variable_memory_pos: dict[str, int], provenance: int) -> list[Instruction]:
+    chain = inst.chain + (macro_id,)
+    return [lex_line(resolve_args(line, args, macro, macro_id, variable_memory_pos), inst.origin, chain, provenance)
+            for line in lines]
+
+
+def render_macro(args: Match[str], inst: Instruction, macro: Macro, macro_id: int, macros: MacroRegistry,
+                 variable_memory_pos: dict[str, int]) -> tuple[list[Instruction], list[Instruction]]:
+    # only complex macros have a bottom part that gets emitted
+    bottom_lines = macro.macro_bottom if macro.complex_macro else []
+    # every line of this expansion shares one row
+    provenance = macros.provenance.add(macro.file, macro.macro_start_line_no, inst.provenance)
+    cache = macros.expansion_cache
+    if not cache.is_cacheable(macro_id, macro):
+        return render_macro_lines(macro.macro_top, args, inst, macro, macro_id, variable_memory_pos, provenance), \
+            render_macro_lines(bottom_lines, args, inst, macro, macro_id, variable_memory_pos, provenance)
+    key = (macro_id, args.groups())
+    if (rendered := cache.get(key)) is None:
+        rendered = render_macro_lines(macro.macro_top, args, inst, macro, macro_id, variable_memory_pos, provenance), \
+            render_macro_lines(bottom_lines, args, inst, macro, macro_id, variable_memory_pos, provenance)
+        cache.put(key, rendered)
+        return rendered
+    # cached lines are shared, every use gets its own copies with the origin of the call site
+    chain = inst.chain + (macro_id,)
+    top, bottom = rendered
+    return [line.at(inst.origin, chain, provenance) for line in top], \
+        [line.at(inst.origin, chain, provenance) for line in bottom]
+
+
+def pair_blocks(lines: Iterable[tuple[T, Instruction]], macros: MacroRegistry, blocks: dict[T, T],
+                stop_when_closed: bool = False) -> list[tuple[Instruction, str]]:
+    open_blocks: list[tuple[T, Instruction, str]] = []
+    for key, inst in lines:
+        if len(open_blocks) > 0 and inst.text == open_blocks[-1][2]:
+            blocks[open_blocks.pop()[0]] = key
+            if stop_when_closed and len(open_blocks) == 0:
+                break
+        elif (closer := macros.block_closer(inst.text)) is not None:
+            open_blocks.append((key, inst, closer))
+    return [(inst, closer) for _, inst, closer in open_blocks]
+
+
+def unclosed_blocks_error(unclosed: list[tuple[Instruction, str]], provenance: ProvenanceTable) -> CompilerResult:
+    blocks = ", ".join(f"\"{inst}\" at line <{inst.origin}> is missing \"{closer}\"" for inst, closer in unclosed)
+    return instruction_error(unclosed[0][0], provenance, "unclosed-block", "[ERROR] unbalanced block macros, {}", blocks)
+
+
+def expand_complex_macro(args: Match[str], inst: Instruction, body: list[Instruction], macro: Macro, macro_id: int,
+                         macros: MacroRegistry, variable_memory_pos: dict[str, int]) -> \
+        tuple[list[Instruction], list[Instruction], list[Instruction]]:
+    top, bottom = render_macro(args, inst, macro, macro_id, macros, variable_memory_pos)
+    # body lines stay part of the code that invoked the macro, untouched lines are not lexed again
+    resolved_body = [line if (text := resolve_args(line.text, args, macro, macro_id, variable_memory_pos)) == line.text
+                     else lex_line(text, line.origin, line.chain, line.provenance) for line in body]
+    return top, resolved_body, bottom
+
+
+def check_macro_recursion(inst: Instruction, macro: Macro, macro_id: int,
+                          macros: MacroRegistry) -> CompilerResult | None:
+    if (macro_id in inst.chain and not macro.generated_macro) or len(inst.chain) >= MACRO_DEPTH_LIMIT:
+        call_chain = " -> ".join(f"\"{macros[m].macro_opener}\"" for m in inst.chain[-10:])
+        return instruction_error(inst, macros.provenance, "recursive-macro",
+                                 "[ERROR] recursive macro \"{}\" in file \"{}\" at line <{}> used by \"{}\", expanded "
+                                 "from {}", macro.macro_opener, macro.file, macro.macro_start_line_no, inst.text,
+                                 call_chain)
+    return None
 
 
-def resolve_complex_macro(args: Match[str], curr_compile_lines: list[str], line_no: int, macro: Macro, macro_id: int,
-                          macros: list[Macro], variable_memory_pos: dict[str, int]) -> None:
-    level = 0
-    macro_line_no = line_no
-    body: list[str] = []
-    while macro_line_no < len(curr_compile_lines) - 1:
-        macro_line_no = macro_line_no + 1
-        for curr_macro in macros:
-            if curr_macro.macro_closer == macro.macro_closer:
-                if match_instruction(macro.macro_opener, curr_compile_lines[macro_line_no]):
-                    level = level + 1
-        if curr_compile_lines[macro_line_no] == macro.macro_closer:
-            if level > 0:
-                level = level - 1
-            else:
-                break
-        body.append(curr_compile_lines[macro_line_no])
-    del curr_compile_lines[line_no:macro_line_no + 1]
-    for i in reversed(range(0, len(macro.macro_bottom))):
-        curr_compile_lines.insert(line_no, resolve_args(macro.macro_bottom[i], args, macro, macro_id,
-                                                        variable_memory_pos))
-    for i in reversed(range(0, len(body))):
-        curr_compile_lines.insert(line_no, resolve_args(body[i], args, macro, macro_id, variable_memory_pos))
-    for i in reversed(range(0, len(macro.macro_top))):
-        curr_compile_lines.insert(line_no, resolve_args(macro.macro_top[i], args, macro, macro_id,
-                                                        variable_memory_pos))
-
-
-def resolve_macros(curr_compile_lines: list[str], macros: dict[int, Macro],
-                   variable_memory_pos: dict[str, int], cmp_args: CompilerArgs) -> CompilerResult:
-    for line_no, line in enumerate(curr_compile_lines):
-        if line == '':
+def block_closer_node(buffer: LineBuffer, node: LineNode, macro: Macro, blocks: dict[LineNode, LineNode],
+                      macros: MacroRegistry) -> LineNode | CompilerResult:
+    closer = blocks.pop(node, None)
+    # blocks opened by an expansion were not paired up front
+    if closer is None or closer.removed or closer.inst.text != macro.macro_closer:
+        if len(unclosed := pair_blocks(((n, n.inst) for n in buffer.nodes_from(node)), macros, blocks, True)) > 0:
+            return unclosed_blocks_error(unclosed, macros.provenance)
+        closer = blocks.pop(node)
+    return closer
+
+
+def expand_macro_at(buffer: LineBuffer, node: LineNode, blocks: dict[LineNode, LineNode], macros: MacroRegistry,
+                    variable_memory_pos: dict[str, int], cmp_args: CompilerArgs) -> \
+        tuple[LineNode | None, list[LineNode], tuple[list[Instruction], ...]] | CompilerResult | None:
+    inst = node.inst
+    if inst.text == '' or (found := macros.match(inst.text)) is None:
+        if not (inst.text == '' or inst.is_native() or inst.is_label or inst.is_comment or inst.text.startswith('#')):
+            return instruction_error(inst, macros.provenance, "unresolved-instruction",
+                                     "[ERROR] can not resolve instruction \"{}\" to any macro or std instruction",
+                                     inst.text)
+        return None
+    macro_id, macro, args = found
+    if macros.profile is not None:
+        macros.profile.expansions[macro_id] += 1
+    if (res := check_macro_recursion(inst, macro, macro_id, macros)) is not None:
+        return res
+    closer = None
+    body_nodes: list[LineNode] = []
+    if macro.complex_macro:
+        if isinstance(closer := block_closer_node(buffer, node, macro, blocks, macros), CompilerResult):
+            return closer
+        body_nodes = list(buffer.nodes_from(node.next, closer))
+    if isinstance(res := expand_macro(inst, [n.inst for n in body_nodes], args, macro, macro_id, macros,
+                                      variable_memory_pos, cmp_args), CompilerResult):
+        return res
+    return closer, body_nodes, res
+
+
+def splice_expansion(buffer: LineBuffer, node: LineNode, closer: LineNode | None, body_nodes: list[LineNode],
+                     expansion: tuple[list[Instruction], ...], active_end: LineNode) -> tuple[LineNode, LineNode]:
+    top, body, bottom = expansion
+    if closer is None:
+        first, after = buffer.splice(node, 1, top)
+    else:
+        # body nodes are updated in place so block pairs inside the body stay valid
+        for body_node, inst in zip(body_nodes, body):
+            body_node.inst = inst
+        _, after = buffer.splice(closer, 1, bottom)
+        first, _ = buffer.splice(node, 1, top)
+        if any(body_node is active_end for body_node in body_nodes):
+            active_end = after
+    if active_end.removed:
+        active_end = after
+    return first, active_end
+
+
+def expand_macro_round(buffer: LineBuffer, pending: Iterator[LineNode], blocks: dict[LineNode, LineNode],
+                       macros: MacroRegistry, variable_memory_pos: dict[str, int],
+                       cmp_args: CompilerArgs) -> list[LineNode] | CompilerResult:
+    deferred: list[LineNode] = []
+    deferred_nodes: set[LineNode] = set()
+    for node in pending:
+        if node.removed or node in deferred_nodes:
             continue
-        for macro_id, macro in macros.items():
-            if match_instruction(macro.macro_opener, line):
-                if (res := resolve_macro(curr_compile_lines, line_no, macro, macro_id, list(macros.values()),
-                                         variable_memory_pos, cmp_args)).status != CompilerErrorLevels.OK:
-                    return res
+        # nodes before active_end were emitted by an expansion in this round and are examined right away
+        active_end = node.next
+        while node is not active_end and not buffer.is_end(node):
+            if (res := expand_macro_at(buffer, node, blocks, macros, variable_memory_pos, cmp_args)) is None:
+                node = node.next
+                continue
+            if isinstance(res, CompilerResult):
+                return res
+            first, active_end = splice_expansion(buffer, node, *res, active_end)
+            if buffer.is_end(first):
                 break
-        else:
-            for inst in NATIVE_INSTRUCTIONS.keys():
-                if match_instruction(inst.lower(), line):
-                    break
-            else:
-                if REGEX_CACHE.get_by_name("lbl_reg").match(line) is not None:
-                    # excluded label declarations
-                    continue
-                if line.startswith("//"):
-                    continue
-                return CompilerResult.error(
-                    f"[ERROR] can not resolve instruction \"{line}\" "
-                    f"to any macro or std instruction")
+            # like the line by line rescan this replaced, the first line of an expansion is picked up in the next
+            # round, this keeps %__macro_no numbering and generator call order unchanged
+            deferred.append(first)
+            deferred_nodes.add(first)
+            if first is active_end:
+                break
+            node = first.next
+    return deferred
+
+
+def resolve_macros(curr_compile_lines: list[Instruction], macros: MacroRegistry,
+                   variable_memory_pos: dict[str, int], cmp_args: CompilerArgs) -> CompilerResult:
+    buffer = LineBuffer(curr_compile_lines)
+    blocks: dict[LineNode, LineNode] = {}
+    if len(unclosed := pair_blocks(((node, node.inst) for node in buffer.nodes()), macros, blocks)) > 0:
+        return unclosed_blocks_error(unclosed, macros.provenance)
+    pending = iter(list(buffer.nodes()))
+    while True:
+        start = time.perf_counter_ns()
+        if isinstance(res := expand_macro_round(buffer, pending, blocks, macros, variable_memory_pos, cmp_args),
+                      CompilerResult):
+            return res
+        if macros.profile is not None:
+            macros.profile.expansion_rounds.append(time.perf_counter_ns() - start)
+        if len(res) == 0:
+            break
+        pending = iter(res)
+    curr_compile_lines[:] = buffer
     return CompilerResult.ok()
 
 
 def write_file(file_name, curr_compile_lines):
     file = open(file_name, "wt")
     for line in curr_compile_lines:
-        file.write(line + "\n")
+        file.write(f"{line}\n")
     file.close()
 
 
-def copy_lines_exclude_compiler_instructions(curr_compile_lines: list[str], lines: list[str]) -> CompilerResult:
+def lex_line(line: str, origin: int, chain: tuple[int, ...] = (), provenance: int = NO_PROVENANCE) -> Instruction:
+    if line.startswith("//"):
+        return Instruction(line, None, (), "", None, origin, is_comment=True, chain=chain, provenance=provenance)
+    if (label := REGEX_CACHE.get_by_name("lbl_reg").match(line)) is not None:
+        return Instruction(line, None, (), "", None, origin, is_label=True, label=label.group(1), chain=chain,
+                           provenance=provenance)
+    if (decoded := NATIVE_DECODER.decode_operands(line)) is not None:
+        _, inst_id, mnemonic, operands = decoded
+        operands = tuple(operands)
+        return Instruction(line, mnemonic, operands, line[len(Instruction.render(mnemonic, operands, "")):],
+                           inst_id, origin, chain=chain, provenance=provenance)
+    return Instruction(line, None, (), "", None, origin, chain=chain, provenance=provenance)
+
+
+def copy_lines_exclude_compiler_instructions(curr_compile_lines: list[Instruction], lines: list[str],
+                                             file: str | None = None) -> Diagnostics:
+    diagnostics = Diagnostics(file)
     ln_enum = enumerate(lines)
     for ln_no, ln in ln_enum:
         if ln.startswith("#memorylayout"):
@@ -720,84 +906,69 @@ def copy_lines_exclude_compiler_instructions(curr_compile_lines: list[str], line
             while ln.find("#endmemorylayout") == -1:
                 ln_no, ln = next(ln_enum, (None, None))
                 if ln is None:
-                    return CompilerResult.error(
-                        f"[ERROR] expected #endmemorylayout after #memorylayout at ln <{line_no_start}>")
+                    diagnostics.error("unclosed-memorylayout", "[ERROR] expected #endmemorylayout after #memorylayout "
+                                      "at ln <{}>", line_no_start, line=line_no_start)
+                    return diagnostics
         elif ln.startswith("#macro"):
             line_no_start = ln_no
             while not ln.startswith("#endmacro"):
                 ln_no, ln = next(ln_enum, (None, None))
                 if ln is None:
-                    return CompilerResult.error(f"[ERROR] expected #endmacro after #macro at ln <{line_no_start}>")
+                    diagnostics.error("unclosed-macro", "[ERROR] expected #endmacro after #macro at ln <{}>",
+                                      line_no_start, line=line_no_start)
+                    return diagnostics
         elif ln.startswith("#"):
             continue
         else:
-            curr_compile_lines.append(ln)
-    return CompilerResult.ok()
+            curr_compile_lines.append(lex_line(ln, ln_no))
+    return diagnostics
 
 
-def resolve_labels(curr_compile_lines: list[str]) -> bool:
-    curr = 0
-    max_iter = 1000
-    finished = False
+def collect_labels(curr_compile_lines: list[Instruction]) -> dict[str, int]:
+    labels: dict[str, int] = {}
+    instruction_no = 0
+    for inst in curr_compile_lines:
+        if inst.is_comment or inst.text == '':
+            continue
+        if inst.is_label:
+            # a label points at the instruction after it, the first declaration of a name wins
+            labels.setdefault(f"~{inst.label}", instruction_no + 1)
+            continue
+        instruction_no = instruction_no + 1
+    return labels
 
-    while curr < max_iter and not finished:
-        curr = curr + 1
-        found = False
-        instruction_no = 0
-        for line_no in range(len(curr_compile_lines)):
-            if curr_compile_lines[line_no].startswith('//') or curr_compile_lines[line_no] == '':
-                continue
-            instruction_no = instruction_no + 1
-            matches = REGEX_CACHE.get_by_name("lbl_reg").match(curr_compile_lines[line_no])
-            if matches is not None:
-                if len(matches.groups()) > 0:
-                    found = True
-                    del curr_compile_lines[line_no]
-                    for i in range(len(curr_compile_lines)):
-                        curr_compile_lines[i] = curr_compile_lines[i].replace("~" + matches.group(1),
-                                                                              f"{instruction_no}")
-                    break
-        if not found:
-            break
-    if not curr < max_iter:
-        print(f"[ERROR] Internal compiler error to many labels max of {max_iter} reached")
-        return False
-    return True
 
+def resolve_instruction_labels(inst: Instruction, labels: dict[str, int]) -> Instruction:
+    for i, (kind, text) in enumerate(inst.operands):
+        if kind == MacroTypes.LABEL and (instruction_no := labels.get(text)) is not None:
+            inst = inst.with_operand(i, MacroTypes.NUMBER, f"{instruction_no}")
+    return inst
 
-def resolve_variables(curr_compile_lines: list[str], variable_memory_pos: dict[str, int]):
-    for line_no in range(len(curr_compile_lines)):
-        for var, address in variable_memory_pos.items():
-            curr_compile_lines[line_no] = curr_compile_lines[line_no].replace(f"*{var}", f"*{address:.0f}")
 
-
-def instructions_to_rom(curr_compile_lines: list[str], rom_translation: list[(int, int, int)]) -> CompilerResult:
-    for line in curr_compile_lines:
-        if line == '':
-            continue
-        if line.startswith('//'):
-            continue
-        if (res := instruction_to_rom(line, rom_translation)) is not None:
-            return res
-    return CompilerResult.ok()
+def resolve_variables(curr_compile_lines: list[Instruction], variable_memory_pos: dict[str, int]):
+    for line_no, inst in enumerate(curr_compile_lines):
+        for i, (kind, text) in enumerate(inst.operands):
+            if kind == MacroTypes.VARIABLE and (address := variable_memory_pos.get(text[1:])) is not None:
+                inst = inst.with_operand(i, MacroTypes.MEMORY_ADDRESS, f"*{address:.0f}")
+                curr_compile_lines[line_no] = inst
 
 
-def call_language_handler(curr_compile_lines: list[str], curr_compile_lines_label: list[str],
-                          rom_instructions: list[(int, int, int)],
-                          rom_instructions_label: list[(int | str, int | None, int | None)],
-                          args: CompilerArgs) -> CompilerResult:
-    module = importlib.import_module(f"out_targets.{args.target_lang.upper()}")
-    if module is None:
+def call_language_handler(lines: Iterable[EncodedLine], args: CompilerArgs) -> CompilerResult:
+    try:
+        lang_class = OUT_TARGETS[args.target_lang.lower()]
+    except ImportError as e:
+        return CompilerResult.error(f"[ERROR] Failed to import language modul for language \"{args.target_lang}\""
+                                    f" with error \"{e}\"")
+    except KeyError:
         return CompilerResult.error(f"[ERROR] Cannot find language modul for language \"{args.target_lang}\"")
-    lang_class = getattr(module, args.target_lang.upper(), None)
-    if lang_class is None:
-        return CompilerResult.error(f"[ERROR] Language modul \"{args.target_lang}\" did not contain a handler class")
-    lang_func = getattr(lang_class, f"{LanguageTarget.transpile.__name__}", None)
-    if lang_func is None:
+    if getattr(lang_class, LanguageTarget.transpile.__name__, None) is None:
         return CompilerResult.error(f"[ERROR] Language class \"{args.target_lang}\" did not contain a handler function")
     try:
-        res = lang_func(lang_class, curr_compile_lines, curr_compile_lines_label, rom_instructions,
-                        rom_instructions_label, args, WORKING_DIR)
+        target = lang_class()
+        # targets that only implement the list based transpile are fed through the adapter of the base class
+        lang_func = target.transpile_stream if isinstance(target, LanguageTarget) else \
+            functools.partial(LanguageTarget.transpile_stream, target)
+        res = lang_func(lines, args, WORKING_DIR)
         if not isinstance(res, CompilerResult):
             raise TypeError(
                 f"{args.target_lang.upper()}.{LanguageTarget.transpile.__name__}() return type expected "
@@ -810,116 +981,153 @@ def call_language_handler(curr_compile_lines: list[str], curr_compile_lines_labe
             f" Details: {e.__str__()}")
 
 
-def instruction_to_rom(line: str,
-                       rom_instructions_labels: list[(int | str, int | None, int | None)]) -> CompilerResult | None:
-    for inst, inst_id in NATIVE_INSTRUCTIONS.items():
-        if match_instruction(inst, line):
-            parts = line.replace('*', '').split(' ')
-            if inst.find("%label"):
-                if len(parts) > 2:
-                    rom_instructions_labels.append((inst_id, parts[1], parts[2]))
-                elif len(parts) > 1:
-                    rom_instructions_labels.append((inst_id, parts[1], 0))
-                else:
-                    rom_instructions_labels.append((inst_id, 0, 0))
-            else:
-                if not add_rom_instruction(inst_id, parts, rom_instructions_labels):
-                    return CompilerResult.error(
-                        f"[ERROR] instruction \"{line}\" contains parts that can not be converted to rom"
-                        f" instructions (Probably compiler problem)")
-            return None
-    return CompilerResult.error(
-        f"[ERROR] Instruction \"{line}\" can not be resolved to a Native instruction after compiling,"
-        f" exiting! (Probably compiler problem)")
+def instruction_to_rom(inst: Instruction, rom_instructions_labels: list[(int | str, int | None, int | None)],
+                       keep_labels: bool) -> CompilerResult | None:
+    if not inst.is_native():
+        return CompilerResult.error(
+            f"[ERROR] Instruction \"{inst}\" can not be resolved to a Native instruction after compiling,"
+            f" exiting! (Probably compiler problem)")
+    parts: list[int | str] = [0, 0]
+    for i, (kind, text) in enumerate(inst.operands):
+        part = operand_to_rom(kind, text)
+        if part is None or (isinstance(part, str) and not keep_labels):
+            return CompilerResult.error(
+                f"[ERROR] instruction \"{inst}\" contains the unresolved label or variable \"{text}\"")
+        parts[i] = part
+    rom_instructions_labels.append((inst.inst_id, parts[0], parts[1]))
+    return None
 
 
-def instructions_to_rom_labels(curr_compile_lines_labels: list[str],
-                               rom_instructions_labels: list[
-                                   (int | str, int | None | str, int | None)]) -> CompilerResult:
-    for line in curr_compile_lines_labels:
-        m = REGEX_CACHE.get_by_name("lbl_reg").match(line)
-        if line == '':
-            continue
-        if line.startswith('//'):
-            rom_instructions_labels.append((line, None, None))
+def check_encodable(curr_compile_lines_labels: list[Instruction], labels: dict[str, int],
+                    provenance: ProvenanceTable) -> CompilerResult:
+    # everything encode_lines could trip over is reported before a target starts writing its output
+    for inst in curr_compile_lines_labels:
+        if inst.text == '' or inst.is_comment or inst.is_label:
             continue
-        if m is not None:
-            rom_instructions_labels.append((m, None, None))
-            continue
-        if (res := instruction_to_rom(line, rom_instructions_labels)) is not None:
-            return res
+        if not inst.is_native():
+            return instruction_error(inst, provenance, "not-native",
+                                     "[ERROR] Instruction \"{}\" can not be resolved to a Native instruction after "
+                                     "compiling, exiting! (Probably compiler problem)", inst.text)
+        for kind, text in inst.operands:
+            if kind not in ROM_OPERAND_TYPES or (kind == MacroTypes.LABEL and text not in labels):
+                return instruction_error(inst, provenance, "unresolved-operand",
+                                         "[ERROR] instruction \"{}\" contains the unresolved label or variable "
+                                         "\"{}\"", inst.text, text)
     return CompilerResult.ok()
 
 
+def instruction_error(inst: Instruction, provenance: ProvenanceTable, code: str, template: str,
+                      *args) -> CompilerResult:
+    # the record points at the innermost macro the line came from, the message names every expansion up to the
+    # line of the compiled file
+    file, line = provenance.locations(inst.provenance, inst.origin)[0]
+    diagnostics = Diagnostics(provenance.source)
+    diagnostics.error(code, f"{template} {{}}", *args, provenance.describe(inst.provenance, inst.origin), file=file,
+                      line=line)
+    return diagnostics.to_result()
+
+
+def write_source_map(path: str | os.PathLike, curr_compile_lines: list[Instruction],
+                     provenance: ProvenanceTable) -> None:
+    # instructions are numbered like label targets, lines count from 0 like in the compiler messages
+    with open(path, "wt") as file:
+        file.write(f"version {SOURCE_MAP_FORMAT_VERSION}\nsource {provenance.source}\n")
+        file.writelines(f"file {file_id} {name}\n" for file_id, name in enumerate(provenance.files))
+        file.writelines(f"expansion {row} {provenance.file_column[row]} {provenance.line_column[row]} "
+                        f"{provenance.parent_column[row]}\n" for row in range(len(provenance)))
+        file.writelines(f"instruction {address} {inst.provenance} {inst.origin}\n" for address, inst in enumerate(
+            (inst for inst in curr_compile_lines if not (inst.text == '' or inst.is_comment or inst.is_label)), 1))
+
+
+def encode_instruction(inst: Instruction) -> tuple[int, int | str, int | str]:
+    parts: list[int | str] = [0, 0]
+    for i, (kind, text) in enumerate(inst.operands):
+        parts[i] = operand_to_rom(kind, text)
+    return inst.inst_id, parts[0], parts[1]
+
+
+def encode_lines(curr_compile_lines_labels: list[Instruction], labels: dict[str, int]) -> Iterator[EncodedLine]:
+    # lines are resolved and encoded while the target consumes them, check_encodable has to pass first
+    for inst in curr_compile_lines_labels:
+        if inst.text == '':
+            yield inst, inst.text, None, None
+        elif inst.is_label:
+            yield inst, None, None, (inst.text, None, None)
+        elif inst.is_comment:
+            yield inst, inst.text, None, (inst.text, None, None)
+        elif type((rom := encode_instruction(inst))[1]) is str or type(rom[2]) is str:
+            # every instruction is encoded once with its labels, only the label operands are looked up again
+            yield inst, resolve_instruction_labels(inst, labels).text, \
+                (rom[0], labels.get(rom[1], rom[1]), labels.get(rom[2], rom[2])), rom
+        else:
+            # without labels the plain and the labelled view share the same line and tuple
+            yield inst, inst.text, rom, rom
+
+
 def num_to_int(param: str) -> int:
-    return int(param, 0)
+    return int(param, 16) if param.startswith("0x") else int(param)
+
+
+def operand_to_rom(kind: MacroTypes, text: str) -> int | str | None:
+    match kind:
+        case MacroTypes.REGISTER:
+            return int(text[2:])
+        case MacroTypes.REGISTER_POINTER:
+            return int(text[3:-1])
+        case MacroTypes.NUMBER:
+            return num_to_int(text)
+        case MacroTypes.MEMORY_ADDRESS:
+            return num_to_int(text[1:])
+        case MacroTypes.LABEL:
+            return text
+    return None
 
 
-def register_to_int(param: str) -> int:
-    return int(REGEX_CACHE.get_by_name("register_num_reg").match(param).groups()[0])
+def warning_records(diagnostics: Diagnostics) -> list[Diagnostic]:
+    # kept with a cache entry, a cached load reports them again
+    return [record for record in diagnostics.records if record.status == CompilerErrorLevels.WARNING]
 
 
-def inst_arg_to_rom(param: str) -> int | str:
-    if (match := REGEX_CACHE.get_by_name("%number").match(param)) is not None:
-        return num_to_int(match.group(1))
-    elif (match := REGEX_CACHE.get_by_name("%register").match(param)) is not None:
-        return register_to_int(match.group(1))
-    elif (match := REGEX_CACHE.get_by_name("%address").match(param)) is not None:
-        return num_to_int(match.group(1).replace("*", ""))
-    elif (match := REGEX_CACHE.get_by_name("%registerpointer").match(param)) is not None:
-        return register_to_int(match.group(1))
-    elif (match := REGEX_CACHE.get_by_name("%label").match(param)) is not None:
-        return match.group(1)
+def iter_messages(res: CompilerResult) -> Iterator[tuple[CompilerErrorLevels, str]]:
+    if res.message_count() == 1:
+        yield res.status, res.message
     else:
-        return -1
-
-
-def add_rom_instruction(inst_id, parts, rom_instructions_labels) -> bool:
-    if len(parts) > 2:
-        part_1 = inst_arg_to_rom(parts[1])
-        if part_1 == -1:
-            return False
-        part_2 = inst_arg_to_rom(parts[2])
-        if part_2 == -1:
-            return False
-        rom_instructions_labels.append((inst_id, part_1, part_2))
-    elif len(parts) > 1:
-        part_1 = inst_arg_to_rom(parts[1])
-        if part_1 == -1:
-            return False
-        rom_instructions_labels.append((inst_id, part_1, 0))
-    else:
-        rom_instructions_labels.append((inst_id, 0, 0))
-    return True
+        yield from res.messages
 
 
-def handle_error(res: CompilerResult, args: CompilerArgs) -> CompilerResult | None:
-    if res.status.is_severity_higher(CompilerErrorLevels.OK):
-        if res.message_count() == 1:
-            print(f"{res.status} {res.message}")
-        else:
-            for msg in res.messages:
-                print(f"{msg[0]} {msg[1]}")
-    match res.status:
-        case CompilerErrorLevels.ERROR:
-            return None if args.exit_level == CompilerErrorLevels.NONE else res
-        case CompilerErrorLevels.WARNING:
-            return None if args.exit_level == CompilerErrorLevels.ERROR \
-                           or args.exit_level == CompilerErrorLevels.NONE else res
-        case CompilerErrorLevels.OK:
-            return None
+def load_cached_macros(macros: MacroRegistry, macro_cache: MacroCache, key: str,
+                       macro_generators: Mapping[str, Type[MacroGenerator]]) -> Diagnostics | None:
+    if (entry := macro_cache.load(key)) is None:
+        return None
+    unpacked = [MacroCache.unpack_macro(record, macro_generators) for record in entry["macros"]]
+    if any(macro is None for macro in unpacked):
+        return None
+    for macro_id, macro in unpacked:
+        macros.add(macro_id, macro)
+    # the warnings of the original load are replayed, they depend on the order the files were loaded in
+    macros.take_ambiguities()
+    return Diagnostics().extend(entry["warnings"])
 
 
-def resolve_variable_address_lookup(curr_compile_lines: list[str], variable_memory_pos: dict[str, int]):
-    for line_no in range(len(curr_compile_lines)):
-        for var, address in variable_memory_pos.items():
-            curr_compile_lines[line_no] = curr_compile_lines[line_no].replace(f"[*{var}]", f"{address:.0f}")
+def handle_error(diagnostics: Diagnostics, args: CompilerArgs) -> bool:
+    # called at every phase boundary, each record is printed by the first call after it was added
+    for record in diagnostics.unreported():
+        print(record)
+    return diagnostics.stops(args.exit_level)
 
 
-def load_all_modules_in_directory(path: pathlib.Path) -> list[ModuleType] | CompilerResult:
-    files = [pathlib.Path(file) for file in glob.glob(str(path.joinpath("*.py")))]
+def resolve_variable_address_lookup(curr_compile_lines: list[Instruction], variable_memory_pos: dict[str, int]):
+    for line_no, inst in enumerate(curr_compile_lines):
+        if (line := resolve_variable_lookups(inst.text, variable_memory_pos)) != inst.text:
+            curr_compile_lines[line_no] = lex_line(line, inst.origin, inst.chain, inst.provenance)
+
+
+def load_all_modules_in_directory(path: pathlib.Path, skip: Iterable[str] = ()) -> list[ModuleType] | CompilerResult:
+    files = sorted(path.glob("*.py"))
     modules = []
     for f in files:
+        if f"{f.parent.name}.{f.name[:-3]}" in skip:
+            continue
         if not f.is_file():
             continue
         if not f.suffix == ".py":
@@ -932,116 +1140,385 @@ def load_all_modules_in_directory(path: pathlib.Path) -> list[ModuleType] | Comp
 
 
 def load_macro_generators(macro_generators: dict[str, Type[MacroGenerator]]) -> CompilerResult:
-    modules = load_all_modules_in_directory(COMPILER_FOLDER.joinpath("macro_generator_targets"))
+    # only modules the manifest does not cover, those are imported on demand by the registry
+    modules = load_all_modules_in_directory(COMPILER_FOLDER.joinpath("macro_generator_targets"),
+                                            {entry.partition(":")[0] for entry in MACRO_GENERATOR_PLUGINS.values()})
     if isinstance(modules, CompilerResult):
         return modules
     for module in modules:
-        for name, obj in inspect.getmembers(module):
-            if inspect.isclass(obj):
-                if issubclass(obj, MacroGenerator):
-                    if obj == MacroGenerator:
-                        continue
-                    try:
-                        macro_generators[obj.get_target_language().lower()] = obj
-                    except Exception as e:
-                        return CompilerResult.error(f"Macro generator \"{name}\" did not have a target language"
-                                                    f" function or it threw a error details: {e}")
+        for name, obj in vars(module).items():
+            if isinstance(obj, type) and issubclass(obj, MacroGenerator) and obj.__module__ == module.__name__:
+                try:
+                    macro_generators[obj.get_target_language().lower()] = obj
+                except Exception as e:
+                    return CompilerResult.error(f"Macro generator \"{name}\" did not have a target language"
+                                                f" function or it threw a error details: {e}")
     return CompilerResult.ok()
 
 
-def compile_file(file_path: str, args: CompilerArgs) -> CompilerResult:
-    result: CompilerResult = CompilerResult.empty()
+def discover_macro_generator(lang: str) -> Type[MacroGenerator] | None:
+    macro_generators: dict[str, Type[MacroGenerator]] = {}
+    if (res := load_macro_generators(macro_generators)).status != CompilerErrorLevels.OK:
+        raise ImportError(res.message)
+    return macro_generators.get(lang)
 
-    file = open(file_path, "rt")
 
-    if not file.readable():
-        if handle_error(result.accumulate(CompilerResult.error("Input File Not Readable")), args) is not None:
-            return result
+def discover_out_target(lang: str) -> Type[LanguageTarget] | None:
+    # out_targets/<NAME>.py holding a class <NAME>
+    try:
+        module = importlib.import_module(f"out_targets.{lang.upper()}")
+    except ModuleNotFoundError as e:
+        if e.name != f"out_targets.{lang.upper()}":
+            raise
+        return None
+    return getattr(module, lang.upper(), None)
 
-    lines = read_lines(file)
 
-    file.close()
+def macro_generator_registry(args: CompilerArgs) -> PluginRegistry[MacroGenerator]:
+    # begin_compile runs when a generator is first used in this compile, not for every installed backend
+    return PluginRegistry(MACRO_GENERATOR_PLUGINS, discover_macro_generator,
+                          lambda generator: generator.begin_compile(args))
 
-    if handle_error(result.accumulate(lower_strip_lines(lines)), args) is not None:
-        return result
 
-    imported_files: dict[str, list[str]] = {}
+OUT_TARGETS: PluginRegistry[LanguageTarget] = PluginRegistry(OUT_TARGET_PLUGINS, discover_out_target)
 
-    if handle_error(result.accumulate(get_imported_files(imported_files, lines, file_path)), args) is not None:
-        return result
 
-    for file, file_lines in imported_files.items():
-        if handle_error(result.accumulate(lower_strip_lines(file_lines)), args) is not None:
-            return result
-
-    macro_generators: dict[str, Type[MacroGenerator]] = {}
+@contextlib.contextmanager
+def compile_reports(args: CompilerArgs, profile: CompileProfile, diagnostics: Diagnostics) -> Iterator[None]:
+    # the reports are written however the compile ends, its early returns included
+    profile.start()
+    try:
+        yield
+    finally:
+        profile.stop()
+    if args.profile:
+        print(profile.report())
+        if args.profile_file is not None:
+            profile.write_json(args.profile_file)
+    if args.diagnostics_file is not None:
+        diagnostics.write_json(args.diagnostics_file)
+
+
+def load_included_macros(macros: MacroRegistry, imported_files: dict[str, list[str]], macro_cache: MacroCache | None,
+                         cache_key: str | None, macro_generators: PluginRegistry, diagnostics: Diagnostics,
+                         args: CompilerArgs) -> bool:
+    # returns whether the compile stops
+    if macro_cache is not None and (cached := load_cached_macros(macros, macro_cache, cache_key, macro_generators)) \
+            is not None:
+        diagnostics.info("macro-cache-hit", "[INFO] Macro cache hit for {} included files ({})", len(imported_files),
+                         cache_key[:12])
+        return handle_error(diagnostics.accumulate(cached), args)
 
-    if handle_error(result.accumulate(load_macro_generators(macro_generators)), args) is not None:
-        return result
+    for file, file_lines in imported_files.items():
+        if handle_error(diagnostics.accumulate(lower_strip_lines(file_lines, file)), args):
+            return True
 
-    macros: dict[int, Macro] = {}
+    warnings: list[Diagnostic] = []
     for file, included_lines in imported_files.items():
-        if handle_error(result.accumulate(load_macros(macros, file, included_lines, macro_generators, args)), args) \
-                is not None:
-            return result
+        res = load_macros(macros, file, included_lines, macro_generators, args)
+        warnings.extend(warning_records(res))
+        if handle_error(diagnostics.accumulate(res), args):
+            return True
+
+    if macro_cache is not None and args.cache_dir is not None:
+        stored = macro_cache.store(cache_key, list(macros.items()), warnings)
+        diagnostics.info("macro-cache-miss", "[INFO] Macro cache miss for {} included files ({}){}",
+                         len(imported_files), cache_key[:12], "" if stored else ", entry could not be written")
+    return False
+
+
+def compile_file(file_path: str, args: CompilerArgs, profile: CompileProfile | None = None) -> CompilerResult:
+    # callers that read the phase times themselves bring their own profile
+    if profile is None:
+        profile = CompileProfile(file_path, args.profile_memory) if args.profile else NullProfile(file_path)
+    # informational records are only collected when they are printed
+    diagnostics = Diagnostics(file_path, CompilerErrorLevels.INFO if args.verbose else CompilerErrorLevels.WARNING)
+    with compile_reports(args, profile, diagnostics):
+        file = open(file_path, "rt")
 
-    if handle_error(result.accumulate(load_macros(macros, file_path, lines, macro_generators, args)), args) is not None:
-        return result
-
-    variable_memory_pos: dict[str, int] = {}
-    if handle_error(result.accumulate(get_var_memory_address(lines, variable_memory_pos, args)), args) is not None:
-        return result
-
-    curr_compile_lines: list[str] = []
+        if not file.readable():
+            diagnostics.error("file-not-readable", "[ERROR] Input file \"{}\" is not readable", file_path)
+            if handle_error(diagnostics, args):
+                return diagnostics.to_result()
 
-    if handle_error(result.accumulate(copy_lines_exclude_compiler_instructions(curr_compile_lines, lines)),
-                    args) is not None:
-        return result
+        lines = read_lines(file)
 
-    resolve_variable_address_lookup(curr_compile_lines, variable_memory_pos)
+        file.close()
 
-    depth_limit = 1_000
-    curr_depth = 0
-    while not is_only_native_instructions(curr_compile_lines):
-        curr_depth = curr_depth + 1
-        if handle_error(result.accumulate(
-                resolve_macros(curr_compile_lines, macros, variable_memory_pos, args)), args) is not None:
-            return result
-        if curr_depth >= depth_limit:
-            if handle_error(result.accumulate(CompilerResult.error(
-                    f"[ERROR] recursive macro? encountered depth of {depth_limit} and still found unresolved macros.")),
-                    args) is None:
-                return result
+        if handle_error(diagnostics.accumulate(lower_strip_lines(lines, file_path)), args):
+            return diagnostics.to_result()
+        profile.lap("lower_strip_lines", len(lines), len(lines))
+
+        imported_files: dict[str, list[str]] = {}
+
+        if handle_error(diagnostics.accumulate(get_imported_files(imported_files, lines, file_path)), args):
+            return diagnostics.to_result()
+        imported_lines = sum(len(file_lines) for file_lines in imported_files.values())
+        profile.lap("imports", len(lines), imported_lines)
+
+        macro_cache = MacroCache(args.cache_dir, COMPILER_VERSION, SHARED_LIBRARIES) \
+            if (args.cache_dir is not None or len(SHARED_LIBRARIES) > 0) and len(imported_files) > 0 else None
+        # hashed before lower_strip_lines touches the included lines
+        cache_key = macro_cache.key(imported_files) if macro_cache is not None else None
+
+        macro_generators = macro_generator_registry(args)
+        # generator backends are imported when their first macro is loaded or used
+        profile.nest("load_macro_generators", lambda: (macro_generators.load_ns, len(macro_generators.loaded())))
+
+        macros: MacroRegistry = MacroRegistry(TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES)
+        macros.provenance = ProvenanceTable(file_path)
+        profile.count_macros(macros)
+        if load_included_macros(macros, imported_files, macro_cache, cache_key, macro_generators, diagnostics, args):
+            return diagnostics.to_result()
+
+        if handle_error(diagnostics.accumulate(load_macros(macros, file_path, lines, macro_generators, args)), args):
+            return diagnostics.to_result()
+        profile.lap("load_macros", imported_lines + len(lines), len(macros))
+
+        variable_memory_pos: dict[str, int] = {}
+        if handle_error(diagnostics.accumulate(get_var_memory_address(lines, variable_memory_pos, args, file_path)), args):
+            return diagnostics.to_result()
+        profile.lap("memory_layout", len(lines), len(variable_memory_pos))
+
+        if args.warm:
+            macros.expansion_cache = warm_expansion_cache(macros, variable_memory_pos)
+
+        curr_compile_lines: list[Instruction] = []
+
+        if handle_error(diagnostics.accumulate(
+                copy_lines_exclude_compiler_instructions(curr_compile_lines, lines, file_path)), args):
+            return diagnostics.to_result()
+
+        resolve_variable_address_lookup(curr_compile_lines, variable_memory_pos)
+        lexed_lines = len(curr_compile_lines)
+        profile.lap("lexing", len(lines), lexed_lines)
+
+        if handle_error(diagnostics.accumulate(
+                resolve_macros(curr_compile_lines, macros, variable_memory_pos, args)), args):
+            return diagnostics.to_result()
+        profile.lap("macro_expansion", lexed_lines, len(curr_compile_lines))
+
+        diagnostics.info("macros-resolved", "[INFO] Macros resolved")
+        # the caches and generators keep counting in later compiles, their stats are taken now
+        if diagnostics.keeps(CompilerErrorLevels.INFO):
+            diagnostics.info("expansion-cache", "[INFO] Macro expansion cache: {}", str(macros.expansion_cache))
+            for macro_generator in macro_generators.loaded().values():
+                if (stats := macro_generator.compile_stats()) is not None:
+                    diagnostics.info("generator-stats", "[INFO] {}", stats)
+
+        resolve_variables(curr_compile_lines, variable_memory_pos)
+        diagnostics.info("variables-resolved", "[INFO] Variables resolved")
+        profile.lap("variables", len(curr_compile_lines), len(curr_compile_lines))
+
+        labels = collect_labels(curr_compile_lines)
+        diagnostics.info("labels-resolved", "[INFO] Labels resolved")
+        profile.lap("labels", len(curr_compile_lines), len(labels))
+
+        if handle_error(diagnostics.accumulate(check_encodable(curr_compile_lines, labels, macros.provenance)), args):
+            return diagnostics.to_result()
+        if args.source_map:
+            write_source_map(WORKING_DIR.joinpath(f"{args.out_file}.map"), curr_compile_lines, macros.provenance)
+
+        encoded = encode_lines(curr_compile_lines, labels)
+        profile.lap("rom_encoding", 0, 0)
+        encoded = profile.timed(encoded, "rom_encoding")
+        if handle_error(diagnostics.accumulate(call_language_handler(encoded, args)), args):
+            return diagnostics.to_result()
+        # the target pulls the encoded lines, the time spent producing them is reported as rom_encoding
+        profile.lap("target", len(curr_compile_lines), 0)
+        profile.take_counters(macros, macro_generators.loaded().values())
+
+        return diagnostics.to_result()
+
+
+def expand_sources(sources: Iterable[str]) -> tuple[list[str], list[str]]:
+    files: list[str] = []
+    missing: list[str] = []
+    for source in sources:
+        if os.path.isfile(source):
+            files.append(source)
+        elif len(matches := sorted(file for file in glob.glob(source, recursive=True) if os.path.isfile(file))) > 0:
+            files.extend(matches)
+        else:
+            missing.append(source)
+    return list(dict.fromkeys(files)), missing
 
-    handle_error(result.accumulate(CompilerResult.info("[INFO] Macros resolved")), args)
 
-    resolve_variables(curr_compile_lines, variable_memory_pos)
-    handle_error(result.accumulate(CompilerResult.info("[INFO] Variables resolved")), args)
+def preload_library(file_path: str, args: CompilerArgs) -> tuple[str, tuple[str, ...]] | None:
+    # failures are left to the compile of the file itself, it reports them with the usual messages
+    try:
+        with open(file_path, "rt") as file:
+            lines = read_lines(file)
+    except (OSError, UnicodeDecodeError):
+        return None
+    imported_files: dict[str, list[str]] = {}
+    if lower_strip_lines(lines, file_path).status == CompilerErrorLevels.ERROR or \
+            get_imported_files(imported_files, lines, file_path).status == CompilerErrorLevels.ERROR or \
+            len(imported_files) == 0:
+        return None
+    macro_cache = MacroCache(args.cache_dir, COMPILER_VERSION)
+    if (key := macro_cache.key(imported_files)) in SHARED_LIBRARIES:
+        return key, tuple(imported_files)
+    macros = MacroRegistry(TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES)
+    macro_generators = macro_generator_registry(args)
+    if (entry := macro_cache.load(key)) is None:
+        warnings: list[Diagnostic] = []
+        for file, included_lines in imported_files.items():
+            if lower_strip_lines(included_lines, file).status == CompilerErrorLevels.ERROR:
+                return None
+        for file, included_lines in imported_files.items():
+            res = load_macros(macros, file, included_lines, macro_generators, args)
+            if res.status == CompilerErrorLevels.ERROR:
+                return None
+            warnings.extend(warning_records(res))
+        macro_cache.store(key, list(macros.items()), warnings)
+        entry = macro_cache.entry(key, list(macros.items()), warnings)
+    SHARED_LIBRARIES[key] = entry
+    return key, tuple(imported_files)
+
+
+def warm_library(file_path: str, args: CompilerArgs,
+                 libraries: OrderedDict[tuple[str, ...], str]) -> tuple[str, tuple[str, ...]] | None:
+    # included files are read and hashed on every call, a changed file gives its include set a new key
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaded = preload_library(file_path, args)
+    if loaded is None:
+        return None
+    key, files = loaded
+    if (old := libraries.pop(files, None)) is not None and old != key:
+        SHARED_LIBRARIES.pop(old, None)
+    libraries[files] = key
+    while len(libraries) > MAX_WARM_LIBRARIES:
+        SHARED_LIBRARIES.pop(libraries.popitem(last=False)[1], None)
+    return loaded
 
-    curr_compile_lines_labels: list[str] = curr_compile_lines.copy()
 
-    resolve_labels(curr_compile_lines)
-    handle_error(result.accumulate(CompilerResult.info("[INFO] Labels resolved")), args)
+def expansion_digest(macros: MacroRegistry, variable_memory_pos: dict[str, int]) -> str:
+    algorithm = hashlib.sha256()
+    for macro_id, macro in macros.items():
+        algorithm.update(repr((macro_id, macro.macro_opener, macro.macro_closer, macro.macro_top, macro.macro_bottom,
+                               macro.complex_macro, macro.generated_macro)).encode())
+    algorithm.update(repr(sorted(variable_memory_pos.items())).encode())
+    return algorithm.hexdigest()
+
+
+def warm_expansion_cache(macros: MacroRegistry, variable_memory_pos: dict[str, int]) -> ExpansionCache:
+    # rendered expansions only depend on the macro definitions and the variable addresses, a rebuild that keeps
+    # both reuses the expansions of every unchanged line
+    key = expansion_digest(macros, variable_memory_pos)
+    if (cache := WARM_EXPANSIONS.pop(key, None)) is None:
+        cache = macros.expansion_cache
+    else:
+        cache.reset_counters()
+    WARM_EXPANSIONS[key] = cache
+    while len(WARM_EXPANSIONS) > MAX_WARM_EXPANSIONS:
+        WARM_EXPANSIONS.popitem(last=False)
+    return cache
+
+
+def macro_file_path(name: str) -> pathlib.Path | None:
+    # the file handle_std_macro_files or handle_custom_macro_files read for an include name
+    if (path := COMPILER_FOLDER.joinpath(f"macrodefs/{name}.mccpu")).is_file():
+        return path
+    if WORKING_DIR.joinpath(f"/{name}").is_file():
+        return pathlib.Path(WORKING_DIR.joinpath(f"/{name}").name).absolute()
+    return None
 
-    rom_instructions: list[(int, int, int)] = []
-    rom_instructions_labels: list[(int | str, int | None, int | None)] = []
 
-    if handle_error(result.accumulate(instructions_to_rom(curr_compile_lines, rom_instructions)), args) is not None:
-        return result
-    if handle_error(result.accumulate(instructions_to_rom_labels(curr_compile_lines_labels, rom_instructions_labels)),
-                    args) is not None:
-        return result
+def included_names(file_path: str) -> list[str]:
+    # every include the source names, the ones read before a failing include or a broken macro file included
+    try:
+        with open(file_path, "rt") as file:
+            lines = read_lines(file)
+    except (OSError, UnicodeDecodeError):
+        return []
+    imported_files: dict[str, list[str]] = {}
+    lower_strip_lines(lines, file_path)
+    get_imported_files(imported_files, lines, file_path)
+    return list(imported_files)
 
-    if handle_error(result.accumulate(
-            call_language_handler(curr_compile_lines, curr_compile_lines_labels, rom_instructions,
-                                  rom_instructions_labels,
-                                  args)), args) is not None:
-        return result
 
-    return result.not_empty_or_ok()
+def init_batch_worker(shared_libraries: dict[str, dict]) -> None:
+    SHARED_LIBRARIES.update(shared_libraries)
 
 
-def lower_strip_lines(lines) -> CompilerResult:
+def compile_file_captured(file_path: str, args: CompilerArgs) -> tuple[CompilerResult, str]:
+    # workers print concurrently, the output is handed back so the batch can print it in input order
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            res = compile_file(file_path, args)
+        except Exception as e:
+            res = CompilerResult.error(f"[ERROR] Compiling \"{file_path}\" failed with {type(e).__name__}: {e}")
+            print(f"{res.status} {res.message}")
+    return res, output.getvalue()
+
+
+def batch_out_file(file_path: str, root: str, out: str) -> str:
+    # -o names a directory for batches, the sources keep their layout below it
+    return os.path.join(out, os.path.splitext(os.path.relpath(os.path.abspath(file_path), root))[0])
+
+
+def batch_file_args(files: list[str], args: CompilerArgs) -> list[CompilerArgs]:
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(file)) for file in files])
+    batch_args: list[CompilerArgs] = []
+    for file in files:
+        file_args = copy.copy(args)
+        if len(files) > 1:
+            file_args.out_file = batch_out_file(file, root, args.out_file)
+            if args.profile_file is not None:
+                file_args.profile_file = f"{batch_out_file(file, root, args.profile_file)}.json"
+            if args.diagnostics_file is not None:
+                file_args.diagnostics_file = f"{batch_out_file(file, root, args.diagnostics_file)}.json"
+        WORKING_DIR.joinpath(file_args.out_file).parent.mkdir(parents=True, exist_ok=True)
+        for report_file in (file_args.profile_file, file_args.diagnostics_file):
+            if report_file is not None:
+                WORKING_DIR.joinpath(report_file).parent.mkdir(parents=True, exist_ok=True)
+        batch_args.append(file_args)
+    return batch_args
+
+
+def compile_batch(files: list[str], batch_args: list[CompilerArgs], jobs: int) -> Iterator[tuple[CompilerResult, str]]:
+    if jobs <= 1 or len(files) <= 1:
+        yield from map(compile_file_captured, files, batch_args)
+        return
+    # only batches pay for importing the process pool
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(min(jobs, len(files)), initializer=init_batch_worker,
+                             initargs=(SHARED_LIBRARIES,)) as pool:
+        yield from pool.map(compile_file_captured, files, batch_args)
+
+
+def compile_files(sources: Iterable[str], args: CompilerArgs, jobs: int = 1) -> list[tuple[str, CompilerResult]]:
+    files, missing = expand_sources(sources)
+    results: list[tuple[str, CompilerResult]] = []
+    for source in missing:
+        results.append((source, CompilerResult.error(f"[ERROR] Source file \"{source}\" was not found")))
+        print(f"{results[-1][1].status} {results[-1][1].message}")
+    if len(files) == 0:
+        return results
+    batch_args = batch_file_args(files, args)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for file in files:
+                preload_library(file, args)
+        for file, (res, output) in zip(files, compile_batch(files, batch_args, jobs)):
+            if len(files) > 1:
+                print(f"[{file}]")
+            print(output, end="")
+            results.append((file, res))
+    finally:
+        SHARED_LIBRARIES.clear()
+    return results
+
+
+def batch_failed(results: list[tuple[str, CompilerResult]], args: CompilerArgs) -> list[str]:
+    # the thresholds handle_error stops a single compile at
+    return [file for file, res in results if res.status.value >= args.exit_level.value]
+
+
+def lower_strip_lines(lines, file: str | None = None) -> Diagnostics:
+    diagnostics = Diagnostics(file)
     line_iter = enumerate(lines)
     for ind, line in line_iter:
         if line.strip().startswith("#macrogenerator"):
@@ -1050,9 +1527,10 @@ def lower_strip_lines(lines) -> CompilerResult:
             while not line.strip().startswith("#endmacrogenerator"):
                 ind, line = next(line_iter, (None, None))
                 if line is None:
-                    return CompilerResult.error(f"[ERROR] Expected #endmacrogenerator after #macrogenerator at line"
-                                                f" <{start_ind}>")
+                    diagnostics.error("unclosed-macrogenerator", "[ERROR] Expected #endmacrogenerator after "
+                                      "#macrogenerator at line <{}>", start_ind, line=start_ind)
+                    return diagnostics
                 lines[ind] = line.strip()
             lines[ind] = line.lower().strip()
         lines[ind] = line.lower().strip()
-    return CompilerResult.ok()
+    return diagnostics
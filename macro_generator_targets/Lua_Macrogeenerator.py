@@ -1,14 +1,55 @@
 from objects.MacroGenerator import MacroGenerator
 from objects.CompilerResult import CompilerResult
 from objects.CompilerArgs import CompilerArgs
+from objects.CompilerErrorLevels import CompilerErrorLevels
 from objects.MacroTypes import MacroTypes
 from objects.Macro import Macro
+from objects.BytecodeCache import BytecodeCache
+import pathlib
+import time
+from collections import OrderedDict
 import lupa.lua54 as lupa
 
 MACRO_LOAD_FUNC_NAME = "onAfterMacroLoad"
 
 MACRO_USE_FUNC_NAME = "onMacroUse"
 
+# generators returning a table with pure = true promise that onMacroUse only depends on the argument values
+PURE_FIELD_NAME = "pure"
+
+PURE_CACHE_SIZE = 256
+
+# directories searched by require() inside generators, modules are compiled once per runtime and shared
+LUA_MODULE_DIRS = [pathlib.Path(__file__).parent.parent.joinpath("macrodefs", "lua")]
+
+# lets the batch API turn a Lua array of lines into one string with a single call into the runtime
+JOIN_LINES = "function(lines) return table.concat(lines, '\\n') end"
+
+# every generator chunk runs in its own _ENV, globals it defines stay in there, reads fall through to the shared
+# globals of the runtime
+SANDBOX_LOADER = """
+local load, setmetatable, globals = load, setmetatable, _G
+return function(source, name, mode)
+    local env = setmetatable({}, {__index = globals})
+    local chunk, err = load(source, name, mode or "t", env)
+    return chunk, err
+end
+"""
+
+# runs in a runtime without string decoding so the dumped chunk reaches python as bytes, bytecode does not depend on
+# the state that produced it
+DUMP_CHUNK = """
+function(source, name)
+    local chunk, err = load(source, name, "t")
+    if chunk == nil then
+        return nil, err
+    end
+    return string.dump(chunk), nil
+end
+"""
+
+BYTECODE_CACHE_DIR_NAME = "lua"
+
 
 class LuaMacroGeneratorArgsWrapper:
     def __init__(self, macro_args_type: list[MacroTypes], macro_args_value: list[str]):
@@ -32,6 +73,14 @@ def prep_line(line: str) -> str:
     return line.replace("#comment", "//")
 
 
+def prep_lines(lines) -> list[str]:
+    if lupa.lua_type(lines) == "table":
+        lines = Lua.join_lines(lines)
+    if not isinstance(lines, str):
+        raise TypeError(f"expected a string or an array of lines, got {lupa.lua_type(lines) or type(lines).__name__}")
+    return [prep_line(line) for line in lines.split("\n") if line.find("//") == -1]
+
+
 class LuaMacroGeneratorMacroWrapper:
     def __init__(self, macro: Macro):
         self.macro = macro
@@ -67,6 +116,18 @@ class LuaMacroGeneratorMacroWrapper:
             return
         self.macro.macro_bottom.append(prep_line(line))
 
+    def set_macro_top(self, lines):
+        self.macro.macro_top = prep_lines(lines)
+
+    def set_macro_bottom(self, lines):
+        self.macro.macro_bottom = prep_lines(lines)
+
+    def add_macro_top_lines(self, lines):
+        self.macro.macro_top.extend(prep_lines(lines))
+
+    def add_macro_bottom_lines(self, lines):
+        self.macro.macro_bottom.extend(prep_lines(lines))
+
 
 class LuaMacroGeneratorCompilerWrapper:
     def __init__(self, comp_args: CompilerArgs):
@@ -82,31 +143,163 @@ class Lua(MacroGenerator):
         if self.on_macro_usage is None:
             return CompilerResult.error("[ERROR][LUA] Failed to use lua generator"
                                         " (macro used called before macro load)")
+        key = tuple(macro_args)
+        if self.pure and (entry := self.pure_cache.get(key)) is not None:
+            self.pure_cache.move_to_end(key)
+            Lua.pure_hits = Lua.pure_hits + 1
+            Lua.pure_saved_ns = Lua.pure_saved_ns + self.pure_ns // self.pure_misses
+            macro.macro_top, macro.macro_bottom, macro.complex_macro = list(entry[0]), list(entry[1]), entry[2]
+            return CompilerResult.ok()
+        # the wrappers are reused for every use of this generator, only their targets change
+        self.compiler_wrapper.comp_args = args
+        self.macro_wrapper.macro = macro
+        self.args_wrapper.macro_args_type = macro.macro_args
+        self.args_wrapper.macro_args_value = macro_args
+        start = time.perf_counter_ns()
         try:
-            return self.on_macro_usage(self.generator_table, LuaMacroGeneratorCompilerWrapper(args),
-                                       LuaMacroGeneratorMacroWrapper(macro),
-                                       LuaMacroGeneratorArgsWrapper(macro.macro_args,
-                                                                    macro_args)) or CompilerResult.ok()
+            res = self.on_macro_usage(self.generator_table, self.compiler_wrapper, self.macro_wrapper,
+                                      self.args_wrapper)
+            # returning an array of lines or a newline separated string replaces macro_top in one go
+            if isinstance(res, str) or lupa.lua_type(res) == "table":
+                macro.macro_top = prep_lines(res)
+                res = None
+            res = res or CompilerResult.ok()
         except Exception as e:
             return CompilerResult.error(f"[ERROR][LUA] Failed to use lua generator (Lua Error): {type(e)}{e}")
+        elapsed = time.perf_counter_ns() - start
+        Lua.use_calls = Lua.use_calls + 1
+        Lua.use_ns = Lua.use_ns + elapsed
+        if self.pure and isinstance(res, CompilerResult) and res.status == CompilerErrorLevels.OK:
+            self.remember(key, macro, elapsed)
+        return res
+
+    def remember(self, key: tuple[str, ...], macro: Macro, elapsed: int):
+        self.pure_misses = self.pure_misses + 1
+        self.pure_ns = self.pure_ns + elapsed
+        Lua.pure_misses = Lua.pure_misses + 1
+        self.pure_cache[key] = (list(macro.macro_top), list(macro.macro_bottom), macro.complex_macro)
+        if len(self.pure_cache) > PURE_CACHE_SIZE:
+            self.pure_cache.popitem(last=False)
+            Lua.pure_evictions = Lua.pure_evictions + 1
 
     @staticmethod
     def get_target_language() -> str:
         return "lua"
 
+    # one runtime is shared by all generators of a compile, begin_compile drops it so the next compile starts clean
+    lua_runtime: lupa.LuaRuntime | None = None
+    sandbox_loader = None
+    join_lines = None
+    # modification times of the shared Lua modules the runtime was created with
+    module_stamp: tuple[tuple[str, int], ...] | None = None
+    # compiled chunks are kept on disk between compiles when a cache directory is configured
+    bytecode_cache_dir: str | pathlib.Path | None = None
+    bytecode_cache: BytecodeCache | None = None
+    dump_chunk = None
+    # counters over all generators of a compile, reset by begin_compile
+    use_calls = 0
+    use_ns = 0
+    pure_hits = 0
+    pure_misses = 0
+    pure_evictions = 0
+    pure_saved_ns = 0
+
     def __init__(self, generator_lines: list[str]) -> None:
         self.generator_table = None
         self.on_macro_usage = None
         self.generator_lines = generator_lines
-        self.lua_runtime = lupa.LuaRuntime()
-        self.lua_runtime.globals()["print"] = print
+        self.pure = False
+        self.pure_cache: OrderedDict[tuple[str, ...], tuple[list[str], list[str], bool]] = OrderedDict()
+        self.pure_misses = 0
+        self.pure_ns = 0
+        self.compiler_wrapper: LuaMacroGeneratorCompilerWrapper | None = None
+        self.macro_wrapper: LuaMacroGeneratorMacroWrapper | None = None
+        self.args_wrapper: LuaMacroGeneratorArgsWrapper | None = None
+
+    @classmethod
+    def begin_compile(cls, args: CompilerArgs) -> None:
+        # a warm compiler keeps its runtime until a module generators may have required changed on disk
+        stamp = Lua.stamp_modules() if args.warm else None
+        if not args.warm or stamp != cls.module_stamp:
+            cls.lua_runtime = None
+            cls.sandbox_loader = None
+            cls.join_lines = None
+            cls.dump_chunk = None
+        cls.module_stamp = stamp
+        cls.bytecode_cache = None
+        cls.bytecode_cache_dir = args.lua_cache_dir or \
+            (pathlib.Path(args.cache_dir).joinpath(BYTECODE_CACHE_DIR_NAME) if args.cache_dir is not None else None)
+        cls.use_calls = cls.use_ns = 0
+        cls.pure_hits = cls.pure_misses = cls.pure_evictions = cls.pure_saved_ns = 0
+
+    @classmethod
+    def compile_stats(cls) -> str | None:
+        cache = cls.bytecode_cache
+        if cls.use_calls == 0 and cls.pure_hits == 0 and (cache is None or cache.hits + cache.misses == 0):
+            return None
+        return f"Lua generators: {cls.use_calls} onMacroUse calls in {cls.use_ns / 1e6:.2f} ms, pure cache " \
+               f"{cls.pure_hits} hits, {cls.pure_misses} misses, {cls.pure_evictions} evicted, " \
+               f"~{cls.pure_saved_ns / 1e6:.2f} ms of Lua skipped" + \
+               (f", bytecode cache {cache}" if cache is not None else "")
+
+    @classmethod
+    def compile_counters(cls) -> dict[str, int]:
+        cache = cls.bytecode_cache
+        return {"calls": cls.use_calls, "call_ns": cls.use_ns, "pure_hits": cls.pure_hits,
+                "pure_misses": cls.pure_misses, "pure_saved_ns": cls.pure_saved_ns,
+                "bytecode_hits": cache.hits if cache is not None else 0,
+                "bytecode_misses": cache.misses if cache is not None else 0}
+
+    @classmethod
+    def shared_runtime(cls) -> lupa.LuaRuntime:
+        if cls.lua_runtime is None:
+            runtime = lupa.LuaRuntime()
+            runtime.globals()["print"] = print
+            package = runtime.globals().package
+            package.path = ";".join(str(path.joinpath("?.lua")) for path in LUA_MODULE_DIRS) + ";" + package.path
+            cls.sandbox_loader = runtime.execute(SANDBOX_LOADER)
+            cls.join_lines = runtime.eval(JOIN_LINES)
+            cls.lua_runtime = runtime
+        if cls.bytecode_cache is None and cls.bytecode_cache_dir is not None:
+            cls.bytecode_cache = BytecodeCache(cls.bytecode_cache_dir, "lua", cls.lua_runtime.lua_implementation)
+        return cls.lua_runtime
+
+    @staticmethod
+    def stamp_modules() -> tuple[tuple[str, int], ...]:
+        return tuple((str(path), path.stat().st_mtime_ns) for directory in LUA_MODULE_DIRS
+                     for path in sorted(directory.glob("*.lua")))
 
     @staticmethod
     def merge_lines(lines: list[str]) -> str:
         return "\n".join(lines)
 
+    @classmethod
+    def load_chunk(cls, source: str, name: str):
+        cache = cls.bytecode_cache
+        if cache is None:
+            return cls.sandbox_loader(source, name)
+        # the chunk name ends up in the bytecode, error messages of a hit name the macro that wrote it otherwise
+        key = cache.key(f"{name}\0{source}")
+        if (bytecode := cache.load(key)) is not None:
+            chunk, _ = cls.sandbox_loader(bytecode, name, "b")
+            if chunk is not None:
+                return chunk, None
+            # written by an incompatible runtime, or damaged in a way the checksum could not see
+            cache.reject(key, loaded=True)
+        if cls.dump_chunk is None:
+            cls.dump_chunk = lupa.LuaRuntime(encoding=None).eval(DUMP_CHUNK)
+        bytecode, _ = cls.dump_chunk(source.encode(), name.encode())
+        if bytecode is None:
+            # syntax errors are reported by the regular loader
+            return cls.sandbox_loader(source, name)
+        cache.store(key, bytecode)
+        return cls.sandbox_loader(bytecode, name, "b")
+
     def load_generator(self, args: CompilerArgs, macro: Macro) -> CompilerResult:
-        res = self.lua_runtime.compile(Lua.merge_lines(self.generator_lines))
+        Lua.shared_runtime()
+        res, err = Lua.load_chunk(Lua.merge_lines(self.generator_lines), f"={macro.macro_opener}")
+        if res is None:
+            return CompilerResult.error(f"[ERROR][LUA] Failed to load lua generator (Syntax Error): {err}")
         if lupa.lua_type(res) == "function":
             try:
                 generator = res()
@@ -125,6 +318,10 @@ class Lua(MacroGenerator):
                                                 LuaMacroGeneratorMacroWrapper(macro))
                 self.generator_table = generator
                 self.on_macro_usage = generator[MACRO_USE_FUNC_NAME]
+                self.compiler_wrapper = LuaMacroGeneratorCompilerWrapper(args)
+                self.macro_wrapper = LuaMacroGeneratorMacroWrapper(macro)
+                self.args_wrapper = LuaMacroGeneratorArgsWrapper(macro.macro_args, [])
+                self.pure = generator[PURE_FIELD_NAME] is True
             except Exception as e:
                 return CompilerResult.error(f"[ERROR][LUA] Failed to load lua generator (Lua Error): {type(e)}{e}")
         else:
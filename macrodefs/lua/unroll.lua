@@ -0,0 +1,12 @@
+local unroll = {}
+
+-- returns count copies of template with %__i replaced by the 1 based iteration
+function unroll.lines(count, template)
+    local lines = {}
+    for i = 1, count do
+        lines[i] = (template:gsub("%%__i", tostring(i)))
+    end
+    return lines
+end
+
+return unroll
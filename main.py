@@ -18,6 +18,13 @@ def error_level(arg):
         raise argparse.ArgumentTypeError(f"Invalid CompilerErrorLevels value: {arg}")
 
 
+def rom_layout(arg):
+    try:
+        return tuple(int(bits) for bits in arg.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid ROM layout: {arg}, expected OPCODE,A,B bit widths")
+
+
 parser = argparse.ArgumentParser(prog="MCCPU-Compiler", description="Compile MCCPU source file to target language")
 parser.add_argument("-t", "--target", type=str, help="the target Language", default="mccpu",
                     required=False, dest="language")
@@ -36,15 +43,53 @@ parser.add_argument("-el", "--exitLevel", type=error_level,
 parser.add_argument("-o", "--output", type=str, help="define the name of the output file (Not including extension,"
                                                      " extension is chosen by target)",
                     required=False, dest="out", default="out")
-parser.add_argument("file")
+parser.add_argument("-v", "--verbose", help="print informational compiler messages", action="store_true",
+                    dest="verbose")
+parser.add_argument("-cd", "--cacheDir", type=str, help="directory for the parsed macro library cache",
+                    default=str(compiler.DEFAULT_CACHE_DIR), required=False, dest="cache_dir")
+parser.add_argument("-lcd", "--luaCacheDir", type=str, help="directory for compiled lua generator chunks "
+                                                            "(default: lua inside the cache directory)",
+                    default=None, required=False, dest="lua_cache_dir")
+parser.add_argument("-nc", "--noCache", help="do not read or write the macro library and lua bytecode caches",
+                    action="store_true", dest="no_cache")
+parser.add_argument("-rl", "--romLayout", type=rom_layout, help="bit widths of the opcode and the two operands in "
+                                                                "the words of the binary ROM targets "
+                                                                "(mccpubin, mccpuhex, logisim)",
+                    default=(8, 8, 8), required=False, dest="rom_layout")
+parser.add_argument("--profile", nargs="?", type=str, help="report time, counters and peak memory of every "
+                                                           "compile phase, with a file name also as JSON (a "
+                                                           "directory for more than one source file)",
+                    const="", default=None, dest="profile")
+parser.add_argument("--profileNoMemory", help="do not trace peak memory with --profile, the phase times are then "
+                                              "closer to a normal compile", action="store_true",
+                    dest="profile_no_memory")
+parser.add_argument("--diagnostics", type=str, help="write every compiler message as a JSON record with code, file "
+                                                    "and line (a directory for more than one source file)",
+                    default=None, dest="diagnostics")
+parser.add_argument("--map", help="also write <output>.map with the source file, line and macro expansions of every "
+                                  "instruction", action="store_true", dest="source_map")
+parser.add_argument("-j", "--jobs", type=int, help="compile this many files in parallel", default=1,
+                    required=False, dest="jobs")
+parser.add_argument("--serve", nargs="?", type=str, help="keep running as a compile server on a unix socket "
+                                                         "(default: server.sock in ~/.cache/mccpu-compiler), "
+                                                         "see client.py", const="", default=None, dest="serve")
+parser.add_argument("--watch", help="recompile whenever a source file or one of its includes changes",
+                    action="store_true", dest="watch")
+parser.add_argument("files", nargs="*", help="source files or glob patterns, with more than one file the output "
+                                             "name is used as a directory")
 
 parsed = parser.parse_args(sys.argv[1:])
 args = CompilerArgs(target_lang=parsed.language, mem_size=parsed.memory, stack_size=parsed.stack,
                     memory_blocks=parsed.blocks, register_count=parsed.registers, exit_level=parsed.exitLevel,
-                    out_file=parsed.out)
+                    out_file=parsed.out, verbose=parsed.verbose,
+                    cache_dir=None if parsed.no_cache else parsed.cache_dir,
+                    lua_cache_dir=None if parsed.no_cache else parsed.lua_cache_dir, rom_layout=parsed.rom_layout,
+                    profile=parsed.profile is not None, profile_file=parsed.profile or None,
+                    profile_memory=not parsed.profile_no_memory, diagnostics_file=parsed.diagnostics,
+                    source_map=parsed.source_map)
 
 # Compiler settings and CPU specs
-COMPILER_VERSION = "1.0-wip"
+COMPILER_VERSION = compiler.COMPILER_VERSION
 CONTRIBUTORS_CPU = [
     "FireDragon91245"
 ]
@@ -60,14 +105,27 @@ print("=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=\n")
 
 print(f"Working dir: {os.getcwd()}\n")
 
-if len(sys.argv) <= 1:
+if parsed.serve is not None:
+    # the server is the only user of the socket modules, plain compiles do not import them
+    import server
+    server.serve(parsed.serve or None, args)
+    exit(0)
+
+if len(parsed.files) == 0:
     print("No source file provided, exiting!")
     exit(0)
 
-if os.path.exists(parsed.file):
-    res = compiler.compile_file(parsed.file, args)
-    if res.status == CompilerErrorLevels.OK:
-        print("Compiled Successfully")
-else:
-    print(f"Source file: \"{parsed.file}\" was not found, exiting!")
+if parsed.watch:
+    import watch
+    watch.watch(parsed.files, args)
     exit(0)
+
+results = compiler.compile_files(parsed.files, args, parsed.jobs)
+failed = compiler.batch_failed(results, args)
+if len(results) == 1 and results[0][1].status == CompilerErrorLevels.OK:
+    print("Compiled Successfully")
+elif len(results) > 1:
+    print(f"Compiled {len(results) - len(failed)} of {len(results)} files successfully"
+          + (f", failed: {list_format(failed)}" if len(failed) > 0 else ""))
+if len(failed) > 0:
+    exit(1)
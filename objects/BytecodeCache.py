@@ -0,0 +1,72 @@
+import hashlib
+import os
+import pathlib
+import tempfile
+
+# bump when the layout of a cache entry changes, old entries are then ignored
+BYTECODE_FORMAT_VERSION = 1
+
+BYTECODE_MAGIC = b"MCCPUBC\0"
+
+
+class BytecodeCache:
+
+    def __init__(self, cache_dir: str | os.PathLike, language: str, runtime_version: str) -> None:
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.language = language
+        self.runtime_version = runtime_version
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def key(self, source: str) -> str:
+        # bytecode is only valid for the runtime version that produced it
+        algorithm = hashlib.sha256()
+        algorithm.update(f"{BYTECODE_FORMAT_VERSION}\0{self.language}\0{self.runtime_version}\0".encode())
+        algorithm.update(source.encode())
+        return algorithm.hexdigest()
+
+    def path(self, key: str) -> pathlib.Path:
+        return self.cache_dir.joinpath(f"{self.language}-{key}.bc")
+
+    def load(self, key: str) -> bytes | None:
+        try:
+            with open(self.path(key), "rb") as file:
+                data = file.read()
+        except OSError:
+            self.misses = self.misses + 1
+            return None
+        # a runtime does not verify bytecode, so a truncated or damaged entry has to be caught before loading it
+        header, digest, bytecode = data[:len(BYTECODE_MAGIC)], data[len(BYTECODE_MAGIC):len(BYTECODE_MAGIC) + 32], \
+            data[len(BYTECODE_MAGIC) + 32:]
+        if header != BYTECODE_MAGIC or len(bytecode) == 0 or hashlib.sha256(bytecode).digest() != digest:
+            self.reject(key)
+            return None
+        self.hits = self.hits + 1
+        return bytecode
+
+    def reject(self, key: str, loaded: bool = False) -> None:
+        # loaded entries were counted as a hit before the runtime refused them
+        if loaded:
+            self.hits = self.hits - 1
+        self.rejected = self.rejected + 1
+        self.misses = self.misses + 1
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def store(self, key: str, bytecode: bytes) -> bool:
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # written next to the entry and renamed so readers never see a partial file
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as file:
+                file.write(BYTECODE_MAGIC + hashlib.sha256(bytecode).digest() + bytecode)
+            os.replace(tmp, self.path(key))
+        except OSError:
+            return False
+        return True
+
+    def __str__(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses, {self.rejected} corrupt entries recompiled"
@@ -0,0 +1,138 @@
+import json
+import os
+import time
+import tracemalloc
+from collections import Counter
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+# bump when the layout of the JSON report changes
+PROFILE_FORMAT_VERSION = 1
+
+
+class CompileProfile:
+
+    def __init__(self, file: str, memory: bool = True) -> None:
+        self.file = file
+        self.memory = memory
+        # name, ns, items in, items out, in the order the phases ran
+        self.phases: list[tuple[str, int, int, int]] = []
+        self.start_ns = 0
+        self.lap_ns = 0
+        self.total_ns = 0
+        # ns and items of streams that are consumed by a later phase
+        self.streams: dict[str, list[int]] = {}
+        # name -> (measure, ns already reported)
+        self.nested: dict[str, tuple[Callable[[], tuple[int, int]], int]] = {}
+        self.regex_matches = 0
+        # macro id -> expansions, ns per expansion round
+        self.expansions: Counter[int] = Counter()
+        self.expansion_rounds: list[int] = []
+        self.macro_names: dict[int, str] = {}
+        self.generators: dict[str, dict[str, int]] = {}
+        self.peak_memory = 0
+        self.traced = False
+
+    def start(self) -> None:
+        # someone else may already trace, their trace is not stopped here
+        self.traced = self.memory and not tracemalloc.is_tracing()
+        if self.traced:
+            tracemalloc.start()
+        elif self.memory:
+            tracemalloc.reset_peak()
+        self.lap_ns = self.start_ns = time.perf_counter_ns()
+
+    def stop(self) -> None:
+        self.total_ns = time.perf_counter_ns() - self.start_ns
+        if self.memory:
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+        if self.traced:
+            tracemalloc.stop()
+
+    def nest(self, name: str, measure: Callable[[], tuple[int, int]]) -> None:
+        # measure returns the ns and items of work that happens inside other phases, like importing a generator
+        # backend on its first use, it is taken out of the phase it ran in and reported on its own
+        self.nested[name] = (measure, 0)
+
+    def add(self, name: str, ns: int, items_in: int, items_out: int) -> None:
+        for i, phase in enumerate(self.phases):
+            if phase[0] == name:
+                self.phases[i] = (name, phase[1] + ns, phase[2] + items_in, phase[3] + items_out)
+                return
+        self.phases.append((name, ns, items_in, items_out))
+
+    def lap(self, name: str, items_in: int, items_out: int) -> None:
+        # a phase runs from the end of the one before it
+        now = time.perf_counter_ns()
+        ns = now - self.lap_ns
+        for nested_name, (measure, seen) in self.nested.items():
+            nested_ns, items = measure()
+            if nested_ns > seen:
+                self.nested[nested_name] = (measure, nested_ns)
+                self.add(nested_name, nested_ns - seen, items, items)
+                ns = ns - (nested_ns - seen)
+        self.add(name, ns, items_in, items_out)
+        self.lap_ns = now
+
+    def timed(self, items: Iterable[T], name: str) -> Iterator[T]:
+        # the time spent producing the items of a stream is reported as name, the consumer keeps the rest
+        stream = self.streams[name] = [0, 0]
+        self.nest(name, lambda: (stream[0], stream[1]))
+        return CompileProfile.time_stream(iter(items), stream)
+
+    @staticmethod
+    def time_stream(iterator: Iterator[T], stream: list[int]) -> Iterator[T]:
+        while True:
+            start = time.perf_counter_ns()
+            item = next(iterator, stream)
+            stream[0] = stream[0] + time.perf_counter_ns() - start
+            if item is stream:
+                return
+            stream[1] = stream[1] + 1
+            yield item
+
+    def count_macros(self, macros) -> None:
+        # regex matches and expansions are counted by the macro registry as it goes
+        macros.count_matches(self)
+
+    def take_counters(self, macros, generators: Iterable) -> None:
+        # the caches and generators keep counting in later compiles, their counters are taken when the compile ends
+        self.macro_names = {macro_id: macros[macro_id].macro_opener for macro_id in self.expansions}
+        self.generators = {generator.get_target_language(): generator.compile_counters() for generator in generators}
+
+    def to_json(self) -> dict:
+        return {
+            "version": PROFILE_FORMAT_VERSION,
+            "file": self.file,
+            "total_ns": self.total_ns,
+            "peak_memory": self.peak_memory if self.memory else None,
+            "phases": [{"name": name, "ns": ns, "in": items_in, "out": items_out}
+                       for name, ns, items_in, items_out in self.phases],
+            "counters": {
+                "regex_matches": self.regex_matches,
+                "expansion_rounds": self.expansion_rounds,
+                "expansions": {self.macro_names.get(macro_id, str(macro_id)): count
+                               for macro_id, count in self.expansions.most_common()},
+                "generators": self.generators
+            }
+        }
+
+    def write_json(self, path: str | os.PathLike) -> None:
+        with open(path, "wt") as file:
+            json.dump(self.to_json(), file, indent=2)
+
+    def report(self) -> str:
+        lines = [f"[PROFILE] {self.file}: {self.total_ns / 1e6:.2f} ms" +
+                 (f", peak memory {self.peak_memory / 2 ** 20:.2f} MiB (timings include tracemalloc)"
+                  if self.memory else "")]
+        for name, ns, items_in, items_out in self.phases:
+            lines.append(f"[PROFILE]   {name:<22} {ns / 1e6:>9.2f} ms {ns / max(self.total_ns, 1):>6.1%}  "
+                         f"{items_in:>8} in {items_out:>8} out")
+        lines.append(f"[PROFILE]   regex matches {self.regex_matches}, expansion rounds {len(self.expansion_rounds)} "
+                     f"({', '.join(f'{ns / 1e6:.2f}' for ns in self.expansion_rounds)} ms)")
+        for macro_id, count in self.expansions.most_common(10):
+            lines.append(f"[PROFILE]   {count:>8} x {self.macro_names.get(macro_id, macro_id)}")
+        for language, counters in self.generators.items():
+            lines.append(f"[PROFILE]   {language}: " + ", ".join(f"{name} {value}" for name, value in counters.items()))
+        return "\n".join(lines)
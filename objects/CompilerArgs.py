@@ -4,7 +4,28 @@ from objects.CompilerErrorLevels import CompilerErrorLevels
 class CompilerArgs:
 
     def __init__(self, target_lang: str, mem_size: int, memory_blocks: int, stack_size: int, register_count: int,
-                 exit_level: CompilerErrorLevels, out_file: str) -> None:
+                 exit_level: CompilerErrorLevels, out_file: str, verbose: bool = False,
+                 cache_dir: str | None = None, lua_cache_dir: str | None = None, warm: bool = False,
+                 rom_layout: tuple[int, int, int] = (8, 8, 8), profile: bool = False,
+                 profile_file: str | None = None, profile_memory: bool = True,
+                 diagnostics_file: str | None = None, source_map: bool = False) -> None:
+        # set by long-lived callers like the compile server, backends may then keep state between compiles
+        self.warm = warm
+        # bits of the opcode and the two operands in the words of the binary ROM targets
+        self.rom_layout = rom_layout
+        # report time, counters and peak memory per phase, profile_file also gets them as JSON, tracing the memory
+        # slows allocation heavy phases down more than others
+        self.profile = profile
+        self.profile_file = profile_file
+        self.profile_memory = profile_memory
+        # every message of the compile as JSON records, informational ones only with verbose
+        self.diagnostics_file = diagnostics_file
+        # write <out_file>.map, the file and line every emitted instruction and the macros it was expanded from
+        # come from
+        self.source_map = source_map
+        self.lua_cache_dir = lua_cache_dir
+        self.cache_dir = cache_dir
+        self.verbose = verbose
         self.out_file = out_file
         self.exit_level = exit_level
         self.register_count = register_count
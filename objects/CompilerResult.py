@@ -1,5 +1,10 @@
+from typing import TYPE_CHECKING
+
 from objects.CompilerErrorLevels import CompilerErrorLevels
 
+if TYPE_CHECKING:
+    from objects.Diagnostics import Diagnostics
+
 
 class CompilerResult:
 
@@ -7,6 +12,8 @@ class CompilerResult:
         self.message = message
         self.status = status
         self.messages: list[(CompilerErrorLevels, str)] = []
+        # the records of a whole compile, with code, file and line of every message
+        self.diagnostics: "Diagnostics | None" = None
 
     @staticmethod
     def ok():
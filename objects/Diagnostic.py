@@ -0,0 +1,39 @@
+from objects.CompilerErrorLevels import CompilerErrorLevels
+
+
+class Diagnostic:
+    __slots__ = ("status", "code", "template", "args", "file", "line", "span", "formatted")
+
+    def __init__(self, status: CompilerErrorLevels, code: str | None, template: str, args: tuple = (),
+                 file: str | None = None, line: int | None = None, span: tuple[int, int] | None = None) -> None:
+        self.status = status
+        # stable name of the kind of message for tooling, None for messages taken over from a CompilerResult
+        self.code = code
+        # the message is only built from template and args when it is printed or exported
+        self.template = template
+        self.args = args
+        self.file = file
+        self.line = line
+        # start and end column on the line
+        self.span = span
+        self.formatted: str | None = None
+
+    @property
+    def message(self) -> str:
+        if self.formatted is None:
+            self.formatted = self.template.format(*self.args) if len(self.args) > 0 else self.template
+        return self.formatted
+
+    def to_json(self) -> dict:
+        return {
+            "severity": self.status.name,
+            "code": self.code,
+            "file": self.file,
+            "line": self.line,
+            "span": list(self.span) if self.span is not None else None,
+            "message": self.message,
+            "args": [arg if arg is None or isinstance(arg, (bool, int, float, str)) else str(arg) for arg in self.args]
+        }
+
+    def __str__(self) -> str:
+        return f"{self.status} {self.message}"
@@ -0,0 +1,129 @@
+import json
+import os
+from typing import Iterable, Iterator
+
+from objects.CompilerErrorLevels import CompilerErrorLevels
+from objects.CompilerResult import CompilerResult
+from objects.Diagnostic import Diagnostic
+
+# bump when the layout of the JSON report changes
+DIAGNOSTICS_FORMAT_VERSION = 1
+
+
+class Diagnostics:
+
+    def __init__(self, file: str | None = None, level: CompilerErrorLevels = CompilerErrorLevels.INFO) -> None:
+        self.file = file
+        # records below level are dropped when they are added, their status still counts
+        self.level = level
+        self.records: list[Diagnostic] = []
+        # like CompilerResult.ok() until something worse than informational is recorded
+        self.status = CompilerErrorLevels.OK
+        # value of status and of level, compared on every record without going through the enum
+        self.severity = CompilerErrorLevels.OK.value
+        self.min_severity = level.value
+        # records before this index were printed already
+        self.reported = 0
+
+    def keeps(self, status: CompilerErrorLevels) -> bool:
+        # lets callers skip collecting the args of a record that would be dropped
+        return status.value >= self.min_severity
+
+    def raise_status(self, status: CompilerErrorLevels) -> None:
+        if status.value > self.severity:
+            self.severity = status.value
+            self.status = status
+
+    def record(self, status: CompilerErrorLevels, code: str | None, template: str, args: tuple, file: str | None,
+               line: int | None, span: tuple[int, int] | None) -> Diagnostic | None:
+        severity = status.value
+        if severity > self.severity:
+            self.severity = severity
+            self.status = status
+        if severity < self.min_severity:
+            return None
+        record = Diagnostic(status, code, template, args, file if file is not None else self.file, line, span)
+        self.records.append(record)
+        return record
+
+    def add(self, status: CompilerErrorLevels, code: str | None, template: str, *args, file: str | None = None,
+            line: int | None = None, span: tuple[int, int] | None = None) -> Diagnostic | None:
+        return self.record(status, code, template, args, file, line, span)
+
+    def error(self, code: str, template: str, *args, file: str | None = None, line: int | None = None,
+              span: tuple[int, int] | None = None) -> Diagnostic | None:
+        return self.record(CompilerErrorLevels.ERROR, code, template, args, file, line, span)
+
+    def warn(self, code: str, template: str, *args, file: str | None = None, line: int | None = None,
+             span: tuple[int, int] | None = None) -> Diagnostic | None:
+        return self.record(CompilerErrorLevels.WARNING, code, template, args, file, line, span)
+
+    def info(self, code: str, template: str, *args, file: str | None = None, line: int | None = None,
+             span: tuple[int, int] | None = None) -> Diagnostic | None:
+        return self.record(CompilerErrorLevels.INFO, code, template, args, file, line, span)
+
+    def extend(self, records: Iterable[Diagnostic]) -> "Diagnostics":
+        # records made elsewhere, like the replayed warnings of a cached macro load
+        for record in records:
+            self.raise_status(record.status)
+            if record.status.value >= self.min_severity:
+                self.records.append(record)
+        return self
+
+    def accumulate(self, other: "CompilerResult | Diagnostics | None") -> "Diagnostics":
+        # targets and macro generators report through CompilerResult, every message they kept becomes a record of its
+        # own
+        if other is None or other.status is None:
+            return self
+        if isinstance(other, CompilerResult) and other.diagnostics is not None:
+            # results of located errors carry their records along
+            other = other.diagnostics
+        if isinstance(other, Diagnostics):
+            self.raise_status(other.status)
+            self.records.extend(record for record in other.records if record.status.value >= self.min_severity)
+            return self
+        if other.message_count() == 1:
+            self.raise_status(other.status)
+            if other.message:
+                self.record(other.status, None, other.message, (), None, None, None)
+            return self
+        for status, message in other.messages:
+            self.raise_status(status)
+            if message:
+                self.record(status, None, message, (), None, None, None)
+        return self
+
+    def filtered(self, level: CompilerErrorLevels) -> Iterator[Diagnostic]:
+        return (record for record in self.records if record.status.value >= level.value)
+
+    def unreported(self) -> list[Diagnostic]:
+        records = self.records[self.reported:]
+        self.reported = len(self.records)
+        return records
+
+    def stops(self, exit_level: CompilerErrorLevels) -> bool:
+        # exit_level is WARNING, ERROR or NONE, nothing reaches NONE
+        return self.severity >= exit_level.value
+
+    def to_result(self) -> CompilerResult:
+        records = list(self.filtered(CompilerErrorLevels.WARNING))
+        result = CompilerResult(self.status, records[0].message if len(records) > 0 else "")
+        if len(records) > 1:
+            result.messages = [(record.status, record.message) for record in records]
+        result.diagnostics = self
+        return result
+
+    def to_json(self, level: CompilerErrorLevels = CompilerErrorLevels.INFO) -> dict:
+        return {
+            "version": DIAGNOSTICS_FORMAT_VERSION,
+            "file": self.file,
+            "status": self.status.name,
+            "records": [record.to_json() for record in self.filtered(level)]
+        }
+
+    def __str__(self) -> str:
+        return "\n".join(str(record) for record in self.records)
+
+    def write_json(self, path: str | os.PathLike, level: CompilerErrorLevels = CompilerErrorLevels.INFO) -> None:
+        with open(path, "wt") as file:
+            json.dump(self.to_json(level), file, indent=2)
@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+from objects.Instruction import Instruction
+from objects.Macro import Macro
+
+DEFAULT_EXPANSION_CACHE_SIZE = 4096
+
+
+class ExpansionCache:
+
+    def __init__(self, max_size: int = DEFAULT_EXPANSION_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self.entries: OrderedDict[tuple[int, tuple[str, ...]], tuple[list[Instruction], list[Instruction]]] = \
+            OrderedDict()
+        self.cacheable: dict[int, bool] = {}
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+
+    def is_cacheable(self, macro_id: int, macro: Macro) -> bool:
+        if (cacheable := self.cacheable.get(macro_id)) is None:
+            # %__macro_no changes with every use and generators can rewrite the macro on every use
+            cacheable = not macro.generated_macro and self.max_size > 0 and \
+                not any(line.find("%__macro_no") != -1 for line in macro.macro_top + macro.macro_bottom)
+            self.cacheable[macro_id] = cacheable
+        if not cacheable:
+            self.bypasses = self.bypasses + 1
+        return cacheable
+
+    def get(self, key: tuple[int, tuple[str, ...]]) -> tuple[list[Instruction], list[Instruction]] | None:
+        if (entry := self.entries.get(key)) is None:
+            self.misses = self.misses + 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits = self.hits + 1
+        return entry
+
+    def put(self, key: tuple[int, tuple[str, ...]], entry: tuple[list[Instruction], list[Instruction]]) -> None:
+        self.entries[key] = entry
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions = self.evictions + 1
+
+    def reset_counters(self) -> None:
+        self.hits = self.misses = self.bypasses = self.evictions = 0
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.cacheable.clear()
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses, {self.bypasses} bypassed, {self.evictions} evicted, " \
+               f"hit rate {self.hit_rate():.1%}"
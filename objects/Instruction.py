@@ -0,0 +1,54 @@
+from objects.MacroTypes import MacroTypes
+from objects.ProvenanceTable import NO_PROVENANCE
+
+
+class Instruction:
+    __slots__ = ("text", "mnemonic", "operands", "suffix", "inst_id", "origin", "is_comment", "is_label", "label",
+                 "chain", "provenance")
+
+    def __init__(self, text: str, mnemonic: str | None, operands: tuple[tuple[MacroTypes, str], ...], suffix: str,
+                 inst_id: int | None, origin: int, is_comment: bool = False, is_label: bool = False,
+                 label: str | None = None, chain: tuple[int, ...] = (), provenance: int = NO_PROVENANCE) -> None:
+        self.text = text
+        self.mnemonic = mnemonic
+        self.operands = operands
+        self.suffix = suffix
+        self.inst_id = inst_id
+        self.origin = origin
+        self.is_comment = is_comment
+        self.is_label = is_label
+        self.label = label
+        # ids of the macros this line was expanded from, outermost first
+        self.chain = chain
+        # row of the macro expansion this line came from in the ProvenanceTable of the compile
+        self.provenance = provenance
+
+    @staticmethod
+    def render(mnemonic: str, operands: tuple[tuple[MacroTypes, str], ...], suffix: str) -> str:
+        if len(operands) == 0:
+            return f"{mnemonic}{suffix}"
+        return f"{mnemonic} {', '.join(text for _, text in operands)}{suffix}"
+
+    @staticmethod
+    def native(mnemonic: str, operands: tuple[tuple[MacroTypes, str], ...], suffix: str, inst_id: int,
+               origin: int, chain: tuple[int, ...] = (), provenance: int = NO_PROVENANCE) -> "Instruction":
+        return Instruction(Instruction.render(mnemonic, operands, suffix), mnemonic, operands, suffix, inst_id,
+                           origin, chain=chain, provenance=provenance)
+
+    def at(self, origin: int, chain: tuple[int, ...], provenance: int) -> "Instruction":
+        return Instruction(self.text, self.mnemonic, self.operands, self.suffix, self.inst_id, origin, self.is_comment,
+                           self.is_label, self.label, chain, provenance)
+
+    def is_native(self) -> bool:
+        return self.inst_id is not None
+
+    def with_operand(self, index: int, kind: MacroTypes, text: str) -> "Instruction":
+        operands = self.operands[:index] + ((kind, text),) + self.operands[index + 1:]
+        return Instruction.native(self.mnemonic, operands, self.suffix, self.inst_id, self.origin, self.chain,
+                                  self.provenance)
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"Instruction({self.text!r})"
@@ -0,0 +1,79 @@
+import regex
+
+from objects.MacroTypes import MacroTypes
+
+
+class InstructionDecoder:
+
+    def __init__(self, instructions: dict[str, int], type_patterns: dict[str, str],
+                 type_names: dict[str, MacroTypes]) -> None:
+        self.table: dict[tuple[str, tuple[MacroTypes, ...]], tuple[str, int]] = {}
+        self.bare_instructions: list[tuple[str, tuple[str, int]]] = []
+        self.operand_kinds: list[MacroTypes] = []
+        operand_patterns: list[str] = []
+        max_operands = 0
+        for inst, inst_id in instructions.items():
+            mnemonic, _, operand_str = inst.partition(" ")
+            operands = [op.strip() for op in operand_str.split(",")] if operand_str else []
+            for op in operands:
+                if type_names[op] not in self.operand_kinds:
+                    self.operand_kinds.append(type_names[op])
+                    operand_patterns.append(type_patterns[op])
+            key = (mnemonic, tuple(type_names[op] for op in operands))
+            # first definition wins, same as the linear scan over the instruction table
+            if key not in self.table:
+                self.table[key] = (inst, inst_id)
+                if len(operands) == 0:
+                    self.bare_instructions.append((mnemonic, (inst, inst_id)))
+            max_operands = max(max_operands, len(operands))
+
+        # the patterns are disjoint so every operand is classified by the alternative that matched
+        operand = f"(?:{'|'.join(operand_patterns)})"
+        self.max_operands = max_operands
+        self.lexer = regex.compile(f"([^ ]+){self.build_operands_reg(operand, max_operands)}")
+
+    @staticmethod
+    def build_operands_reg(operand: str, count: int) -> str:
+        res = ""
+        for i in reversed(range(count)):
+            res = f"(?:{' ' if i == 0 else ', '}{operand}{res})?"
+        return res
+
+    def lex(self, line: str) -> tuple[str, list[tuple[MacroTypes, str]], str] | None:
+        match = self.lexer.match(line)
+        if match is None:
+            return None
+        groups = match.groups()
+        kind_count = len(self.operand_kinds)
+        operands: list[tuple[MacroTypes, str]] = []
+        for i in range(self.max_operands):
+            for j in range(kind_count):
+                if (text := groups[1 + i * kind_count + j]) is not None:
+                    operands.append((self.operand_kinds[j], text))
+                    break
+            else:
+                break
+        return groups[0], operands, line[match.end():]
+
+    def lookup(self, mnemonic: str, kinds: tuple[MacroTypes, ...]) -> tuple[str, int] | None:
+        # instructions are matched as a prefix of the line, so surplus operands fall back to a shorter signature
+        for count in range(len(kinds), -1, -1):
+            if (res := self.table.get((mnemonic, kinds[:count]))) is not None:
+                return res
+        return None
+
+    def decode_operands(self, line: str) -> tuple[str, int, str, list[tuple[MacroTypes, str]]] | None:
+        if (lexed := self.lex(line)) is not None:
+            mnemonic, operands, _ = lexed
+            if (res := self.lookup(mnemonic, tuple(kind for kind, _ in operands))) is not None:
+                inst, inst_id = res
+                return inst, inst_id, mnemonic, operands[:inst.count("%")]
+        for mnemonic, (inst, inst_id) in self.bare_instructions:
+            if line.startswith(mnemonic):
+                return inst, inst_id, mnemonic, []
+        return None
+
+    def decode(self, line: str) -> tuple[str, int] | None:
+        if (res := self.decode_operands(line)) is None:
+            return None
+        return res[0], res[1]
@@ -1,8 +1,16 @@
 from abc import abstractmethod
 from pathlib import Path
+from typing import Iterable
 
 from objects.CompilerArgs import CompilerArgs
 from objects.CompilerResult import CompilerResult
+from objects.Instruction import Instruction
+
+# one line of the compiled program as the compiler streams it to a target:
+# (instruction with labels, its text with labels resolved or None for a label line,
+#  its ROM encoding or None, its ROM encoding with labels and comments or None for an empty line)
+EncodedLine = tuple[Instruction, str | None, tuple[int, int, int] | None,
+                    tuple[int | str, int | str | None, int | None] | None]
 
 
 class LanguageTarget:
@@ -12,3 +20,21 @@ class LanguageTarget:
                   rom_instructions_with_labels_comments: list[(int | str, int | None, int | None)],
                   args: CompilerArgs, compiler_working_dir: Path) -> CompilerResult:
         pass
+
+    def transpile_stream(self, lines: Iterable[EncodedLine], args: CompilerArgs,
+                         compiler_working_dir: Path) -> CompilerResult:
+        # list based targets get the whole program at once, streaming targets override this instead of transpile
+        compile_lines: list[str] = []
+        compile_lines_with_labels_comments: list[str] = []
+        rom_instructions: list[(int, int, int)] = []
+        rom_instructions_with_labels_comments: list[(int | str, int | None, int | None)] = []
+        for inst, text, rom, rom_with_labels in lines:
+            compile_lines_with_labels_comments.append(inst.text)
+            if text is not None:
+                compile_lines.append(text)
+            if rom is not None:
+                rom_instructions.append(rom)
+            if rom_with_labels is not None:
+                rom_instructions_with_labels_comments.append(rom_with_labels)
+        return self.transpile(compile_lines, compile_lines_with_labels_comments, rom_instructions,
+                              rom_instructions_with_labels_comments, args, compiler_working_dir)
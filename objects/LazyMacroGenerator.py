@@ -0,0 +1,43 @@
+from typing import Mapping, Type, TYPE_CHECKING
+
+from objects.CompilerArgs import CompilerArgs
+from objects.CompilerErrorLevels import CompilerErrorLevels
+from objects.CompilerResult import CompilerResult
+from objects.MacroGenerator import MacroGenerator
+
+if TYPE_CHECKING:
+    from objects.Macro import Macro
+
+
+class LazyMacroGenerator(MacroGenerator):
+
+    def __init__(self, generator_lang: str, generator_classes: Mapping[str, Type[MacroGenerator]],
+                 generator_lines: list[str]) -> None:
+        self.generator_lang = generator_lang
+        # resolved on first use, so a cached library does not import a backend the program never calls
+        self.generator_classes = generator_classes
+        self.generator_lines = generator_lines
+        self.generator: MacroGenerator | None = None
+
+    def get_target_language(self) -> str:
+        return self.generator_lang
+
+    def load_generator(self, args: CompilerArgs, macro: "Macro") -> CompilerResult:
+        return CompilerResult.ok()
+
+    def use_generator(self, args: CompilerArgs, macro: "Macro", macro_args: list[str]) -> CompilerResult:
+        if self.generator is None:
+            try:
+                generator = self.generator_classes[self.generator_lang](self.generator_lines)
+            except ImportError as e:
+                return CompilerResult.error(f"[ERROR] Failed to import macro generator for language "
+                                            f"\"{self.generator_lang}\" with error \"{e}\"")
+            # the cached macro already went through onAfterMacroLoad, only the generator state is rebuilt here
+            state = (macro.complex_macro, macro.macro_top, macro.macro_bottom)
+            macro.macro_top, macro.macro_bottom = list(macro.macro_top), list(macro.macro_bottom)
+            res = generator.load_generator(args, macro)
+            macro.complex_macro, macro.macro_top, macro.macro_bottom = state
+            if res is not None and res.status != CompilerErrorLevels.OK:
+                return res
+            self.generator = generator
+        return self.generator.use_generator(args, macro, macro_args)
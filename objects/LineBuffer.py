@@ -0,0 +1,73 @@
+from typing import Iterable, Iterator
+
+from objects.Instruction import Instruction
+
+
+class LineNode:
+    __slots__ = ("inst", "prev", "next", "removed")
+
+    def __init__(self, inst: Instruction | None) -> None:
+        self.inst = inst
+        self.prev: LineNode | None = None
+        self.next: LineNode | None = None
+        self.removed = False
+
+
+class LineBuffer:
+
+    def __init__(self, lines: Iterable[Instruction] = ()) -> None:
+        # head and tail are sentinels, so splicing never has to special case the ends
+        self.head = LineNode(None)
+        self.tail = LineNode(None)
+        self.head.next = self.tail
+        self.tail.prev = self.head
+        self.length = 0
+        self.link(self.head, self.tail, lines)
+
+    def link(self, prev: LineNode, after: LineNode, lines: Iterable[Instruction]) -> None:
+        for inst in lines:
+            node = LineNode(inst)
+            node.prev = prev
+            prev.next = node
+            prev = node
+            self.length = self.length + 1
+        prev.next = after
+        after.prev = prev
+
+    def first(self) -> LineNode:
+        return self.head.next
+
+    def is_end(self, node: LineNode) -> bool:
+        return node is self.tail
+
+    def splice(self, first: LineNode, count: int, lines: list[Instruction]) -> tuple[LineNode, LineNode]:
+        prev = first.prev
+        node = first
+        for _ in range(count):
+            if node is self.tail:
+                break
+            node.removed = True
+            node = node.next
+            self.length = self.length - 1
+        self.link(prev, node, lines)
+        return prev.next, node
+
+    def iter_from(self, node: LineNode) -> Iterator[Instruction]:
+        while node is not self.tail:
+            yield node.inst
+            node = node.next
+
+    def nodes_from(self, node: LineNode, end: LineNode | None = None) -> Iterator[LineNode]:
+        end = self.tail if end is None else end
+        while node is not end and node is not self.tail:
+            yield node
+            node = node.next
+
+    def nodes(self) -> Iterator[LineNode]:
+        return self.nodes_from(self.head.next)
+
+    def __iter__(self) -> Iterator[Instruction]:
+        return self.iter_from(self.head.next)
+
+    def __len__(self) -> int:
+        return self.length
@@ -0,0 +1,103 @@
+import hashlib
+import os
+import pathlib
+import pickle
+import tempfile
+from typing import Mapping, Type
+
+from objects.Diagnostic import Diagnostic
+from objects.LazyMacroGenerator import LazyMacroGenerator
+from objects.Macro import Macro
+from objects.MacroGenerator import MacroGenerator
+
+# bump when the layout of a cache entry changes, old entries are then ignored
+CACHE_FORMAT_VERSION = 2
+
+
+class MacroCache:
+
+    def __init__(self, cache_dir: str | os.PathLike | None, compiler_version: str,
+                 shared: dict[str, dict] | None = None) -> None:
+        self.cache_dir = pathlib.Path(cache_dir) if cache_dir is not None else None
+        self.compiler_version = compiler_version
+        # entries parsed once by a batch compile, looked up before the disk
+        self.shared = shared
+
+    def key(self, imported_files: dict[str, list[str]]) -> str:
+        # include order decides macro precedence, so it is part of the key
+        algorithm = hashlib.sha256()
+        algorithm.update(f"{CACHE_FORMAT_VERSION}\0{self.compiler_version}\0".encode())
+        for file, lines in imported_files.items():
+            algorithm.update(file.encode())
+            algorithm.update(b"\0")
+            algorithm.update(hashlib.sha256("\n".join(lines).encode()).digest())
+        return algorithm.hexdigest()
+
+    def path(self, key: str) -> pathlib.Path:
+        return self.cache_dir.joinpath(f"macros-{key}.pickle")
+
+    def load(self, key: str) -> dict | None:
+        if self.shared is not None and (entry := self.shared.get(key)) is not None:
+            return entry
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self.path(key), "rb") as file:
+                entry = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, IndexError, TypeError,
+                ValueError):
+            return None
+        if not isinstance(entry, dict) or entry.get("version") != CACHE_FORMAT_VERSION or \
+                entry.get("compiler") != self.compiler_version or entry.get("key") != key:
+            return None
+        return entry
+
+    def entry(self, key: str, macros: list[tuple[int, Macro]], warnings: list[Diagnostic]) -> dict:
+        return {
+            "version": CACHE_FORMAT_VERSION,
+            "compiler": self.compiler_version,
+            "key": key,
+            "macros": [MacroCache.pack_macro(macro_id, macro) for macro_id, macro in macros],
+            "warnings": warnings
+        }
+
+    def store(self, key: str, macros: list[tuple[int, Macro]], warnings: list[Diagnostic]) -> bool:
+        if self.cache_dir is None:
+            return False
+        entry = self.entry(key, macros, warnings)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # written next to the entry and renamed so readers never see a partial file
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path(key))
+        except OSError:
+            return False
+        return True
+
+    @staticmethod
+    def pack_macro(macro_id: int, macro: Macro) -> tuple:
+        generator = macro.macro_generator
+        if isinstance(generator, LazyMacroGenerator):
+            generator_lang = generator.generator_lang
+        else:
+            generator_lang = generator.get_target_language().lower() if generator is not None else None
+        return (macro_id, macro.macro_opener, macro.macro_closer, list(macro.macro_args), list(macro.macro_top),
+                list(macro.macro_bottom), macro.complex_macro, macro.generated_macro, generator_lang,
+                list(generator.generator_lines) if generator is not None else None, macro.file,
+                macro.macro_start_line_no)
+
+    @staticmethod
+    def unpack_macro(record: tuple,
+                     macro_generators: Mapping[str, Type[MacroGenerator]]) -> tuple[int, Macro] | None:
+        (macro_id, opener, closer, macro_args, top, bottom, complex_macro, generated_macro, generator_lang,
+         generator_lines, file, start_line_no) = record
+        generator = None
+        if generator_lang is not None:
+            if generator_lang not in macro_generators:
+                return None
+            generator = LazyMacroGenerator(generator_lang, macro_generators, generator_lines)
+        # shared entries are unpacked by every compile of a batch, generators may append to the bodies
+        return macro_id, Macro(opener, closer, list(macro_args), list(top), list(bottom), complex_macro,
+                               generated_macro, generator, file, start_line_no)
@@ -19,6 +19,18 @@ class MacroGenerator:
     def __init__(self, generator_lines: list[str]) -> None:
         self.generator_lines = generator_lines
 
+    @classmethod
+    def begin_compile(cls, args: CompilerArgs) -> None:
+        pass
+
+    @classmethod
+    def compile_stats(cls) -> str | None:
+        return None
+
+    @classmethod
+    def compile_counters(cls) -> dict[str, int]:
+        return {}
+
     @abstractmethod
     def load_generator(self, args: CompilerArgs, macro: "Macro") -> CompilerResult:
         pass
@@ -0,0 +1,157 @@
+import heapq
+from typing import Match
+
+import regex
+
+from objects.CompileProfile import CompileProfile
+from objects.CompilerErrorLevels import CompilerErrorLevels
+from objects.Diagnostic import Diagnostic
+from objects.ExpansionCache import ExpansionCache
+from objects.Macro import Macro
+from objects.ProvenanceTable import ProvenanceTable
+
+KEY_REG = regex.compile(r"[a-zA-Z_][a-zA-Z0-9_]*")
+
+
+class MacroRegistry:
+
+    def __init__(self, type_patterns: dict[str, str], type_samples: dict[str, str]) -> None:
+        self.type_patterns = type_patterns
+        self.type_samples = type_samples
+        self.macros: dict[int, Macro] = {}
+        self.patterns: dict[int, regex.Pattern] = {}
+        self.order: dict[int, int] = {}
+        # macros are bucketed by the identifier their opener starts with, openers where the identifier can run
+        # into the rest of the line (no opener literal after it) are checked for every line
+        self.buckets: dict[str, list[int]] = {}
+        self.wildcard: list[int] = []
+        # leading identifiers of complex macro openers, lets block_closer skip most lines without matching
+        self.block_keys: set[str] = set()
+        self.block_wildcard = False
+        self.ambiguities: list[Diagnostic] = []
+        self.expansion_cache = ExpansionCache()
+        self.profile: CompileProfile | None = None
+        self.provenance = ProvenanceTable()
+
+    @staticmethod
+    def escape_opener(opener: str) -> str:
+        return opener.replace("(", r"\(").replace("{", r"\{").replace(")", r"\)").replace("}", r"\}")
+
+    def compile_opener(self, opener: str) -> regex.Pattern:
+        pattern = MacroRegistry.escape_opener(opener)
+        for t, repl in self.type_patterns.items():
+            pattern = pattern.replace(t, repl)
+        return regex.compile(pattern)
+
+    def opener_sample(self, opener: str) -> str:
+        for t, sample in self.type_samples.items():
+            opener = opener.replace(t, sample)
+        return opener
+
+    @staticmethod
+    def opener_key(opener: str) -> str | None:
+        if (match := KEY_REG.match(opener)) is None:
+            return None
+        if match.end() == len(opener) or opener[match.end()] == "%":
+            return None
+        return match.group(0)
+
+    @staticmethod
+    def line_key(line: str) -> str:
+        return match.group(0) if (match := KEY_REG.match(line)) is not None else ""
+
+    def add(self, macro_id: int, macro: Macro) -> None:
+        pattern = self.compile_opener(macro.macro_opener)
+        if macro_id not in self.macros:
+            self.order[macro_id] = len(self.order)
+            if (key := MacroRegistry.opener_key(macro.macro_opener)) is None:
+                self.wildcard.append(macro_id)
+            else:
+                self.buckets.setdefault(key, []).append(macro_id)
+        else:
+            self.expansion_cache.clear()
+        if macro.complex_macro:
+            if (key := MacroRegistry.opener_key(macro.macro_opener)) is None:
+                self.block_wildcard = True
+            else:
+                self.block_keys.add(key)
+        self.macros[macro_id] = macro
+        self.patterns[macro_id] = pattern
+        self.check_ambiguity(macro_id)
+
+    def check_ambiguity(self, macro_id: int) -> None:
+        macro = self.macros[macro_id]
+        sample = self.opener_sample(macro.macro_opener)
+        if not self.patterns[macro_id].match(sample):
+            return
+        for other_id, other_pattern in self.candidates(sample):
+            if other_id == macro_id or not other_pattern.match(sample):
+                continue
+            other = self.macros[other_id]
+            first, second = (other, macro) if self.order[other_id] < self.order[macro_id] else (macro, other)
+            self.ambiguities.append(Diagnostic(
+                CompilerErrorLevels.WARNING, "ambiguous-macro",
+                "[WARN] macro \"{}\" in file \"{}\" at line <{}> is ambiguous with macro \"{}\" in file \"{}\" at line "
+                "<{}>, both match \"{}\" and \"{}\" takes precedence over \"{}\"",
+                (macro.macro_opener, macro.file, macro.macro_start_line_no, other.macro_opener, other.file,
+                 other.macro_start_line_no, sample, first.macro_opener, second.macro_opener),
+                macro.file, macro.macro_start_line_no))
+
+    def take_ambiguities(self) -> list[Diagnostic]:
+        ambiguities = self.ambiguities
+        self.ambiguities = []
+        return ambiguities
+
+    def candidates(self, line: str):
+        bucket = self.buckets.get(MacroRegistry.line_key(line), [])
+        if len(self.wildcard) == 0:
+            ids = bucket
+        elif len(bucket) == 0:
+            ids = self.wildcard
+        else:
+            ids = heapq.merge(bucket, self.wildcard, key=self.order.get)
+        for macro_id in ids:
+            yield macro_id, self.patterns[macro_id]
+
+    def match(self, line: str) -> tuple[int, Macro, Match[str]] | None:
+        for macro_id, pattern in self.candidates(line):
+            if (match := pattern.match(line)) is not None:
+                return macro_id, self.macros[macro_id], match
+        return None
+
+    def count_matches(self, profile: CompileProfile) -> None:
+        # profiled compiles swap in a counting match, everyone else keeps the plain one
+        self.profile = profile
+        self.match = self.counted_match
+
+    def counted_match(self, line: str) -> tuple[int, Macro, Match[str]] | None:
+        for macro_id, pattern in self.candidates(line):
+            self.profile.regex_matches = self.profile.regex_matches + 1
+            if (match := pattern.match(line)) is not None:
+                return macro_id, self.macros[macro_id], match
+        return None
+
+    def block_closer(self, line: str) -> str | None:
+        if not self.block_wildcard and MacroRegistry.line_key(line) not in self.block_keys:
+            return None
+        if (found := self.match(line)) is None or not found[1].complex_macro:
+            return None
+        return found[1].macro_closer
+
+    def keys(self):
+        return self.macros.keys()
+
+    def values(self):
+        return self.macros.values()
+
+    def items(self):
+        return self.macros.items()
+
+    def __getitem__(self, macro_id: int) -> Macro:
+        return self.macros[macro_id]
+
+    def __contains__(self, macro_id: int) -> bool:
+        return macro_id in self.macros
+
+    def __len__(self) -> int:
+        return len(self.macros)
@@ -0,0 +1,30 @@
+from typing import Callable, Iterable, TypeVar
+
+from objects.CompileProfile import CompileProfile
+
+T = TypeVar("T")
+
+
+class NullProfile(CompileProfile):
+    # compiles without --profile run the same phase hooks, none of them measures anything
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def nest(self, name: str, measure: Callable[[], tuple[int, int]]) -> None:
+        pass
+
+    def lap(self, name: str, items_in: int, items_out: int) -> None:
+        pass
+
+    def timed(self, items: Iterable[T], name: str) -> Iterable[T]:
+        return items
+
+    def count_macros(self, macros) -> None:
+        pass
+
+    def take_counters(self, macros, generators: Iterable) -> None:
+        pass
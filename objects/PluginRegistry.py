@@ -0,0 +1,57 @@
+import importlib
+import time
+from collections.abc import Mapping
+from typing import Callable, Generic, Iterator, Type, TypeVar
+
+T = TypeVar("T")
+
+
+class PluginRegistry(Mapping[str, Type[T]], Generic[T]):
+
+    def __init__(self, manifest: dict[str, str], discover: Callable[[str], Type[T] | None] | None = None,
+                 on_load: Callable[[Type[T]], None] | None = None) -> None:
+        # name -> "module:attribute", nothing is imported until a name is looked up
+        self.manifest = manifest
+        self.discover = discover
+        self.on_load = on_load
+        self.plugins: dict[str, Type[T]] = {}
+        self.missing: set[str] = set()
+        # ns spent importing plugins and running on_load
+        self.load_ns = 0
+
+    def __getitem__(self, name: str) -> Type[T]:
+        if (plugin := self.plugins.get(name)) is not None:
+            return plugin
+        if name in self.missing:
+            raise KeyError(name)
+        start = time.perf_counter_ns()
+        if (entry := self.manifest.get(name)) is not None:
+            module_name, _, attribute = entry.partition(":")
+            plugin = getattr(importlib.import_module(module_name), attribute)
+        elif self.discover is None or (plugin := self.discover(name)) is None:
+            self.missing.add(name)
+            raise KeyError(name)
+        self.plugins[name] = plugin
+        if self.on_load is not None:
+            self.on_load(plugin)
+        self.load_ns = self.load_ns + time.perf_counter_ns() - start
+        return plugin
+
+    def get(self, name: str, default: Type[T] | None = None) -> Type[T] | None:
+        try:
+            return self[name]
+        except (KeyError, ImportError):
+            return default
+
+    def __contains__(self, name: object) -> bool:
+        # listed plugins are trusted without importing them, anything else has to be found first
+        return name in self.manifest or name in self.plugins or self.get(name) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.manifest.keys() | self.plugins.keys())
+
+    def __len__(self) -> int:
+        return len(self.manifest.keys() | self.plugins.keys())
+
+    def loaded(self) -> dict[str, Type[T]]:
+        return self.plugins
@@ -0,0 +1,57 @@
+from array import array
+
+# provenance of the lines of the compiled file itself, they are located by their origin
+NO_PROVENANCE = -1
+
+
+class ProvenanceTable:
+
+    def __init__(self, source: str | None = None) -> None:
+        # the compiled file, origins are lines of it
+        self.source = source
+        self.files: list[str] = []
+        self.file_ids: dict[str, int] = {}
+        # one row per macro expansion, shared by every line it emitted: file and line of the macro definition and
+        # the row of the expansion the macro was used in, NO_PROVENANCE when it was used in the compiled file
+        self.file_column = array("i")
+        self.line_column = array("i")
+        self.parent_column = array("i")
+
+    def file_id(self, file: str) -> int:
+        if (file_id := self.file_ids.get(file)) is None:
+            file_id = self.file_ids[file] = len(self.files)
+            self.files.append(file)
+        return file_id
+
+    def add(self, file: str, line: int, parent: int) -> int:
+        self.file_column.append(self.file_id(file))
+        self.line_column.append(line)
+        self.parent_column.append(parent)
+        return len(self.parent_column) - 1
+
+    def entry(self, provenance: int) -> tuple[str, int, int]:
+        return self.files[self.file_column[provenance]], self.line_column[provenance], self.parent_column[provenance]
+
+    def locations(self, provenance: int, origin: int) -> list[tuple[str | None, int]]:
+        # innermost macro first, the line of the compiled file the outermost macro was used at last
+        locations: list[tuple[str | None, int]] = []
+        while provenance != NO_PROVENANCE:
+            file, line, provenance = self.entry(provenance)
+            locations.append((file, line))
+        locations.append((self.source, origin))
+        return locations
+
+    def describe(self, provenance: int, origin: int) -> str:
+        *macros, (source, line) = self.locations(provenance, origin)
+        used = f"at line <{line}>" + (f" in file \"{source}\"" if source is not None else "")
+        if len(macros) == 0:
+            return used
+        return ", ".join(f"{'in' if i == 0 else 'used in'} the macro at line <{macro_line}> in file \"{file}\""
+                         for i, (file, macro_line) in enumerate(macros)) + f", used {used}"
+
+    def nbytes(self) -> int:
+        return sum(column.itemsize * len(column) for column in (self.file_column, self.line_column,
+                                                                self.parent_column))
+
+    def __len__(self) -> int:
+        return len(self.parent_column)
@@ -0,0 +1,83 @@
+import struct
+import sys
+from abc import abstractmethod
+from array import array
+from pathlib import Path
+from typing import Iterable
+
+from objects.CompilerArgs import CompilerArgs
+from objects.CompilerResult import CompilerResult
+from objects.LanguageTarget import EncodedLine
+from objects.StreamingLanguageTarget import StreamingLanguageTarget
+
+# bump when the header or the word layout changes
+ROM_FORMAT_VERSION = 1
+ROM_MAGIC = b"MCCR"
+# magic, format version, opcode / operand a / operand b bits, memory size, stack size, memory blocks, registers,
+# instruction count, all little endian
+ROM_HEADER = struct.Struct("<4sBBBBIIHHI")
+# array type code for every word size in bytes an array can hold, words are written little endian
+WORD_TYPECODES = {array(code).itemsize: code for code in "QLIHB"}
+ROM_FIELD_NAMES = ("opcode", "operand a", "operand b")
+
+
+class RomImageTarget(StreamingLanguageTarget):
+    # the ROM words packed as opcode | operand a | operand b from the high to the low bits, the widths come from
+    # CompilerArgs.rom_layout
+    extension = "rom"
+    binary = True
+
+    def transpile_stream(self, lines: Iterable[EncodedLine], args: CompilerArgs,
+                         compiler_working_dir: Path) -> CompilerResult:
+        if len(args.rom_layout) != 3 or min(args.rom_layout) < 1 or sum(args.rom_layout) > 64:
+            return CompilerResult.error(f"[ERROR] ROM layout {args.rom_layout} needs three field widths of at least 1 "
+                                        f"bit and at most 64 bits together")
+        rom_instructions = [rom for _, _, rom, _ in lines if rom is not None]
+        opcode_bits, a_bits, b_bits = args.rom_layout
+        # a field that does not fit, or is negative, leaves bits behind when shifted by its width
+        if any(opcode >> opcode_bits | a >> a_bits | b >> b_bits for opcode, a, b in rom_instructions):
+            return RomImageTarget.overflow(rom_instructions, args)
+        words = [opcode << a_bits + b_bits | a << b_bits | b for opcode, a, b in rom_instructions]
+        image = self.image(words, args)
+        # the whole image goes out in one write
+        with open(compiler_working_dir.joinpath(f"{args.out_file}.{self.extension}"),
+                  "wb" if self.binary else "w") as f:
+            f.write(image)
+        return CompilerResult.ok()
+
+    @staticmethod
+    def overflow(rom_instructions: list[tuple[int, int, int]], args: CompilerArgs) -> CompilerResult:
+        for index, rom in enumerate(rom_instructions):
+            for name, bits, value in zip(ROM_FIELD_NAMES, args.rom_layout, rom):
+                if value < 0 or value >= 1 << bits:
+                    return CompilerResult.error(f"[ERROR] ROM {name} {value} of instruction {index + 1} does not fit "
+                                                f"in {bits} bits")
+        return CompilerResult.ok()
+
+    @abstractmethod
+    def image(self, words: list[int], args: CompilerArgs) -> bytes | str:
+        pass
+
+    @staticmethod
+    def word_bytes(args: CompilerArgs) -> int:
+        return (sum(args.rom_layout) + 7) // 8
+
+    @staticmethod
+    def header(words: list[int], args: CompilerArgs) -> bytes:
+        return ROM_HEADER.pack(ROM_MAGIC, ROM_FORMAT_VERSION, *args.rom_layout, args.mem_size, args.stack_size,
+                               args.memory_blocks, args.register_count, len(words))
+
+    @staticmethod
+    def pack_words(words: list[int], word_bytes: int) -> bytes:
+        size = min(size for size in WORD_TYPECODES if size >= word_bytes)
+        packed = array(WORD_TYPECODES[size], words)
+        if sys.byteorder == "big":
+            packed.byteswap()
+        data = packed.tobytes()
+        if size == word_bytes:
+            return data
+        # word sizes without an array type are cut out of the next larger one, one strided copy per byte
+        cut = bytearray(len(words) * word_bytes)
+        for i in range(word_bytes):
+            cut[i::word_bytes] = data[i::size]
+        return bytes(cut)
@@ -0,0 +1,26 @@
+import itertools
+from abc import abstractmethod
+from pathlib import Path
+from typing import IO, Iterable
+
+from objects.CompilerArgs import CompilerArgs
+from objects.CompilerResult import CompilerResult
+from objects.LanguageTarget import LanguageTarget, EncodedLine
+
+# lines joined into one write, a write per line costs about twice as much
+WRITE_CHUNK_LINES = 4096
+
+
+class StreamingLanguageTarget(LanguageTarget):
+
+    @abstractmethod
+    def transpile_stream(self, lines: Iterable[EncodedLine], args: CompilerArgs,
+                         compiler_working_dir: Path) -> CompilerResult:
+        pass
+
+    @staticmethod
+    def write_lines(file: IO[str], lines: Iterable[str]) -> None:
+        lines = iter(lines)
+        while len(chunk := list(itertools.islice(lines, WRITE_CHUNK_LINES))) > 0:
+            chunk.append("")
+            file.write("\n".join(chunk))
@@ -0,0 +1,25 @@
+import itertools
+
+from objects.RomImageTarget import RomImageTarget, ROM_FORMAT_VERSION
+from objects.CompilerArgs import CompilerArgs
+
+# words per line
+LOGISIM_LINE_WORDS = 8
+
+
+class LOGISIM(RomImageTarget):
+    # Logisim "v2.0 raw" memory image, the config header is a comment Logisim skips
+    extension = "txt"
+    binary = False
+
+    def image(self, words: list[int], args: CompilerArgs) -> str:
+        opcode_bits, a_bits, b_bits = args.rom_layout
+        digits = (sum(args.rom_layout) + 3) // 4
+        lines = ["v2.0 raw",
+                 f"# mccpu rom v{ROM_FORMAT_VERSION} layout {opcode_bits},{a_bits},{b_bits} memory {args.mem_size} "
+                 f"stack {args.stack_size} blocks {args.memory_blocks} registers {args.register_count} "
+                 f"instructions {len(words)}"]
+        text = list(map(format, words, itertools.repeat(f"0{digits}x", len(words))))
+        lines.extend(" ".join(text[i:i + LOGISIM_LINE_WORDS]) for i in range(0, len(text), LOGISIM_LINE_WORDS))
+        lines.append("")
+        return "\n".join(lines)
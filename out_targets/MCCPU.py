@@ -1,19 +1,16 @@
 from pathlib import Path
+from typing import Iterable
 
-from objects.LanguageTarget import LanguageTarget
+from objects.LanguageTarget import EncodedLine
+from objects.StreamingLanguageTarget import StreamingLanguageTarget
 from objects.CompilerResult import CompilerResult
 from objects.CompilerArgs import CompilerArgs
 
 
-class MCCPU(LanguageTarget):
+class MCCPU(StreamingLanguageTarget):
 
-    def transpile(self, compile_lines: list[str], compile_lines_with_labels_comments: list[str],
-                  rom_instructions: list[(int, int, int)],
-                  rom_instructions_with_labels_comments: list[(int | str, int | None, int | None)], args: CompilerArgs,
-                  compiler_working_dir: Path) -> CompilerResult:
+    def transpile_stream(self, lines: Iterable[EncodedLine], args: CompilerArgs,
+                         compiler_working_dir: Path) -> CompilerResult:
         with open(compiler_working_dir.joinpath(f"{args.out_file}.mccpu"), "w") as f:
-            for cl in compile_lines_with_labels_comments:
-                f.write(f"{cl}\n")
-            f.flush()
-            f.close()
+            StreamingLanguageTarget.write_lines(f, (inst.text for inst, _, _, _ in lines))
         return CompilerResult.ok()
@@ -1,25 +1,30 @@
 from pathlib import Path
+from typing import Iterable
 
-from objects.LanguageTarget import LanguageTarget
+from objects.LanguageTarget import EncodedLine
+from objects.StreamingLanguageTarget import StreamingLanguageTarget
 from objects.CompilerResult import CompilerResult
 from objects.CompilerArgs import CompilerArgs
 
 
-class MCCPUALL(LanguageTarget):
+class MCCPUALL(StreamingLanguageTarget):
+
+    def transpile_stream(self, lines: Iterable[EncodedLine], args: CompilerArgs,
+                         compiler_working_dir: Path) -> CompilerResult:
+        # the ROM listings come after the program, only their formatted lines are kept until then
+        rom_instructions: list[str] = ["// ROM Instructions"]
+        rom_instructions_with_labels_comments: list[str] = ["// ROM Instructions LBL"]
+
+        def program() -> Iterable[str]:
+            for inst, _, rom, rom_with_labels in lines:
+                if rom is not None:
+                    rom_instructions.append(f"// {rom}")
+                if rom_with_labels is not None:
+                    rom_instructions_with_labels_comments.append(f"// {rom_with_labels}")
+                yield inst.text
 
-    def transpile(self, compile_lines: list[str], compile_lines_with_labels_comments: list[str],
-                  rom_instructions: list[(int, int, int)],
-                  rom_instructions_with_labels_comments: list[(int | str, int | None, int | None)], args: CompilerArgs,
-                  compiler_working_dir: Path) -> CompilerResult:
         with open(compiler_working_dir.joinpath(f"{args.out_file}.mccpu"), "w") as f:
-            for cl in compile_lines_with_labels_comments:
-                f.write(f"{cl}\n")
-            f.write("// ROM Instructions\n")
-            for ri in rom_instructions:
-                f.write(f"// {ri}\n")
-            f.write("// ROM Instructions LBL\n")
-            for ril in rom_instructions_with_labels_comments:
-                f.write(f"// {ril}\n")
-            f.flush()
-            f.close()
+            StreamingLanguageTarget.write_lines(f, program())
+            StreamingLanguageTarget.write_lines(f, rom_instructions)
+            StreamingLanguageTarget.write_lines(f, rom_instructions_with_labels_comments)
         return CompilerResult.ok()
@@ -0,0 +1,9 @@
+from objects.RomImageTarget import RomImageTarget
+from objects.CompilerArgs import CompilerArgs
+
+
+class MCCPUBIN(RomImageTarget):
+    # header followed by the packed ROM words
+
+    def image(self, words: list[int], args: CompilerArgs) -> bytes:
+        return RomImageTarget.header(words, args) + RomImageTarget.pack_words(words, RomImageTarget.word_bytes(args))
@@ -0,0 +1,37 @@
+from objects.RomImageTarget import RomImageTarget
+from objects.CompilerArgs import CompilerArgs
+
+# data bytes per record
+HEX_RECORD_BYTES = 16
+# the config header is kept away from the ROM words, loaders that only want the ROM read from address 0
+HEX_HEADER_ADDRESS = 0xFFFF0000
+
+
+class MCCPUHEX(RomImageTarget):
+    # Intel HEX, the ROM words from address 0 and the config header at HEX_HEADER_ADDRESS
+    extension = "hex"
+    binary = False
+
+    def image(self, words: list[int], args: CompilerArgs) -> str:
+        records = MCCPUHEX.records(RomImageTarget.header(words, args), HEX_HEADER_ADDRESS)
+        records.extend(MCCPUHEX.records(RomImageTarget.pack_words(words, RomImageTarget.word_bytes(args)), 0))
+        records.append(":00000001FF")
+        records.append("")
+        return "\n".join(records)
+
+    @staticmethod
+    def record(record_type: int, address: int, data: bytes) -> str:
+        record = bytes((len(data), address >> 8 & 0xFF, address & 0xFF, record_type)) + data
+        return f":{record.hex().upper()}{-sum(record) & 0xFF:02X}"
+
+    @staticmethod
+    def records(data: bytes, address: int) -> list[str]:
+        records: list[str] = []
+        segment = None
+        for offset in range(0, len(data), HEX_RECORD_BYTES):
+            # records only carry 16 bit addresses, the upper half is set by an extended linear address record
+            if (address + offset) >> 16 != segment:
+                segment = (address + offset) >> 16
+                records.append(MCCPUHEX.record(4, 0, segment.to_bytes(2, "big")))
+            records.append(MCCPUHEX.record(0, address + offset, data[offset:offset + HEX_RECORD_BYTES]))
+        return records
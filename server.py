@@ -0,0 +1,144 @@
+import copy
+import glob
+import json
+import os
+import pathlib
+import socket
+import socketserver
+import tempfile
+import time
+from collections import OrderedDict
+
+import compiler
+from client import DEFAULT_SOCKET_PATH
+from objects.CompilerArgs import CompilerArgs
+from objects.CompilerErrorLevels import CompilerErrorLevels
+
+# CompilerArgs fields a request may set, the cache settings stay the ones the server was started with
+REQUEST_ARG_FIELDS = {
+    "target_lang": str,
+    "mem_size": int,
+    "memory_blocks": int,
+    "stack_size": int,
+    "register_count": int,
+    "out_file": str,
+    "verbose": bool
+}
+
+
+def error_response(message: str) -> dict:
+    return {"status": "ERROR", "messages": [["ERROR", message]], "output": f"{CompilerErrorLevels.ERROR} {message}\n"}
+
+
+class CompileRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self) -> None:
+        try:
+            payload = json.loads(self.rfile.readline())
+            if not isinstance(payload, dict):
+                raise TypeError("expected a JSON object")
+            response = self.server.dispatch(payload)
+        except (ValueError, KeyError, TypeError) as e:
+            response = error_response(f"[ERROR] Bad compile request: {e}")
+        except OSError as e:
+            # like an output directory that can not be created, the client still gets an answer
+            response = error_response(f"[ERROR] Compile request failed: {e}")
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class CompileServer(socketserver.UnixStreamServer):
+
+    def __init__(self, socket_path: str | os.PathLike, args: CompilerArgs) -> None:
+        self.args = args
+        # include file names -> key of their parse in compiler.SHARED_LIBRARIES
+        self.libraries: OrderedDict[tuple[str, ...], str] = OrderedDict()
+        self.sources = tempfile.TemporaryDirectory()
+        self.requests = 0
+        self.stopping = False
+        super().__init__(str(socket_path), CompileRequestHandler)
+
+    def dispatch(self, payload: dict) -> dict:
+        self.requests = self.requests + 1
+        match payload.get("command", "compile"):
+            case "compile":
+                return self.compile(payload)
+            case "ping":
+                return {"status": "OK", "version": compiler.COMPILER_VERSION, "requests": self.requests,
+                        "libraries": len(self.libraries)}
+            case "shutdown":
+                self.stopping = True
+                return {"status": "OK"}
+            case command:
+                raise ValueError(f"unknown command \"{command}\"")
+
+    def request_args(self, fields: dict) -> CompilerArgs:
+        args = copy.copy(self.args)
+        for name, kind in REQUEST_ARG_FIELDS.items():
+            if name in fields:
+                setattr(args, name, kind(fields[name]))
+        if "exit_level" in fields:
+            args.exit_level = CompilerErrorLevels[fields["exit_level"]]
+        args.warm = True
+        return args
+
+    def compile(self, payload: dict) -> dict:
+        args = self.request_args(payload.get("args", {}))
+        if (text := payload.get("text")) is not None:
+            file_path = os.path.join(self.sources.name, os.path.basename(payload.get("name") or "source.mccpu"))
+            with open(file_path, "wt") as file:
+                file.write(text)
+        else:
+            file_path = payload["source"]
+        if not os.path.isfile(file_path):
+            return {"file": file_path, **error_response(f"[ERROR] Source file \"{file_path}\" was not found"),
+                    "outputs": []}
+        out = compiler.WORKING_DIR.joinpath(args.out_file)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        start = time.time_ns()
+        compiler.warm_library(file_path, args, self.libraries)
+        res, output = compiler.compile_file_captured(file_path, args)
+        return {"file": file_path, "status": res.status.name,
+                "messages": [[status.name, message] for status, message in compiler.iter_messages(res)],
+                "diagnostics": res.diagnostics.to_json()["records"] if res.diagnostics is not None else [],
+                "output": output, "outputs": CompileServer.written_files(out, start)}
+
+    @staticmethod
+    def written_files(out: pathlib.Path, since: int) -> list[str]:
+        # targets pick their own extension, so everything next to the output name written by this request counts
+        return [str(path) for path in sorted(out.parent.glob(f"{glob.escape(out.name)}.*"))
+                if path.is_file() and path.stat().st_mtime_ns >= since]
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.sources.cleanup()
+        for key in self.libraries.values():
+            compiler.SHARED_LIBRARIES.pop(key, None)
+        self.libraries.clear()
+
+
+def serve(socket_path: str | os.PathLike | None, args: CompilerArgs) -> None:
+    socket_path = pathlib.Path(socket_path or DEFAULT_SOCKET_PATH)
+    if socket_path.exists():
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            if probe.connect_ex(str(socket_path)) == 0:
+                print(f"A compile server is already listening on \"{socket_path}\", exiting!")
+                return
+        # left behind by a server that did not shut down cleanly
+        socket_path.unlink()
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    # only the user that started the server may connect
+    umask = os.umask(0o177)
+    try:
+        server = CompileServer(socket_path, args)
+    finally:
+        os.umask(umask)
+    print(f"Compile server listening on \"{socket_path}\"")
+    try:
+        while not server.stopping:
+            server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        socket_path.unlink(missing_ok=True)
+    print(f"Compile server stopped after {server.requests} requests")
@@ -0,0 +1,65 @@
+import contextlib
+import io
+import os
+import re
+import tempfile
+import unittest
+from unittest import mock
+
+from compiler import compile_files, batch_failed, SHARED_LIBRARIES
+from objects.CompilerErrorLevels import CompilerErrorLevels
+from objects.CompilerArgs import CompilerArgs
+
+
+class BatchTests(unittest.TestCase):
+    def test_compile_files(self):
+        programs = {"a.mccpu": "repeat 2, \"add &r2, %__i\"", "sub/b.mccpu": "repeat 3, \"add &r3, %__i\"",
+                    "sub/c.mccpu": "bogus &r1"}
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "src")
+            for name, body in programs.items():
+                os.makedirs(os.path.dirname(os.path.join(src, name)), exist_ok=True)
+                with open(os.path.join(src, name), "w") as f:
+                    f.write("#includemacrofile <metamacros>\n#memorylayout static auto incremental\n"
+                            f"#endmemorylayout\n{body}\nhalt")
+            outputs = []
+            for jobs in [1, 2]:
+                args = CompilerArgs("MCCPUALL", 256, 8, 64, 16, CompilerErrorLevels.ERROR,
+                                    os.path.join(tmp, f"j{jobs}"))
+                stdout = io.StringIO()
+                with contextlib.redirect_stdout(stdout):
+                    results = compile_files([os.path.join(src, "**", "*.mccpu"), os.path.join(src, "none.mccpu")],
+                                            args, jobs)
+                self.assertEqual([(os.path.relpath(file, src), res.status) for file, res in results], [
+                    ("none.mccpu", CompilerErrorLevels.ERROR), ("a.mccpu", CompilerErrorLevels.OK),
+                    ("sub/b.mccpu", CompilerErrorLevels.OK), ("sub/c.mccpu", CompilerErrorLevels.ERROR)])
+                self.assertEqual([os.path.relpath(file, src) for file in batch_failed(results, args)],
+                                 ["none.mccpu", "sub/c.mccpu"])
+                files = []
+                for name in ["a", "sub/b"]:
+                    with open(os.path.join(tmp, f"j{jobs}", f"{name}.mccpu")) as f:
+                        files.append(f.read())
+                # load_generator prints the generator table, its address changes between processes
+                log = re.sub(r"0x[0-9a-f]+", "0x", stdout.getvalue())
+                outputs.append((files, log[log.find("[" + os.path.join(src, "a.mccpu")):]))
+                self.assertEqual(len(SHARED_LIBRARIES), 0)
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertTrue(outputs[0][0][1].startswith("add &r3, 1\nadd &r3, 2\nadd &r3, 3\n"), outputs[0][0][1])
+
+    def test_compile_files_missing(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sources = [os.path.join(tmp, name) for name in ["a.mccpu", "gone.mccpu", "z.mccpu"]]
+            for source in sources[::2]:
+                with open(source, "w") as f:
+                    f.write("#includemacrofile <metamacros>\n#memorylayout static auto incremental\n"
+                            "#endmemorylayout\nrepeat 2, \"add &r2, %__i\"\nhalt")
+            args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.ERROR, os.path.join(tmp, "out"))
+            # a source that is gone by the time the batch reads it only fails itself
+            with mock.patch("compiler.expand_sources", return_value=(sources, [])), \
+                    contextlib.redirect_stdout(io.StringIO()) as stdout:
+                results = compile_files(sources, args)
+            self.assertEqual([res.status for _, res in results],
+                             [CompilerErrorLevels.OK, CompilerErrorLevels.ERROR, CompilerErrorLevels.OK])
+            self.assertIn("failed with FileNotFoundError", results[1][1].message)
+            self.assertIn(f"[{sources[2]}]", stdout.getvalue())
+            self.assertEqual(len(SHARED_LIBRARIES), 0)
@@ -1,8 +1,9 @@
 import unittest
-from compiler import NATIVE_INSTRUCTIONS, match_instruction, compile_file
+from compiler import NATIVE_INSTRUCTIONS, NATIVE_DECODER, compile_file, lex_line, instruction_to_rom, \
+    resolve_instruction_labels, collect_labels, encode_lines
 from objects.CompilerErrorLevels import CompilerErrorLevels
 from objects.CompilerArgs import CompilerArgs
-from test_data import EXAMPLE_STD_INSTRUCTIONS
+from test_data import EXAMPLE_STD_INSTRUCTIONS, match_instruction
 import glob
 import os
 
@@ -16,6 +17,46 @@ class InstructionTest(unittest.TestCase):
             self.assertTrue(any(list(match_instruction(x, instruction) for x in NATIVE_INSTRUCTIONS)),
                             f"Failed to match instruction: {instruction} to any native instruction")
 
+    def test_decoder_matches_instruction_scan(self):
+        lines = EXAMPLE_STD_INSTRUCTIONS + ["ret &r1", "return", "haltx", "inc &r1, 5", "add &r1", "add &r1, 1234",
+                                            "mov &r1, 1 // comment", "add  &r1, 1", "add &r1,1", "jmp 0x, 2",
+                                            "mov &r1234, 1", "zero &r1", "loop:", "// comment", ""]
+        for line in lines:
+            expected = next(((inst, inst_id) for inst, inst_id in NATIVE_INSTRUCTIONS.items()
+                             if match_instruction(inst, line)), None)
+            self.assertEqual(NATIVE_DECODER.decode(line), expected, f"Decoder mismatch for instruction: {line}")
+
+    def test_instruction_to_rom(self):
+        rom = []
+        for line in ["mov &r1, [&r2]", "add *0x10, 0x0f", "jle 12", "halt"]:
+            self.assertIsNone(instruction_to_rom(lex_line(line, 0), rom, False))
+        self.assertEqual(rom, [(95, 1, 2), (11, 16, 15), (123, 12, 0), (146, 0, 0)])
+        self.assertEqual(instruction_to_rom(lex_line("jmp ~loop", 0), rom, False).status, CompilerErrorLevels.ERROR)
+        self.assertIsNone(instruction_to_rom(lex_line("jmp ~loop", 0), rom, True))
+        self.assertEqual(rom[-1], (126, "~loop", 0))
+
+    def test_resolve_labels(self):
+        lines = [lex_line(line, i) for i, line in enumerate(
+            ["loop2:", "jmp ~loop", "// comment", "loop:", "jmp ~loop2", "halt", "loop:"])]
+        labels = collect_labels(lines)
+        # the first declaration of a name wins
+        self.assertEqual(labels, {"~loop2": 1, "~loop": 2})
+        self.assertEqual([str(resolve_instruction_labels(line, labels)) for line in lines if not line.is_label],
+                         ["jmp 2", "// comment", "jmp 1", "halt"])
+        lines = [lex_line(line, i) for i in range(2000) for line in (f"l{i}:", f"jmp ~l{1999 - i}")]
+        texts = [text for _, text, _, _ in encode_lines(lines, collect_labels(lines)) if text is not None]
+        self.assertEqual(texts[:2], ["jmp 2000", "jmp 1999"])
+
+    def test_encode_lines(self):
+        lines = [lex_line(line, i) for i, line in enumerate(["loop:", "// c", "jle ~loop", "", "add &r1, 2", "halt"])]
+        encoded = list(encode_lines(lines, collect_labels(lines)))
+        self.assertEqual([(inst.text, text, rom, labelled) for inst, text, rom, labelled in encoded], [
+            ("loop:", None, None, ("loop:", None, None)), ("// c", "// c", None, ("// c", None, None)),
+            ("jle ~loop", "jle 1", (123, 1, 0), (123, "~loop", 0)), ("", "", None, None),
+            ("add &r1, 2", "add &r1, 2", (3, 1, 2), (3, 1, 2)), ("halt", "halt", (146, 0, 0), (146, 0, 0))])
+        # lines without labels are encoded once, both views share the tuple
+        self.assertIs(encoded[4][2], encoded[4][3])
+
     def test_example_programms(self):
         path = ".\\test_programms\\*"
         all_files = [f for f in glob.glob(path) if os.path.isfile(f)]
@@ -1,5 +1,7 @@
+from compiler import TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES
 from objects.CompilerArgs import CompilerArgs
 from objects.CompilerErrorLevels import CompilerErrorLevels
+from objects.MacroRegistry import MacroRegistry
 
 EXAMPLE_STD_INSTRUCTIONS = [
     "add &r0, &r0",
@@ -222,3 +224,10 @@ EXAMPLE_STD_INSTRUCTIONS = [
 ]
 
 EXAMPLE_COMP_ARGS: CompilerArgs = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.WARNING, "test")
+
+# the linear scan over every native signature that InstructionDecoder replaced, the decoder is checked against it
+REFERENCE_OPENERS: MacroRegistry = MacroRegistry(TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES)
+
+
+def match_instruction(inst: str, line: str) -> bool:
+    return REFERENCE_OPENERS.compile_opener(inst).match(line) is not None
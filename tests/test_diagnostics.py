@@ -0,0 +1,55 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from compiler import compile_file
+from objects.CompilerErrorLevels import CompilerErrorLevels
+from objects.CompilerArgs import CompilerArgs
+from objects.CompilerResult import CompilerResult
+from objects.Diagnostics import Diagnostics
+
+
+class DiagnosticsTests(unittest.TestCase):
+    def test_diagnostics(self):
+        diagnostics = Diagnostics("prog.mccpu", CompilerErrorLevels.WARNING)
+        self.assertIsNone(diagnostics.info("skipped", "[INFO] {}", object()))
+        record = diagnostics.warn("unused", "[WARN] {} is never used {}", "*v", {"times": 0}, line=3, span=(4, 6))
+        self.assertIsNone(record.formatted)
+        diagnostics.accumulate(CompilerResult.ok()).accumulate(CompilerResult.error("[ERROR] {not a template}"))
+        self.assertEqual([str(record) for record in diagnostics.unreported()], [
+            "CompilerErrorLevels.WARNING [WARN] *v is never used {'times': 0}",
+            "CompilerErrorLevels.ERROR [ERROR] {not a template}"])
+        self.assertEqual(diagnostics.unreported(), [])
+        self.assertEqual([record.code for record in diagnostics.filtered(CompilerErrorLevels.ERROR)], [None])
+        self.assertTrue(diagnostics.stops(CompilerErrorLevels.ERROR))
+        self.assertFalse(diagnostics.stops(CompilerErrorLevels.NONE))
+        self.assertEqual(diagnostics.to_json()["records"][0], {
+            "severity": "WARNING", "code": "unused", "file": "prog.mccpu", "line": 3, "span": [4, 6],
+            "message": "[WARN] *v is never used {'times': 0}", "args": ["*v", "{'times': 0}"]})
+        result = diagnostics.to_result()
+        self.assertEqual((result.status, result.message_count()), (CompilerErrorLevels.ERROR, 2))
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "prog.mccpu")
+            with open(src, "w") as f:
+                f.write("#memorylayout\n#endmemorylayout\nadd &r1, 1\nhalt")
+            args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.ERROR, os.path.join(tmp, "out"),
+                                diagnostics_file=os.path.join(tmp, "diagnostics.json"))
+            with contextlib.redirect_stdout(io.StringIO()) as stdout:
+                res = compile_file(src, args)
+            # every warning is printed once, not again at every later phase
+            self.assertEqual(stdout.getvalue().count("[WARN]"), 3)
+            self.assertEqual(res.status, CompilerErrorLevels.WARNING)
+            self.assertIn("does not contain a valid variable layout", res.message)
+            with open(args.diagnostics_file) as f:
+                report = json.load(f)
+            self.assertEqual((report["status"], [(record["code"], record["file"], record["line"])
+                                                 for record in report["records"]]),
+                             ("WARNING", [("memorylayout-invalid", src, 0), ("memorylayout-invalid", src, 1),
+                                          ("memorylayout-missing", src, None)]))
+            args.verbose = True
+            with contextlib.redirect_stdout(io.StringIO()):
+                res = compile_file(src, args)
+            self.assertIn("labels-resolved", [record.code for record in res.diagnostics.records])
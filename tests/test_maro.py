@@ -1,12 +1,23 @@
+import contextlib
+import io
+import os
 import re
+import tempfile
 import unittest
 
-from compiler import resolve_args, TYPE_REGEX_MATCH_REPLACERS, resolve_macro, \
-    resolve_macros, load_macros, copy_lines_exclude_compiler_instructions
+from compiler import compile_file, COMPILER_VERSION, resolve_args, TYPE_REGEX_MATCH_REPLACERS, expand_macro_at, \
+    resolve_macros, load_macros, copy_lines_exclude_compiler_instructions, lex_line, TYPE_SAMPLE_VALUES
 from objects.CompilerErrorLevels import CompilerErrorLevels
 from objects.MacroTypes import MacroTypes
 from objects.Macro import Macro
+from objects.MacroRegistry import MacroRegistry
+from objects.LineBuffer import LineBuffer
+from objects.MacroCache import MacroCache
+from objects.ExpansionCache import ExpansionCache
+from objects.ProvenanceTable import ProvenanceTable
+from objects.CompilerArgs import CompilerArgs
 from tests.test_data import EXAMPLE_COMP_ARGS
+from macro_generator_targets.Lua_Macrogeenerator import Lua
 
 
 class MacroTests(unittest.TestCase):
@@ -20,10 +31,16 @@ class MacroTests(unittest.TestCase):
 
     def test_macro_resolve(self):
         mac = Macro("zero %register", "", [MacroTypes.REGISTER], ["mov %1, 0x00"], [], False, False, None, "test", 0)
-        lines = ["zero &r1"]
-        res = resolve_macro(lines, 0, mac, 0, [mac], {}, EXAMPLE_COMP_ARGS)
-        self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
-        self.assertEqual(lines, ["mov &r1, 0x00"])
+        macros = MacroRegistry(TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES)
+        macros.add(0, mac)
+        buffer = LineBuffer([lex_line("zero &r1", 0)])
+        closer, body_nodes, (top, body, bottom) = expand_macro_at(buffer, buffer.first(), {}, macros, {},
+                                                                  EXAMPLE_COMP_ARGS)
+        self.assertEqual((closer, body_nodes, body, bottom), (None, [], [], []))
+        self.assertEqual([str(line) for line in top], ["mov &r1, 0x00"])
+        # native lines are left alone
+        buffer = LineBuffer([lex_line("halt", 1)])
+        self.assertIsNone(expand_macro_at(buffer, buffer.first(), {}, macros, {}, EXAMPLE_COMP_ARGS))
 
     def test_macro_resolve_memory_address_lookup(self):
         mac = Macro("test %register, %register", "", [MacroTypes.REGISTER, MacroTypes.REGISTER], ["mov %1, %2"], [],
@@ -33,15 +50,27 @@ class MacroTests(unittest.TestCase):
             "test &r1, *myvar"), mac, 0, {"myvar": 20})
         self.assertEqual(res, "mov &r1, 20", "macro arg resolver contains errors")
 
+    def test_macro_arg_resolve_variable_prefix(self):
+        mac = Macro("test %variable", "", [MacroTypes.VARIABLE], ["mov [%1], [*a] %__macro_id"], [], False, False, None,
+                    "test", 0)
+        res = resolve_args("mov [%1], [*a] %__macro_id", re.match(TYPE_REGEX_MATCH_REPLACERS["%variable"], "*ab"),
+                           mac, 7, {"a": 1, "ab": 2})
+        self.assertEqual(res, "mov 2, 1 7")
+        mac = Macro("test", "", [], ["jmp ~l%__macro_id_%__macro_no"], [], False, False, None, "test", 0)
+        res = resolve_args("jmp ~l%__macro_id_%__macro_no [*c]", re.match("test", "test"), mac, 7, {"c": 3})
+        self.assertEqual(res, "jmp ~l7_0 3")
+
     def test_macros_resolve(self):
         mac = Macro("zero %register", "", [MacroTypes.REGISTER], ["mov %1, 0x00"], [], False, False, None, "test", 0)
-        lines = ["zero &r1"]
-        res = resolve_macros(lines, {0: mac}, {}, EXAMPLE_COMP_ARGS)
+        macros = MacroRegistry(TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES)
+        macros.add(0, mac)
+        lines = [lex_line("zero &r1", 0)]
+        res = resolve_macros(lines, macros, {}, EXAMPLE_COMP_ARGS)
         self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
-        self.assertEqual(lines, ["mov &r1, 0x00"])
+        self.assertEqual([str(line) for line in lines], ["mov &r1, 0x00"])
 
     def test_load_macro(self):
-        macros = {}
+        macros = MacroRegistry(TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES)
         lines = [
             "#macro zero %register",
             "mov %1, 0x00",
@@ -54,6 +83,299 @@ class MacroTests(unittest.TestCase):
             Macro("zero %register", "", [MacroTypes.REGISTER], ["mov %1, 0x00"], [], False, False, None, "tests", 0)),
                         "macro loading error, wrong macro loaded")
 
+    def test_macro_registry_match(self):
+        macros = MacroRegistry(TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES)
+        zero_reg = Macro("zero %register", "", [MacroTypes.REGISTER], ["mov %1, 0x00"], [], False, False, None,
+                         "test", 0)
+        zero_adr = Macro("zero %address", "", [MacroTypes.MEMORY_ADDRESS], ["mov %1, 0x00"], [], False, False, None,
+                         "test", 1)
+        for_mac = Macro("for(%register = %number){", "}", [MacroTypes.REGISTER, MacroTypes.NUMBER], [], [], True,
+                        False, None, "test", 2)
+        macros.add(0, zero_reg)
+        macros.add(1, zero_adr)
+        macros.add(2, for_mac)
+        macro_id, macro, args = macros.match("zero *0x10")
+        self.assertEqual((macro_id, args.groups()), (1, ("*0x10",)))
+        macro_id, macro, args = macros.match("for(&r1 = 10){")
+        self.assertEqual((macro_id, args.groups()), (2, ("&r1", "10")))
+        self.assertIsNone(macros.match("zeros &r1"))
+        self.assertEqual(macros.take_ambiguities(), [])
+
+    def test_macro_registry_ambiguity(self):
+        lines = [
+            "#macro zero %register",
+            "mov %1, 0x00",
+            "#endmacro",
+            "#macro zero %register, %register",
+            "mov %1, 0x00",
+            "mov %2, 0x00",
+            "#endmacro"
+        ]
+        macros = MacroRegistry(TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES)
+        res = load_macros(macros, "tests", lines, {}, EXAMPLE_COMP_ARGS)
+        self.assertEqual(res.status, CompilerErrorLevels.WARNING, str(res))
+        self.assertNotEqual(str(res).find("\"zero %register\" takes precedence"), -1, str(res))
+        self.assertEqual([(record.code, record.file, record.line) for record in res.records],
+                         [("ambiguous-macro", "tests", 3)])
+        res = load_macros(macros, "tests", lines[:2], {}, EXAMPLE_COMP_ARGS)
+        self.assertEqual([(record.code, record.line) for record in res.records], [("unclosed-macro", 0)])
+
+    def test_macros_resolve_order(self):
+        macros = MacroRegistry(TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES)
+        res = load_macros(macros, "tests", [
+            "#macro b %register",
+            "#comment b %__macro_no %1",
+            "#endmacro",
+            "#macro twob",
+            "b &r1",
+            "b &r2",
+            "#endmacro",
+            "#macro w(%register){",
+            "b %1",
+            "...",
+            "b &r9",
+            "#endmacro }"
+        ], {}, EXAMPLE_COMP_ARGS)
+        self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
+        lines = [lex_line(line, i) for i, line in enumerate(["twob", "b &r3", "w(&r4){", "twob", "b &r5", "}", "twob"])]
+        res = resolve_macros(lines, macros, {}, EXAMPLE_COMP_ARGS)
+        self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
+        # the first line of an expansion is numbered in the next round, like the original rescan loop did
+        self.assertEqual([str(line) for line in lines], [
+            "// b 7 &r1", "// b 1 &r2", "// b 2 &r3", "// b 8 &r4", "// b 9 &r1", "// b 3 &r2", "// b 4 &r5",
+            "// b 5 &r9", "// b 10 &r1", "// b 6 &r2"])
+        self.assertEqual([line.origin for line in lines], [0, 0, 1, 2, 3, 3, 4, 2, 6, 6])
+
+    def test_macros_resolve_provenance(self):
+        macros = MacroRegistry(TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES)
+        macros.provenance = ProvenanceTable("prog")
+        res = load_macros(macros, "lib", [
+            "#macro inc %register", "add %1, 1", "#endmacro",
+            "#macro twice(%register){", "inc %1", "...", "inc %1", "#endmacro }"
+        ], {}, EXAMPLE_COMP_ARGS)
+        self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
+        lines = [lex_line(line, i) for i, line in enumerate(["twice(&r1){", "halt", "}", "inc &r2", "inc &r2"])]
+        res = resolve_macros(lines, macros, {}, EXAMPLE_COMP_ARGS)
+        self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
+        self.assertEqual([str(line) for line in lines],
+                         ["add &r1, 1", "halt", "add &r1, 1", "add &r2, 1", "add &r2, 1"])
+        # one row per expansion, the body of a block macro stays with the code that used it, cached expansions
+        # still get a row of their own
+        table = macros.provenance
+        self.assertEqual([table.entry(row) for row in range(len(table))], [
+            ("lib", 3, -1), ("lib", 0, 0), ("lib", 0, -1), ("lib", 0, -1), ("lib", 0, 0)])
+        self.assertEqual([line.provenance for line in lines], [4, -1, 1, 2, 3])
+        self.assertEqual(table.nbytes(), 5 * 3 * table.file_column.itemsize)
+        self.assertEqual(table.describe(lines[0].provenance, lines[0].origin),
+                         "in the macro at line <0> in file \"lib\", used in the macro at line <3> in file \"lib\", "
+                         "used at line <0> in file \"prog\"")
+        lines = [lex_line("twice(&r3){", 0), lex_line("wrap &r3", 1), lex_line("}", 2)]
+        macros.add(-1, Macro("wrap %register", "", [MacroTypes.REGISTER], ["bogus %1"], [], False, False, None, "lib",
+                             9))
+        res = resolve_macros(lines, macros, {}, EXAMPLE_COMP_ARGS)
+        self.assertEqual(res.status, CompilerErrorLevels.ERROR, str(res))
+        self.assertEqual(res.message, "[ERROR] can not resolve instruction \"bogus &r3\" to any macro or std "
+                                      "instruction in the macro at line <9> in file \"lib\", used at line <1> in "
+                                      "file \"prog\"")
+        self.assertEqual(res.diagnostics.records[0].to_json()["line"], 9)
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "prog.mccpu")
+            with open(src, "w") as f:
+                f.write("#memorylayout static auto incremental\n#endmemorylayout\n#macro inc %register\nadd %1, 1\n"
+                        "#endmacro\nloop:\ninc &r1\nhalt")
+            args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.ERROR, os.path.join(tmp, "out"),
+                                source_map=True)
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(compile_file(src, args).status, CompilerErrorLevels.OK)
+            with open(os.path.join(tmp, "out.map")) as f:
+                self.assertEqual(f.read().splitlines(), [
+                    "version 1", f"source {src}", f"file 0 {src}", "expansion 0 0 2 -1", "instruction 1 0 6",
+                    "instruction 2 -1 7"])
+
+    def test_macros_resolve_recursion(self):
+        macros = MacroRegistry(TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES)
+        res = load_macros(macros, "tests", [
+            "#macro ping %register",
+            "pong %1",
+            "#endmacro",
+            "#macro pong %register",
+            "ping %1",
+            "#endmacro"
+        ], {}, EXAMPLE_COMP_ARGS)
+        self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
+        lines = [lex_line("ping &r1", 0)]
+        res = resolve_macros(lines, macros, {}, EXAMPLE_COMP_ARGS)
+        self.assertEqual(res.status, CompilerErrorLevels.ERROR, str(res))
+        self.assertNotEqual(str(res).find("recursive macro \"ping %register\""), -1, str(res))
+
+    def test_macros_resolve_blocks(self):
+        macros = MacroRegistry(TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES)
+        res = load_macros(macros, "tests", [
+            "#macro if(%register){", "#comment if %1", "...", "#comment endif %1", "#endmacro }",
+            "#macro while(%register){", "#comment while %1", "...", "#comment endwhile %1", "#endmacro }",
+            "#macro loop %register", "#comment loop %1", "while(%1){", "halt", "}", "#endmacro"
+        ], {}, EXAMPLE_COMP_ARGS)
+        self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
+        lines = [lex_line(line, i) for i, line in enumerate(
+            ["if(&r1){", "while(&r2){", "if(&r3){", "halt", "}", "}", "}", "loop &r4"])]
+        res = resolve_macros(lines, macros, {}, EXAMPLE_COMP_ARGS)
+        self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
+        self.assertEqual([str(line) for line in lines],
+                         ["// if &r1", "// while &r2", "// if &r3", "halt", "// endif &r3", "// endwhile &r2",
+                          "// endif &r1", "// loop &r4", "// while &r4", "halt", "// endwhile &r4"])
+        self.assertEqual([line.origin for line in lines], [0, 1, 2, 3, 2, 1, 0, 7, 7, 7, 7])
+        lines = [lex_line(line, i) for i, line in enumerate(["if(&r1){", "while(&r2){", "halt", "}", "if(&r3){"])]
+        res = resolve_macros(lines, macros, {}, EXAMPLE_COMP_ARGS)
+        self.assertEqual(res.status, CompilerErrorLevels.ERROR, str(res))
+        self.assertNotEqual(str(res).find("\"if(&r1){\" at line <0> is missing \"}\""), -1, str(res))
+        self.assertNotEqual(str(res).find("\"if(&r3){\" at line <4> is missing \"}\""), -1, str(res))
+
+    def test_macros_resolve_expansion_cache(self):
+        macros = MacroRegistry(TYPE_REGEX_MATCH_REPLACERS, TYPE_SAMPLE_VALUES)
+        res = load_macros(macros, "tests", [
+            "#macro nand %register, %register", "and %1, %2", "not %1", "#endmacro",
+            "#macro count %register", "mov %1, %__macro_no", "#endmacro"
+        ], {}, EXAMPLE_COMP_ARGS)
+        self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
+        lines = [lex_line(line, i) for i, line in enumerate(
+            ["nand &r1, &r2", "count &r1", "nand &r1, &r2", "nand &r3, &r2", "count &r1"])]
+        res = resolve_macros(lines, macros, {}, EXAMPLE_COMP_ARGS)
+        self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
+        self.assertEqual([str(line) for line in lines],
+                         ["and &r1, &r2", "not &r1", "mov &r1, 1", "and &r1, &r2", "not &r1", "and &r3, &r2",
+                          "not &r3", "mov &r1, 2"])
+        self.assertEqual([line.origin for line in lines], [0, 0, 1, 2, 2, 3, 3, 4])
+        cache = macros.expansion_cache
+        self.assertEqual((cache.hits, cache.misses, cache.bypasses), (1, 2, 2))
+        cache = ExpansionCache(2)
+        for key in [(0, ("a",)), (0, ("b",)), (0, ("a",)), (0, ("c",))]:
+            if cache.get(key) is None:
+                cache.put(key, ([], []))
+        self.assertEqual((list(cache.entries), cache.evictions), ([(0, ("a",)), (0, ("c",))], 1))
+
+    def test_lua_generators_share_runtime(self):
+        args = EXAMPLE_COMP_ARGS
+        Lua.begin_compile(args)
+        generators = []
+        for name in ["a", "b"]:
+            macro = Macro(f"{name} %number", "", [MacroTypes.NUMBER], [], [], False, True, None, "test", 0)
+            generator = Lua([
+                "local unroll = require(\"unroll\")",
+                f"owner = \"{name}\"",
+                "local gen = {}",
+                "function gen:onAfterMacroLoad(compiler, macro) end",
+                "function gen:onMacroUse(compiler, macro, args)",
+                "    macro.clear_macro_top()",
+                "    for _, line in ipairs(unroll.lines(args[1], \"mov &r%__i, \" .. owner)) do",
+                "        macro.add_macro_top(line)",
+                "    end",
+                "    return compiler.ok()",
+                "end",
+                "return gen"
+            ])
+            self.assertIsNone(generator.load_generator(args, macro))
+            generators.append((generator, macro))
+        for generator, macro in generators:
+            res = generator.use_generator(args, macro, ["2"])
+            self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
+        self.assertEqual([macro.macro_top for _, macro in generators],
+                         [["mov &r1, a", "mov &r2, a"], ["mov &r1, b", "mov &r2, b"]])
+        runtime = Lua.shared_runtime()
+        self.assertIsNone(runtime.globals().owner)
+        self.assertIsNotNone(runtime.globals().package.loaded.unroll)
+        macro = Macro("c", "", [], [], [], False, True, None, "test", 0)
+        res = Lua(["return {"]).load_generator(args, macro)
+        self.assertEqual(res.status, CompilerErrorLevels.ERROR, str(res))
+
+    def test_lua_pure_generator_cache(self):
+        args = EXAMPLE_COMP_ARGS
+        Lua.begin_compile(args)
+        results = []
+        for pure in ["true", "false"]:
+            macro = Macro("gen %number", "", [MacroTypes.NUMBER], [], [], False, True, None, "test", 0)
+            generator = Lua([
+                "local gen = {calls = 0}",
+                f"gen.pure = {pure}",
+                "function gen:onAfterMacroLoad(compiler, macro) end",
+                "function gen:onMacroUse(compiler, macro, args)",
+                "    self.calls = self.calls + 1",
+                "    macro.clear_macro_top()",
+                "    macro.add_macro_top(\"mov &r1, \" .. args[1])",
+                "    return compiler.ok()",
+                "end",
+                "return gen"
+            ])
+            self.assertIsNone(generator.load_generator(args, macro))
+            tops = []
+            for value in ["1", "2", "1", "1"]:
+                res = generator.use_generator(args, macro, [value])
+                self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
+                tops.append(list(macro.macro_top))
+            results.append((generator.generator_table.calls, tops))
+        tops = [["mov &r1, 1"], ["mov &r1, 2"], ["mov &r1, 1"], ["mov &r1, 1"]]
+        self.assertEqual(results, [(2, tops), (4, tops)])
+        self.assertEqual((Lua.pure_hits, Lua.pure_misses, Lua.use_calls), (2, 2, 6))
+
+    def test_lua_generator_batch_lines(self):
+        args = EXAMPLE_COMP_ARGS
+        Lua.begin_compile(args)
+        bodies = [
+            ["local lines = {}", "for i = 1, args[1] do lines[i] = \"add &r1, \" .. i end", "return lines"],
+            ["local lines = {}", "for i = 1, args[1] do lines[i] = \"add &r1, \" .. i end",
+             "macro.set_macro_top(table.concat(lines, \"\\n\"))", "return compiler.ok()"],
+            ["macro.set_macro_top({\"#comment start\", \"// dropped\"})",
+             "macro.add_macro_top_lines({\"add &r1, 1\", \"add &r1, 2\"})", "return compiler.ok()"]
+        ]
+        expected = [["add &r1, 1", "add &r1, 2", "add &r1, 3"], ["add &r1, 1", "add &r1, 2", "add &r1, 3"],
+                    ["// start", "add &r1, 1", "add &r1, 2"]]
+        for body, lines in zip(bodies, expected):
+            macro = Macro("gen %number", "", [MacroTypes.NUMBER], [], [], False, True, None, "test", 0)
+            generator = Lua(["local gen = {}", "function gen:onAfterMacroLoad(compiler, macro) end",
+                             "function gen:onMacroUse(compiler, macro, args)"] + body + ["end", "return gen"])
+            self.assertIsNone(generator.load_generator(args, macro))
+            for _ in range(2):
+                res = generator.use_generator(args, macro, ["3"])
+                self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
+                self.assertEqual(macro.macro_top, lines)
+
+    def test_lua_bytecode_cache(self):
+        source = ["local gen = {}", "function gen:onAfterMacroLoad(compiler, macro) end",
+                  "function gen:onMacroUse(compiler, macro, args) return \"mov &r1, \" .. args[1] end", "return gen"]
+        with tempfile.TemporaryDirectory() as tmp:
+            args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.WARNING, os.path.join(tmp, "out"),
+                                lua_cache_dir=tmp)
+            stats = []
+            for run in range(4):
+                if run == 2:
+                    for entry in os.listdir(tmp):
+                        with open(os.path.join(tmp, entry), "r+b") as file:
+                            file.seek(-4, os.SEEK_END)
+                            file.write(b"\xff\xff\xff\xff")
+                Lua.begin_compile(args)
+                macro = Macro("gen %number", "", [MacroTypes.NUMBER], [], [], False, True, None, "test", 0)
+                generator = Lua(source)
+                self.assertIsNone(generator.load_generator(args, macro))
+                res = generator.use_generator(args, macro, [str(run)])
+                self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
+                self.assertEqual(macro.macro_top, [f"mov &r1, {run}"])
+                cache = Lua.bytecode_cache
+                stats.append((cache.hits, cache.misses, cache.rejected))
+            self.assertEqual(stats, [(0, 1, 0), (1, 0, 0), (0, 1, 1), (1, 0, 0)])
+            self.assertEqual(len(os.listdir(tmp)), 1)
+            res = Lua(["return {"]).load_generator(args, macro)
+            self.assertEqual(res.status, CompilerErrorLevels.ERROR, str(res))
+
+    def test_line_buffer_splice(self):
+        buffer = LineBuffer(lex_line(line, i) for i, line in enumerate(["a", "b", "c", "d"]))
+        node = buffer.first().next
+        first, after = buffer.splice(node, 2, [lex_line("x", 1), lex_line("y", 1), lex_line("z", 1)])
+        self.assertEqual([str(line) for line in buffer], ["a", "x", "y", "z", "d"])
+        self.assertEqual((str(first.inst), str(after.inst), len(buffer)), ("x", "d", 5))
+        self.assertTrue(node.removed)
+        first, after = buffer.splice(after, 1, [])
+        self.assertTrue(buffer.is_end(first) and buffer.is_end(after))
+        self.assertEqual([str(line) for line in buffer], ["a", "x", "y", "z"])
+
     def test_exclude_comp_instr(self):
         lines = [
             "#macro zero %register",
@@ -64,7 +386,34 @@ class MacroTests(unittest.TestCase):
         complines = []
         res = copy_lines_exclude_compiler_instructions(complines, lines)
         self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
-        self.assertEqual(complines, ["zero &r1"])
+        self.assertEqual([str(line) for line in complines], ["zero &r1"])
+        self.assertEqual(complines[0].origin, 3)
+
+    def test_macro_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "prog.mccpu")
+            with open(src, "wt") as f:
+                f.write("#includemacrofile <metamacros>\n#memorylayout static auto incremental\n#endmemorylayout\n"
+                        "repeat 2, \"add &r2, %__i\"\nhalt")
+            outputs = []
+            for run in range(2):
+                args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.WARNING,
+                                    os.path.join(tmp, f"out{run}"), verbose=True, cache_dir=os.path.join(tmp, "cache"))
+                with contextlib.redirect_stdout(io.StringIO()) as out:
+                    res = compile_file(src, args)
+                self.assertEqual(res.status, CompilerErrorLevels.OK, str(res))
+                self.assertNotEqual(out.getvalue().find(f"[INFO] Macro cache {['miss', 'hit'][run]}"), -1)
+                with open(os.path.join(tmp, f"out{run}.mccpu"), "rt") as f:
+                    outputs.append(f.read())
+            self.assertEqual(outputs[0], outputs[1])
+            cache = MacroCache(os.path.join(tmp, "cache"), COMPILER_VERSION)
+            key = cache.key({"a": ["#macro a", "#endmacro"]})
+            self.assertNotEqual(key, cache.key({"a": ["#macro b", "#endmacro"]}))
+            self.assertNotEqual(key, MacroCache(tmp, "other").key({"a": ["#macro a", "#endmacro"]}))
+            self.assertIsNone(cache.load(key))
+            with open(cache.path(key), "wb") as f:
+                f.write(b"corrupt")
+            self.assertIsNone(cache.load(key))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,62 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from compiler import compile_file
+from objects.CompilerErrorLevels import CompilerErrorLevels
+from objects.CompilerArgs import CompilerArgs
+from benchmarks.suite.generator import ProgramShape, generate_program
+from benchmarks.suite.runner import measure, fit_power_law, compare
+
+
+class ProfileTests(unittest.TestCase):
+    def test_compile_profile(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "prog.mccpu")
+            with open(src, "w") as f:
+                f.write("#memorylayout static auto incremental\n#endmemorylayout\n#macro twice %register\n"
+                        "bump %1\nbump %1\n#endmacro\n#macro bump %register\nadd %1, 1\n#endmacro\n"
+                        "twice &r1\ntwice &r2\nbump &r3\nhalt")
+            args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.ERROR, os.path.join(tmp, "out"),
+                                profile=True, profile_file=os.path.join(tmp, "profile.json"))
+            with contextlib.redirect_stdout(io.StringIO()) as stdout:
+                self.assertEqual(compile_file(src, args).status, CompilerErrorLevels.OK)
+            self.assertIn(f"[PROFILE] {src}: ", stdout.getvalue())
+            with open(args.profile_file) as f:
+                profile = json.load(f)
+            self.assertEqual([phase["name"] for phase in profile["phases"]], [
+                "lower_strip_lines", "imports", "load_macros", "memory_layout", "lexing", "macro_expansion",
+                "variables", "labels", "rom_encoding", "target"])
+            phases = {phase["name"]: phase for phase in profile["phases"]}
+            self.assertEqual((phases["macro_expansion"]["in"], phases["macro_expansion"]["out"]), (4, 6))
+            self.assertEqual(phases["rom_encoding"]["out"], 6)
+            self.assertLessEqual(sum(phase["ns"] for phase in profile["phases"]), profile["total_ns"])
+            counters = profile["counters"]
+            self.assertEqual(counters["expansions"], {"bump %register": 5, "twice %register": 2})
+            self.assertEqual(len(counters["expansion_rounds"]), 3)
+            self.assertGreaterEqual(counters["regex_matches"], 7)
+            self.assertGreater(profile["peak_memory"], 0)
+            # without --profile nothing is reported
+            args.profile = False
+            with contextlib.redirect_stdout(io.StringIO()) as stdout:
+                self.assertEqual(compile_file(src, args).status, CompilerErrorLevels.OK)
+            self.assertNotIn("[PROFILE]", stdout.getvalue())
+
+    def test_benchmark_suite(self):
+        shape = ProgramShape(lines=300, seed=7)
+        program = generate_program(shape)
+        self.assertEqual(program, generate_program(shape))
+        self.assertEqual(len(program.splitlines()), 300)
+        with tempfile.TemporaryDirectory() as tmp:
+            run = measure(shape, 1, tmp)
+        self.assertEqual(run["lines"], 300)
+        self.assertIn("macro_expansion", run["phases"])
+        fit = fit_power_law([(x, 3 * x ** 1.5) for x in (1000, 2000, 4000)])
+        self.assertAlmostEqual(fit["exponent"], 1.5)
+        self.assertAlmostEqual(fit["coefficient"], 3)
+        slower = {"runs": [{**run, "total_ms": run["total_ms"] * 2 + 10}], "fits": {}}
+        self.assertEqual(len(compare(slower, {"runs": [run], "fits": {}}, 0.25, 5.0, 0.15)), 1)
+        self.assertEqual(compare({"runs": [run], "fits": {}}, {"runs": [run], "fits": {}}, 0.25, 5.0, 0.15), [])
@@ -0,0 +1,83 @@
+import contextlib
+import io
+import os
+import pathlib
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from compiler import SHARED_LIBRARIES
+from objects.CompilerErrorLevels import CompilerErrorLevels
+from objects.CompilerArgs import CompilerArgs
+from client import send_request
+import server
+
+
+class ServerTests(unittest.TestCase):
+    def test_compile_server(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch("compiler.COMPILER_FOLDER", pathlib.Path(tmp)):
+            # std includes resolve against the patched folder, the test library never touches the real one
+            library = pathlib.Path(tmp, "macrodefs", "servertest.mccpu")
+            library.parent.mkdir()
+            socket_path = os.path.join(tmp, "server.sock")
+            args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.ERROR, "out")
+            thread = threading.Thread(target=server.serve, args=(socket_path, args))
+            with contextlib.redirect_stdout(io.StringIO()):
+                thread.start()
+                while True:
+                    try:
+                        send_request(socket_path, {"command": "ping"}, 10)
+                        break
+                    except OSError:
+                        time.sleep(0.01)
+            try:
+                request = {"text": "#includemacrofile <servertest>\n#memorylayout static auto incremental\n"
+                                   "#endmemorylayout\ntwice &r1\nhalt", "name": "prog.mccpu",
+                           "args": {"target_lang": "MCCPUALL", "out_file": os.path.join(tmp, "prog")}}
+                compiled = []
+                for op in ["add", "sub"]:
+                    # the library changes between the requests, the server has to parse it again
+                    with open(library, "w") as f:
+                        f.write(f"#macro twice %register\n{op} %1, %1\n#endmacro")
+                    response = send_request(socket_path, request, 10)
+                    self.assertEqual(response["status"], "OK", response)
+                    self.assertEqual(response["outputs"], [os.path.join(tmp, "prog.mccpu")])
+                    with open(response["outputs"][0]) as f:
+                        compiled.append(f.read().splitlines()[0])
+                self.assertEqual(compiled, ["add &r1, &r1", "sub &r1, &r1"])
+                self.assertEqual(send_request(socket_path, {"command": "ping"}, 10)["libraries"], 1)
+                response = send_request(socket_path, {"source": os.path.join(tmp, "none.mccpu")}, 10)
+                self.assertEqual((response["status"], len(response["messages"])), ("ERROR", 1))
+                self.assertEqual(send_request(socket_path, {"command": "nope"}, 10)["status"], "ERROR")
+                # the output directory can not be created below a file
+                open(os.path.join(tmp, "file"), "w").close()
+                request["args"]["out_file"] = os.path.join(tmp, "file", "prog")
+                response = send_request(socket_path, request, 10)
+                self.assertEqual(response["status"], "ERROR")
+                self.assertIn("[ERROR] Compile request failed", response["output"])
+            finally:
+                send_request(socket_path, {"command": "shutdown"}, 10)
+                thread.join(10)
+            self.assertFalse(thread.is_alive() or os.path.exists(socket_path))
+            self.assertEqual(len(SHARED_LIBRARIES), 0)
+
+    def test_client_empty_response(self):
+        with tempfile.TemporaryDirectory() as tmp, socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+            socket_path = os.path.join(tmp, "server.sock")
+            listener.bind(socket_path)
+            listener.listen(1)
+
+            def drop_request():
+                connection = listener.accept()[0]
+                with connection, connection.makefile("rb") as request:
+                    request.read()
+
+            thread = threading.Thread(target=drop_request)
+            thread.start()
+            response = send_request(socket_path, {"source": "prog.mccpu"}, 10)
+            thread.join(10)
+        self.assertEqual((response["file"], response["status"]), ("prog.mccpu", "ERROR"))
+        self.assertIn("without a response", response["output"])
@@ -0,0 +1,125 @@
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from compiler import compile_file, COMPILER_FOLDER, OUT_TARGETS
+from objects.CompilerErrorLevels import CompilerErrorLevels
+from objects.CompilerArgs import CompilerArgs
+from objects.CompilerResult import CompilerResult
+from objects.PluginRegistry import PluginRegistry
+from objects.LanguageTarget import LanguageTarget
+from objects.RomImageTarget import ROM_HEADER, ROM_MAGIC
+
+
+class TargetTests(unittest.TestCase):
+    def test_plugin_registry(self):
+        loaded = []
+        registry = PluginRegistry({"json": "json:JSONDecoder", "gone": "does_not_exist:Gone"},
+                                  lambda name: dict if name == "found" else None, loaded.append)
+        self.assertTrue("gone" in registry and "found" in registry and "other" not in registry)
+        self.assertIsNone(registry.get("gone"))
+        self.assertRaises(KeyError, lambda: registry["other"])
+        self.assertEqual((registry["json"].__name__, registry["json"].__name__), ("JSONDecoder", "JSONDecoder"))
+        self.assertEqual([plugin.__name__ for plugin in loaded], ["dict", "JSONDecoder"])
+        self.assertEqual(sorted(registry), ["found", "gone", "json"])
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "plain.mccpu")
+            with open(source, "w") as f:
+                f.write("#memorylayout static auto incremental\n#endmemorylayout\nadd &r1, &r2\nhalt")
+            # a program without generators must not pay for importing any generator backend
+            script = "import sys, compiler\nfrom objects.CompilerArgs import CompilerArgs\n" \
+                     "from objects.CompilerErrorLevels import CompilerErrorLevels\n" \
+                     f"res = compiler.compile_file({source!r}, CompilerArgs('MCCPU', 256, 8, 64, 16, " \
+                     f"CompilerErrorLevels.WARNING, {os.path.join(tmp, 'out')!r}))\n" \
+                     "print(res.status.name, sorted(m for m in sys.modules if m.startswith(('lupa', " \
+                     "'macro_generator_targets'))))"
+            out = subprocess.run([sys.executable, "-c", script], cwd=COMPILER_FOLDER, capture_output=True, text=True)
+            self.assertEqual(out.stdout.strip(), "OK []", out.stderr)
+
+    def test_streaming_target(self):
+        class ListTarget(LanguageTarget):
+            def transpile(self, compile_lines, compile_lines_with_labels_comments, rom_instructions,
+                          rom_instructions_with_labels_comments, args, compiler_working_dir):
+                with open(compiler_working_dir.joinpath(f"{args.out_file}.mccpu"), "w") as f:
+                    for lines in [compile_lines_with_labels_comments, ["// ROM Instructions"],
+                                  [f"// {ri}" for ri in rom_instructions], ["// ROM Instructions LBL"],
+                                  [f"// {ril}" for ril in rom_instructions_with_labels_comments]]:
+                        f.writelines(f"{line}\n" for line in lines)
+                listed.append(compile_lines)
+                return CompilerResult.ok()
+
+        listed = []
+        OUT_TARGETS.plugins["listtarget"] = ListTarget
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                src = os.path.join(tmp, "prog.mccpu")
+                with open(src, "w") as f:
+                    f.write("#memorylayout static auto incremental\n#endmemorylayout\nloop:\n// count\n"
+                            "add &r1, 1\n\njle ~loop, 3\nmov &r2, [&r1]\nhalt")
+                outputs = []
+                for target in ["MCCPUALL", "listtarget"]:
+                    args = CompilerArgs(target, 256, 8, 64, 16, CompilerErrorLevels.ERROR, os.path.join(tmp, target))
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        self.assertEqual(compile_file(src, args).status, CompilerErrorLevels.OK)
+                    with open(os.path.join(tmp, f"{target}.mccpu")) as f:
+                        outputs.append(f.read())
+                self.assertEqual(outputs[0], outputs[1])
+                self.assertEqual(listed, [["// count", "add &r1, 1", "", "jle 1, 3", "mov &r2, [&r1]", "halt"]])
+                self.assertIn("// ('loop:', None, None)\n// ('// count', None, None)\n// (3, 1, 1)\n"
+                              "// (123, '~loop', 0)", outputs[0])
+                # nothing is written when the program can not be encoded
+                with open(src, "a") as f:
+                    f.write("\njmp ~nowhere")
+                args = CompilerArgs("MCCPU", 256, 8, 64, 16, CompilerErrorLevels.ERROR, os.path.join(tmp, "bad"))
+                with contextlib.redirect_stdout(io.StringIO()) as stdout:
+                    self.assertEqual(compile_file(src, args).status, CompilerErrorLevels.ERROR)
+                self.assertIn("unresolved label or variable \"~nowhere\"", stdout.getvalue())
+                self.assertFalse(os.path.exists(os.path.join(tmp, "bad.mccpu")))
+        finally:
+            del OUT_TARGETS.plugins["listtarget"]
+
+    def test_rom_image_targets(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "prog.mccpu")
+            with open(src, "w") as f:
+                f.write("#memorylayout static auto incremental\n#endmemorylayout\nloop:\nmov &r1, [&r2]\n"
+                        "add *0x10, 0x0f\njle ~loop\nhalt")
+            expected = [95 << 9 | 1 << 4 | 2, 11 << 9 | 16 << 4 | 15, 123 << 9 | 1 << 4, 146 << 9]
+            images = {}
+            for target, extension in [("MCCPUBIN", "rom"), ("MCCPUHEX", "hex"), ("LOGISIM", "txt")]:
+                args = CompilerArgs(target, 256, 8, 64, 16, CompilerErrorLevels.ERROR, os.path.join(tmp, target),
+                                    rom_layout=(8, 5, 4))
+                with contextlib.redirect_stdout(io.StringIO()):
+                    self.assertEqual(compile_file(src, args).status, CompilerErrorLevels.OK)
+                with open(os.path.join(tmp, f"{target}.{extension}"), "rb") as f:
+                    images[target] = f.read()
+            header = ROM_HEADER.unpack_from(images["MCCPUBIN"])
+            self.assertEqual(header, (ROM_MAGIC, 1, 8, 5, 4, 256, 64, 8, 16, 4))
+            self.assertEqual(images["MCCPUBIN"][ROM_HEADER.size:],
+                             b"".join(word.to_bytes(3, "little") for word in expected))
+            memory = {}
+            segment = 0
+            for line in images["MCCPUHEX"].decode().splitlines():
+                record = bytes.fromhex(line[1:])
+                self.assertEqual(sum(record) & 0xFF, 0, line)
+                address, kind, data = record[1] << 8 | record[2], record[3], record[4:-1]
+                if kind == 4:
+                    segment = int.from_bytes(data, "big") << 16
+                elif kind == 0:
+                    memory.update((segment + address + i, byte) for i, byte in enumerate(data))
+            self.assertEqual(bytes(memory[i] for i in range(12)), images["MCCPUBIN"][ROM_HEADER.size:])
+            self.assertEqual(bytes(memory[0xFFFF0000 + i] for i in range(ROM_HEADER.size)),
+                             images["MCCPUBIN"][:ROM_HEADER.size])
+            lines = images["LOGISIM"].decode().splitlines()
+            self.assertEqual((lines[0], [int(word, 16) for word in lines[2].split()]), ("v2.0 raw", expected))
+            # a register that does not fit the operand width fails without writing the image
+            args = CompilerArgs("MCCPUBIN", 256, 8, 64, 16, CompilerErrorLevels.ERROR, os.path.join(tmp, "narrow"),
+                                rom_layout=(8, 4, 4))
+            with contextlib.redirect_stdout(io.StringIO()) as stdout:
+                self.assertEqual(compile_file(src, args).status, CompilerErrorLevels.ERROR)
+            self.assertIn("ROM operand a 16 of instruction 2 does not fit in 4 bits", stdout.getvalue())
+            self.assertFalse(os.path.exists(os.path.join(tmp, "narrow.rom")))
@@ -0,0 +1,87 @@
+import contextlib
+import io
+import os
+import pathlib
+import re
+import tempfile
+import unittest
+from unittest import mock
+
+from compiler import SHARED_LIBRARIES
+from objects.CompilerErrorLevels import CompilerErrorLevels
+from objects.CompilerArgs import CompilerArgs
+import watch
+
+
+class WatchTests(unittest.TestCase):
+    def test_watch_rebuild(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch("compiler.COMPILER_FOLDER", pathlib.Path(tmp)):
+            library = pathlib.Path(tmp, "macrodefs", "watchtest.mccpu")
+            library.parent.mkdir()
+            sources = {}
+            for name, op in [("a", "add"), ("b", "sub")]:
+                sources[name] = os.path.join(tmp, f"{name}.mccpu")
+                with open(sources[name], "w") as f:
+                    f.write(f"#includemacrofile <watchtest>\n#memorylayout static auto incremental\n"
+                            f"#endmemorylayout\ntwice &r1\n{op} &r2, &r2\nhalt")
+
+            def edit(path, text):
+                with open(path, "w") as f:
+                    f.write(text)
+                # mtimes can be coarser than the time between two edits
+                stat = os.stat(path)
+                os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+            def compiled(name):
+                with open(os.path.join(tmp, "out", f"{name}.mccpu")) as f:
+                    return f.read().splitlines()[:3]
+
+            edit(library, "#macro twice %register\nadd %1, %1\n#endmacro")
+            watcher = watch.Watcher([os.path.join(tmp, "*.mccpu")], CompilerArgs(
+                "MCCPU", 256, 8, 64, 16, CompilerErrorLevels.ERROR, os.path.join(tmp, "out")))
+            try:
+                stdout = io.StringIO()
+                with contextlib.redirect_stdout(stdout):
+                    self.assertEqual(watcher.poll(), [sources["a"], sources["b"]])
+                    self.assertEqual(watcher.poll(), [])
+                    # an edited source only rebuilds itself
+                    with open(sources["a"]) as f:
+                        edit(sources["a"], f.read().replace("add &r2", "xor &r2"))
+                    self.assertEqual(watcher.poll(), [sources["a"]])
+                    self.assertEqual(compiled("a"), ["add &r1, &r1", "xor &r2, &r2", "halt"])
+                    # an edited include rebuilds everything that includes it
+                    edit(library, "#macro twice %register\nmul %1, %1\n#endmacro")
+                    self.assertEqual(watcher.poll(), [sources["a"], sources["b"]])
+                    self.assertEqual(watcher.poll(), [])
+                self.assertEqual([compiled("a")[0], compiled("b")[0]], ["mul &r1, &r1", "mul &r1, &r1"])
+                self.assertEqual(len(re.findall(r"\[WATCH] .* OK in [0-9.]+ ms", stdout.getvalue())), 5)
+            finally:
+                watcher.close()
+            self.assertEqual(len(SHARED_LIBRARIES), 0)
+
+    def test_watch_broken_include(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch("compiler.COMPILER_FOLDER", pathlib.Path(tmp)):
+            library = pathlib.Path(tmp, "macrodefs", "watchbroken.mccpu")
+            library.parent.mkdir()
+            source = os.path.join(tmp, "prog.mccpu")
+            with open(source, "w") as f:
+                f.write("#includemacrofile <watchbroken>\n#memorylayout static auto incremental\n"
+                        "#endmemorylayout\ntwice &r1\nhalt")
+            library.write_text("#macro twice %register\nadd %1, %1")
+            watcher = watch.Watcher([source], CompilerArgs(
+                "MCCPU", 256, 8, 64, 16, CompilerErrorLevels.ERROR, os.path.join(tmp, "out")))
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    self.assertEqual(watcher.poll(), [source])
+                    self.assertEqual(watcher.results[source], CompilerErrorLevels.ERROR)
+                    self.assertEqual(watcher.poll(), [])
+                    # the include failed to load, fixing it still rebuilds the source
+                    library.write_text("#macro twice %register\nadd %1, %1\n#endmacro")
+                    stat = os.stat(library)
+                    os.utime(library, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+                    self.assertEqual(watcher.poll(), [source])
+                self.assertEqual(watcher.results[source], CompilerErrorLevels.OK)
+                with open(os.path.join(tmp, "out.mccpu")) as f:
+                    self.assertEqual(f.read().splitlines()[:2], ["add &r1, &r1", "halt"])
+            finally:
+                watcher.close()
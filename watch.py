@@ -0,0 +1,95 @@
+import copy
+import os
+import time
+from collections import OrderedDict
+
+import compiler
+from objects.CompilerArgs import CompilerArgs
+from objects.CompilerErrorLevels import CompilerErrorLevels
+
+# seconds between two looks at the watched files
+WATCH_INTERVAL = 0.2
+
+
+def stamp(path: str | os.PathLike) -> tuple[int, int] | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class Watcher:
+
+    def __init__(self, sources: list[str], args: CompilerArgs) -> None:
+        args = copy.copy(args)
+        args.warm = True
+        self.files, self.missing = compiler.expand_sources(sources)
+        self.args = dict(zip(self.files, compiler.batch_file_args(self.files, args))) if len(self.files) > 0 else {}
+        # source -> every file its last build read, with the stamp it had then
+        self.dependencies: dict[str, dict[str, tuple[int, int] | None]] = {}
+        self.libraries: OrderedDict[tuple[str, ...], str] = OrderedDict()
+        self.results: dict[str, CompilerErrorLevels] = {}
+
+    def build(self, file: str) -> float:
+        start = time.perf_counter()
+        args = self.args[file]
+        # stamped before the build, an edit while it runs triggers another one
+        dependencies = {file: stamp(file)}
+        # the includes are watched even when they fail to load, fixing one has to trigger the rebuild
+        for name in compiler.included_names(file):
+            if (path := compiler.macro_file_path(name)) is not None:
+                dependencies[str(path)] = stamp(path)
+        compiler.warm_library(file, args, self.libraries)
+        res, output = compiler.compile_file_captured(file, args)
+        elapsed = time.perf_counter() - start
+        self.dependencies[file] = dependencies
+        self.results[file] = res.status
+        print(output, end="")
+        print(f"[WATCH] {file} {res.status.name} in {elapsed * 1e3:.1f} ms")
+        return elapsed
+
+    def changed(self) -> list[str]:
+        # sources often share includes, every path is only looked at once per poll
+        stamps: dict[str, tuple[int, int] | None] = {}
+
+        def current(path: str) -> tuple[int, int] | None:
+            if path not in stamps:
+                stamps[path] = stamp(path)
+            return stamps[path]
+
+        return [file for file in self.files if file not in self.dependencies or
+                any(current(path) != last for path, last in self.dependencies[file].items())]
+
+    def poll(self) -> list[str]:
+        rebuilt = self.changed()
+        for file in rebuilt:
+            self.build(file)
+        return rebuilt
+
+    def run(self, interval: float = WATCH_INTERVAL) -> None:
+        for source in self.missing:
+            print(f"{CompilerErrorLevels.ERROR} [ERROR] Source file \"{source}\" was not found")
+        if len(self.files) == 0:
+            return
+        for file in self.files:
+            self.build(file)
+        watched = {path for dependencies in self.dependencies.values() for path in dependencies}
+        print(f"[WATCH] Watching {len(watched)} files, press Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(interval)
+                self.poll()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        for key in self.libraries.values():
+            compiler.SHARED_LIBRARIES.pop(key, None)
+        self.libraries.clear()
+
+
+def watch(sources: list[str], args: CompilerArgs) -> None:
+    Watcher(sources, args).run()